@@ -40,6 +40,15 @@ class NautobotDeviceOnboardingConfig(NautobotAppConfig):
             "ios": "nautobot_device_onboarding.onboarding_extensions.ios",
         },
         "object_match_strategy": "loose",
+        "platform_detection_cache_timeout": 0,
+        "platform_detection_cache_ssh_banner": True,
+        "asyncio_engine_max_sessions": 1000,
+        "auth_failure_threshold": 0,
+        "concurrency_limits": {},
+        "command_latency_profile_timeout": 0,
+        "command_latency_timeout_factor": 3,
+        "command_output_spool_dir": None,
+        "columnar_parsed_tables": False,
     }
     docs_view_name = "plugins:nautobot_device_onboarding:docs"
     home_view_name = "extras:job_list"  # Jobs only for now. May change in the future.
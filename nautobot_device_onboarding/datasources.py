@@ -9,6 +9,8 @@ from nautobot_device_onboarding.constants import (
     ONBOARDING_COMMAND_MAPPERS_CONTENT_IDENTIFIER,
     ONBOARDING_COMMAND_MAPPERS_REPOSITORY_FOLDER,
 )
+from nautobot_device_onboarding.nornir_plays.etl import clear_parser_caches
+from nautobot_device_onboarding.nornir_plays.transform import clear_command_mappers_cache
 
 
 def refresh_git_command_mappers(repository_record, job_result, delete=False):  # pylint: disable=unused-argument
@@ -22,6 +24,9 @@ def refresh_git_command_mappers(repository_record, job_result, delete=False):  #
         "Refreshing network sync job command mappers...",
         level_choice=LogLevelChoices.LOG_INFO,
     )
+    # Command mappers and parser templates may have changed on disk, don't keep serving the cached ones.
+    clear_command_mappers_cache()
+    clear_parser_caches()
     repo_data_dir = Path(repository_record.filesystem_path) / ONBOARDING_COMMAND_MAPPERS_REPOSITORY_FOLDER
     if not repo_data_dir.exists():
         job_result.log(
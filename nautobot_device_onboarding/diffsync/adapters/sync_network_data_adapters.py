@@ -9,22 +9,32 @@ from diffsync.enum import DiffSyncModelFlags
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from nautobot.dcim.models import Device, Interface, SoftwareVersion
 from nautobot.ipam.models import VLAN, VRF, IPAddress
 from nautobot_ssot.contrib import NautobotAdapter
 from netaddr import EUI, mac_unix_expanded
 from netutils.interface import canonical_interface_name
 
+from nautobot_device_onboarding.diffsync.bulk_writer import InterfaceAssignmentBulkWriter
 from nautobot_device_onboarding.diffsync.models import sync_network_data_models
 from nautobot_device_onboarding.nornir_plays.command_getter import (
     sync_network_data_command_getter,
 )
 from nautobot_device_onboarding.utils import diffsync_utils
+from nautobot_device_onboarding.utils.helper import get_job_option
 
 app_settings = settings.PLUGINS_CONFIG["nautobot_device_onboarding"]
 
 
+def _normalize_host(host):
+    """Return the canonical string of an IP address host, or None if it isn't a valid IP address."""
+    try:
+        return str(ipaddress.ip_address(host))
+    except (ValueError, TypeError):
+        return None
+
+
 class FilteredNautobotAdapter(NautobotAdapter):
     """
     Allow Nautobot data to be filtered by the Job form inputs.
@@ -60,6 +70,8 @@ class SyncNetworkDataNautobotAdapter(FilteredNautobotAdapter):
     software_version_to_device = sync_network_data_models.SyncNetworkSoftwareVersionToDevice
 
     primary_ips = None
+    interfaces_by_device = None
+    bulk_writer = None
 
     top_level = [
         "ip_address",
@@ -88,6 +100,30 @@ class SyncNetworkDataNautobotAdapter(FilteredNautobotAdapter):
         for device in device_queryset.filter(Q(primary_ip4__isnull=False) | Q(primary_ip6__isnull=False)):
             self.primary_ips[device.id] = device.primary_ip.id
 
+    def _get_interfaces_by_device(self):
+        """
+        Return the devices to load along with their interfaces, as a list of (device, interfaces) tuples.
+
+        All interface assignment loaders walk the same interfaces, so they are fetched once for all devices with their
+        vlans, lag, vrf and ip addresses, instead of with several queries per interface in every loader.
+        """
+        if self.interfaces_by_device is None:
+            devices = list(self.job.devices_to_load)
+            interfaces = {device.pk: [] for device in devices}
+            interface_queryset = (
+                Interface.objects.filter(device__in=self.job.devices_to_load)
+                .select_related("untagged_vlan", "lag", "vrf")
+                .prefetch_related(
+                    "tagged_vlans",
+                    Prefetch("ip_addresses", queryset=IPAddress.objects.select_related("parent")),
+                    "ip_addresses__parent__vrfs",
+                )
+            )
+            for interface in interface_queryset:
+                interfaces[interface.device_id].append(interface)
+            self.interfaces_by_device = [(device, interfaces[device.pk]) for device in devices]
+        return self.interfaces_by_device
+
     def load_param_mac_address(self, parameter_name, database_object):
         """Convert interface mac_address to string."""
         if database_object.mac_address:
@@ -171,8 +207,8 @@ class SyncNetworkDataNautobotAdapter(FilteredNautobotAdapter):
 
         Only Vlan assignments that were returned by the CommandGetter job should be loaded.
         """
-        for device in self.job.devices_to_load:
-            for interface in device.all_interfaces:
+        for device, interfaces in self._get_interfaces_by_device():
+            for interface in interfaces:
                 tagged_vlans = []
                 for vlan in interface.tagged_vlans.all():
                     vlan_dict = {}
@@ -196,8 +232,8 @@ class SyncNetworkDataNautobotAdapter(FilteredNautobotAdapter):
 
         Only UnTagged Vlan assignments that were returned by the CommandGetter job should be synced.
         """
-        for device in self.job.devices_to_load:
-            for interface in device.all_interfaces:
+        for device, interfaces in self._get_interfaces_by_device():
+            for interface in interfaces:
                 untagged_vlan = {}
                 if interface.untagged_vlan:
                     untagged_vlan["name"] = interface.untagged_vlan.name
@@ -218,8 +254,8 @@ class SyncNetworkDataNautobotAdapter(FilteredNautobotAdapter):
 
         Only Lag assignments that were returned by the CommandGetter job should be synced.
         """
-        for device in self.job.devices_to_load:
-            for interface in device.all_interfaces:
+        for device, interfaces in self._get_interfaces_by_device():
+            for interface in interfaces:
                 network_lag_to_interface = self.lag_to_interface(
                     adapter=self,
                     device__name=device.name,
@@ -253,8 +289,8 @@ class SyncNetworkDataNautobotAdapter(FilteredNautobotAdapter):
 
         Only Vrf assignments that were returned by the CommandGetter job should be synced.
         """
-        for device in self.job.devices_to_load:
-            for interface in device.all_interfaces:
+        for device, interfaces in self._get_interfaces_by_device():
+            for interface in interfaces:
                 vrf = {}
                 if interface.vrf:
                     vrf["name"] = interface.vrf.name
@@ -277,13 +313,15 @@ class SyncNetworkDataNautobotAdapter(FilteredNautobotAdapter):
         """
         namespace = self.job.namespace
         seen = set()
-        for device in self.job.devices_to_load:
-            for interface in device.all_interfaces:
+        for device, interfaces in self._get_interfaces_by_device():
+            for interface in interfaces:
                 for ip_address in interface.ip_addresses.all():
                     parent = ip_address.parent
                     if parent is None or parent.namespace_id != namespace.id:
                         continue
-                    for vrf in parent.vrfs.filter(namespace=namespace):
+                    for vrf in parent.vrfs.all():
+                        if vrf.namespace_id != namespace.id:
+                            continue
                         key = (parent.pk, vrf.pk)
                         if key in seen:
                             continue
@@ -405,6 +443,9 @@ class SyncNetworkDataNautobotAdapter(FilteredNautobotAdapter):
             raise ValueError("'top_level' needs to be set on the class.")
 
         self._cache_primary_ips(device_queryset=self.job.devices_to_load)
+        self.interfaces_by_device = None
+        if get_job_option(self.job, "bulk_write_interface_assignments", False):
+            self.bulk_writer = InterfaceAssignmentBulkWriter(job=self.job)
         for model_name in self.top_level:
             if model_name == "ip_address":
                 self.load_ip_addresses()
@@ -449,8 +490,13 @@ class SyncNetworkDataNautobotAdapter(FilteredNautobotAdapter):
         this happens, the primary IP Address for the device should be set and the management only
         option on the appropriate interface should be set to True.
 
+        Interface vlan, lag and vrf assignments queued by the diffsync models are written first, if they are written
+        in bulk.
+
         This method only runs if data was changed.
         """
+        if self.bulk_writer:
+            self.bulk_writer.flush()
         if self.job.debug:
             self.job.logger.debug("Sync Complete method called, checking for missing primary ip addresses...")
         for device in self.job.devices_to_load.all():  # refresh queryset after sync is complete
@@ -580,11 +626,16 @@ class SyncNetworkDataNetworkAdapter(diffsync.Adapter):
             self.job.logger.debug(f"HOSTNAME: {hostname}, DATA: {data}")
 
     def execute_command_getter(self):
-        """Query devices for data."""
-        result = sync_network_data_command_getter(
-            self.job,
-            self.job.logger.getEffectiveLevel(),
-        )
+        """Query devices for data.
+
+        The data is not queried again if the job collected it already, in the connection used to sync the devices.
+        """
+        result = getattr(self.job, "network_data_command_getter_result", None)
+        if result is None:
+            result = sync_network_data_command_getter(
+                self.job,
+                self.job.logger.getEffectiveLevel(),
+            )
         # verify data returned is a dict
         data_type_check = diffsync_utils.check_data_type(result)
         if self.job.debug:
@@ -936,6 +987,29 @@ class SyncNetworkDataNetworkAdapter(diffsync.Adapter):
                     )
                     continue
 
+    def _get_parent_prefixes_by_host(self, namespace):
+        """Return the parent prefix of the existing IP addresses reported with a VRF, keyed by normalized host.
+
+        The hosts of all devices are resolved with a single query instead of one query per IP address.
+        """
+        hosts = set()
+        for device_data in self.job.command_getter_result.values():
+            for interface_data in device_data.get("interfaces", {}).values():
+                if not (interface_data.get("vrf") or {}).get("name"):
+                    continue
+                for ip_address_data in interface_data.get("ip_addresses", []) or []:
+                    host = _normalize_host(ip_address_data.get("ip_address"))
+                    if host:
+                        hosts.add(host)
+        parent_prefixes = {}
+        if not hosts:
+            return parent_prefixes
+        for existing_ip in IPAddress.objects.filter(host__in=list(hosts), parent__namespace=namespace).select_related(
+            "parent"
+        ):
+            parent_prefixes.setdefault(_normalize_host(existing_ip.host), str(existing_ip.parent.prefix))
+        return parent_prefixes
+
     def load_prefix_to_vrf(self):
         """Load Prefix-to-VRF associations from CommandGetter results.
 
@@ -947,6 +1021,7 @@ class SyncNetworkDataNetworkAdapter(diffsync.Adapter):
         """
         namespace = self.job.namespace
         seen = set()
+        parent_prefixes = self._get_parent_prefixes_by_host(namespace)
         for hostname, device_data in self.job.command_getter_result.items():
             for interface_name, interface_data in device_data.get("interfaces", {}).items():
                 vrf_data = interface_data.get("vrf") or {}
@@ -959,15 +1034,8 @@ class SyncNetworkDataNetworkAdapter(diffsync.Adapter):
                     if not host or not prefix_length:
                         continue
 
-                    prefix_str = None
-                    existing_ip = (
-                        IPAddress.objects.filter(host=host, parent__namespace=namespace)
-                        .select_related("parent")
-                        .first()
-                    )
-                    if existing_ip is not None and existing_ip.parent is not None:
-                        prefix_str = str(existing_ip.parent.prefix)
-                    else:
+                    prefix_str = parent_prefixes.get(_normalize_host(host))
+                    if prefix_str is None:
                         try:
                             prefix_str = str(ipaddress.ip_interface(f"{host}/{prefix_length}").network)
                         except (ValueError, TypeError):
@@ -0,0 +1,290 @@
+"""Deferred bulk writes of interface vlan, lag and vrf assignments."""
+
+from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist, ValidationError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from nautobot.dcim.choices import InterfaceModeChoices, InterfaceTypeChoices
+from nautobot.dcim.models import Interface
+from nautobot.ipam.models import VLAN, VRF
+
+BULK_WRITE_BATCH_SIZE = 1000
+
+
+class InterfaceAssignmentBulkWriter:
+    """Queue interface vlan, lag and vrf assignments and write them with batched queries.
+
+    The `create`/`update` methods of the interface assignment diffsync models queue their changes here instead of
+    saving each interface. `flush` is called once the sync is complete and applies all changes with a few
+    `bulk_update`/`bulk_create` queries. Bulk writes don't call `Interface.save()` or `validated_save()`, don't send
+    the model signals and don't create change log entries, so the checks that matter for these assignments are done
+    here instead. If the bulk write fails, the interfaces are saved one by one and the ones that fail are logged.
+    """
+
+    def __init__(self, job):
+        """Initialize the bulk writer.
+
+        Args:
+            job: the SSOT job, used for the namespace, the devices to load and logging.
+        """
+        self.job = job
+        self.tagged_vlans = {}
+        self.untagged_vlans = {}
+        self.lags = {}
+        self.vrfs = {}
+        self._vlans = {}
+        self._vrfs = {}
+
+    @staticmethod
+    def _key(ids):
+        return (ids["device__name"], ids["name"])
+
+    def queue_tagged_vlans(self, ids, tagged_vlans, replace):
+        """Queue tagged vlans to assign to an interface.
+
+        Args:
+            ids (dict): identifiers of the diffsync model.
+            tagged_vlans (list): vlan dicts with `name` and `id` keys.
+            replace (bool): remove the tagged vlans currently assigned to the interface.
+        """
+        self.tagged_vlans[self._key(ids)] = (tagged_vlans or [], replace)
+
+    def queue_untagged_vlan(self, ids, untagged_vlan):
+        """Queue the untagged vlan of an interface, a vlan dict with `name` and `id` keys or None to remove it."""
+        self.untagged_vlans[self._key(ids)] = untagged_vlan or None
+
+    def queue_lag(self, ids, lag_name):
+        """Queue the name of the lag of an interface, or None to remove it."""
+        self.lags[self._key(ids)] = lag_name or None
+
+    def queue_vrf(self, ids, vrf):
+        """Queue the vrf of an interface, a vrf dict with a `name` key or None to remove it."""
+        self.vrfs[self._key(ids)] = vrf or None
+
+    def has_changes(self):
+        """Return True if any assignment is queued."""
+        return bool(self.tagged_vlans or self.untagged_vlans or self.lags or self.vrfs)
+
+    def _get_interfaces(self):
+        """Return the interfaces of the devices to load, keyed by (device name, interface name)."""
+        keys = set(self.tagged_vlans) | set(self.untagged_vlans) | set(self.lags) | set(self.vrfs)
+        device_names = {device_name for device_name, _ in keys}
+        queryset = Interface.objects.filter(
+            device__in=self.job.devices_to_load, device__name__in=device_names
+        ).select_related("device", "device__location")
+        return {(interface.device.name, interface.name): interface for interface in queryset}
+
+    def _get_vlan(self, vlan_data, location):
+        """Return the vlan matching the name and id at a location, lookups are cached for the flush."""
+        key = (vlan_data["name"], vlan_data["id"], location.pk if location else None)
+        if key not in self._vlans:
+            try:
+                self._vlans[key] = VLAN.objects.get(name=vlan_data["name"], vid=vlan_data["id"], location=location)
+            except (ObjectDoesNotExist, MultipleObjectsReturned):
+                self._vlans[key] = None
+        return self._vlans[key]
+
+    def _get_vrf(self, vrf_name):
+        """Return the vrf with a name in the job namespace, lookups are cached for the flush."""
+        if vrf_name not in self._vrfs:
+            try:
+                self._vrfs[vrf_name] = VRF.objects.get(name=vrf_name, namespace=self.job.namespace)
+            except ObjectDoesNotExist:
+                self._vrfs[vrf_name] = None
+                self.job.logger.error(
+                    f"Failed to assign vrf. Unable to locate a vrf with name: [{vrf_name}] "
+                    f"in namespace: [{self.job.namespace}]"
+                )
+            except MultipleObjectsReturned:
+                self._vrfs[vrf_name] = None
+                self.job.logger.error(
+                    f"Failed to assign vrf. There are multiple vrfs with name: [{vrf_name}] "
+                    f"in namespace: [{self.job.namespace}]. Unsure which to assign."
+                )
+        return self._vrfs[vrf_name]
+
+    def _get_interface(self, interfaces, key, assignment):
+        interface = interfaces.get(key)
+        if interface is None:
+            self.job.logger.error(
+                f"Failed to assign {assignment}. An interface with identifiers: "
+                f"[{{'device__name': '{key[0]}', 'name': '{key[1]}'}}] was not found."
+            )
+        return interface
+
+    def _apply_untagged_vlans(self, interfaces, changed):
+        for key, vlan_data in self.untagged_vlans.items():
+            interface = self._get_interface(interfaces, key, "untagged vlan")
+            if interface is None:
+                continue
+            vlan = None
+            if vlan_data:
+                if not interface.mode:
+                    self.job.logger.error(
+                        f"Failed to assign untagged vlan {vlan_data} to interface: [{interface}] "
+                        f"on device: [{interface.device}], mode must be set when specifying untagged_vlan"
+                    )
+                    continue
+                vlan = self._get_vlan(vlan_data, interface.device.location)
+                if vlan is None:
+                    self.job.logger.error(
+                        f"Failed to assign untagged vlan to interface: [{interface}] on device: [{interface.device}]. "
+                        f"Unable to locate a vlan with attributes: [{vlan_data}] "
+                        f"at location: [{interface.device.location}]"
+                    )
+                    continue
+            interface.untagged_vlan = vlan
+            changed[interface.pk] = interface
+
+    def _apply_lags(self, interfaces, changed):
+        for key, lag_name in self.lags.items():
+            interface = self._get_interface(interfaces, key, "lag")
+            if interface is None:
+                continue
+            lag = None
+            if lag_name:
+                lag = interfaces.get((key[0], lag_name))
+                if lag is None or lag.type != InterfaceTypeChoices.TYPE_LAG or lag.pk == interface.pk:
+                    self.job.logger.error(
+                        f"Failed to assign lag to interface: [{interface}] on device: [{interface.device}]. "
+                        f"Unable to locate a lag interface with name: [{lag_name}] on device: [{interface.device}]"
+                    )
+                    continue
+            interface.lag = lag
+            changed[interface.pk] = interface
+
+    def _apply_vrfs(self, interfaces, changed, vrf_devices):
+        for key, vrf_data in self.vrfs.items():
+            interface = self._get_interface(interfaces, key, "vrf")
+            if interface is None:
+                continue
+            vrf = None
+            if vrf_data:
+                vrf = self._get_vrf(vrf_data["name"])
+                if vrf is None:
+                    continue
+                # An interface vrf must be assigned to the interface device.
+                vrf_devices[(vrf.pk, interface.device.pk)] = (vrf, interface.device)
+            interface.vrf = vrf
+            changed[interface.pk] = interface
+
+    def _apply_tagged_vlans(self, interfaces):
+        """Return the (interface, vlans, replace) tagged vlan assignments to write."""
+        assignments = []
+        for key, (tagged_vlans, replace) in self.tagged_vlans.items():
+            interface = self._get_interface(interfaces, key, "tagged vlans")
+            if interface is None:
+                continue
+            if tagged_vlans and interface.mode != InterfaceModeChoices.MODE_TAGGED:
+                self.job.logger.error(
+                    f"Failed to assign tagged vlans {tagged_vlans} to interface: [{interface}] "
+                    f"on device: [{interface.device}], mode must be set to {InterfaceModeChoices.MODE_TAGGED} "
+                    "when specifying tagged_vlans"
+                )
+                continue
+            vlans = []
+            for vlan_data in tagged_vlans:
+                vlan = self._get_vlan(vlan_data, interface.device.location)
+                if vlan is None:
+                    self.job.logger.error(
+                        f"Failed to assign tagged vlan to interface: [{interface}] on device: [{interface.device}]. "
+                        f"Unable to locate a vlan with attributes [{vlan_data}] at location: "
+                        f"[{interface.device.location}]"
+                    )
+                    continue
+                vlans.append(vlan)
+            assignments.append((interface, vlans, replace))
+        return assignments
+
+    @staticmethod
+    def _bulk_write(changed, fields, vrf_devices, tagged_vlan_assignments):
+        """Write all assignments with batched queries."""
+        for vrf, device in vrf_devices.values():
+            vrf.devices.add(device)
+        if changed:
+            now = timezone.now()
+            for interface in changed.values():
+                interface.last_updated = now
+            Interface.objects.bulk_update(
+                list(changed.values()), [*fields, "last_updated"], batch_size=BULK_WRITE_BATCH_SIZE
+            )
+        through_model = Interface.tagged_vlans.through
+        replaced_interface_ids = [interface.pk for interface, _, replace in tagged_vlan_assignments if replace]
+        if replaced_interface_ids:
+            through_model.objects.filter(interface_id__in=replaced_interface_ids).delete()
+        rows = [
+            through_model(interface_id=interface.pk, vlan_id=vlan.pk)
+            for interface, vlans, _ in tagged_vlan_assignments
+            for vlan in vlans
+        ]
+        through_model.objects.bulk_create(rows, batch_size=BULK_WRITE_BATCH_SIZE, ignore_conflicts=True)
+
+    def _save_each(self, changed, fields, tagged_vlan_assignments):
+        """Save the assignments of each interface on its own, log the interfaces that fail and return their count."""
+        failed = 0
+        for interface in changed.values():
+            try:
+                with transaction.atomic():
+                    if "vrf" in fields and interface.vrf:
+                        interface.vrf.devices.add(interface.device)
+                    interface.validated_save()
+            except (ValidationError, DatabaseError) as err:
+                failed += 1
+                self.job.logger.error(
+                    f"Failed to assign {', '.join(fields)} to interface: [{interface}] "
+                    f"on device: [{interface.device}]. {err}"
+                )
+        for interface, vlans, replace in tagged_vlan_assignments:
+            try:
+                with transaction.atomic():
+                    if replace:
+                        interface.tagged_vlans.set(vlans)
+                    else:
+                        interface.tagged_vlans.add(*vlans)
+            except (ValidationError, DatabaseError) as err:
+                failed += 1
+                self.job.logger.error(
+                    f"Failed to assign tagged vlans to interface: [{interface}] on device: [{interface.device}]. {err}"
+                )
+        return failed
+
+    def flush(self):
+        """Apply all queued assignments in a single transaction and clear the queues.
+
+        If the bulk write fails, e.g. on a database constraint, the transaction is rolled back and the interfaces are
+        saved one by one instead, so that one bad interface only fails its own assignments.
+        """
+        if not self.has_changes():
+            return
+        interfaces = self._get_interfaces()
+        changed = {}
+        fields = []
+        vrf_devices = {}
+        if self.untagged_vlans:
+            self._apply_untagged_vlans(interfaces, changed)
+            fields.append("untagged_vlan")
+        if self.lags:
+            self._apply_lags(interfaces, changed)
+            fields.append("lag")
+        if self.vrfs:
+            self._apply_vrfs(interfaces, changed, vrf_devices)
+            fields.append("vrf")
+        tagged_vlan_assignments = self._apply_tagged_vlans(interfaces) if self.tagged_vlans else []
+        try:
+            with transaction.atomic():
+                self._bulk_write(changed, fields, vrf_devices, tagged_vlan_assignments)
+        except DatabaseError as err:
+            self.job.logger.warning(f"Bulk write of interface assignments failed, saving each interface instead. {err}")
+            failed = self._save_each(changed, fields, tagged_vlan_assignments)
+            if failed:
+                self.job.logger.error(f"Failed to write the assignments of {failed} interfaces.")
+        if self.job.debug:
+            tagged_vlan_count = sum(len(vlans) for _, vlans, _ in tagged_vlan_assignments)
+            self.job.logger.debug(
+                f"Bulk updated {len(changed)} interfaces and assigned {tagged_vlan_count} tagged vlans."
+            )
+        self.tagged_vlans.clear()
+        self.untagged_vlans.clear()
+        self.lags.clear()
+        self.vrfs.clear()
+        self._vlans.clear()
+        self._vrfs.clear()
@@ -22,6 +22,11 @@ from nautobot_device_onboarding.constants import ONBOARDING_DEVICE_MODULE_RECURS
 from nautobot_device_onboarding.utils import diffsync_utils
 
 
+def _get_bulk_writer(adapter):
+    """Return the InterfaceAssignmentBulkWriter of the adapter, if interface assignments are written in bulk."""
+    return getattr(adapter, "bulk_writer", None)
+
+
 class FilteredNautobotModel(NautobotModel):
     """
     Allow Nautobot data to be filtered by the Job form inputs.
@@ -301,7 +306,10 @@ class SyncNetworkDataTaggedVlansToInterface(DiffSyncModel):
     @classmethod
     def create(cls, adapter, ids, attrs):
         """Assign tagged vlans to an interface."""
-        if attrs.get("tagged_vlans"):
+        bulk_writer = _get_bulk_writer(adapter)
+        if attrs.get("tagged_vlans") and bulk_writer:
+            bulk_writer.queue_tagged_vlans(ids, attrs["tagged_vlans"], replace=False)
+        elif attrs.get("tagged_vlans"):
             try:
                 interface = Device.objects.get(name=ids["device__name"]).all_interfaces.get(name=ids["name"])
             except ObjectDoesNotExist as err:
@@ -323,6 +331,10 @@ class SyncNetworkDataTaggedVlansToInterface(DiffSyncModel):
 
     def update(self, attrs):
         """Update tagged vlans."""
+        bulk_writer = _get_bulk_writer(self.adapter)
+        if bulk_writer:
+            bulk_writer.queue_tagged_vlans(self.get_identifiers(), attrs.get("tagged_vlans"), replace=True)
+            return super().update(attrs)
         # An interface must exist before vlan assignments can be updated
         try:
             ids = self.get_identifiers()
@@ -403,7 +415,10 @@ class SyncNetworkDataUnTaggedVlanToInterface(DiffSyncModel):
     @classmethod
     def create(cls, adapter, ids, attrs):
         """Assign an untagged vlan to an interface."""
-        if attrs.get("untagged_vlan"):
+        bulk_writer = _get_bulk_writer(adapter)
+        if attrs.get("untagged_vlan") and bulk_writer:
+            bulk_writer.queue_untagged_vlan(ids, attrs["untagged_vlan"])
+        elif attrs.get("untagged_vlan"):
             try:
                 interface = Device.objects.get(name=ids["device__name"]).all_interfaces.get(name=ids["name"])
             except ObjectDoesNotExist:
@@ -425,6 +440,10 @@ class SyncNetworkDataUnTaggedVlanToInterface(DiffSyncModel):
 
     def update(self, attrs):
         """Update the untagged vlan on an interface."""
+        bulk_writer = _get_bulk_writer(self.adapter)
+        if bulk_writer:
+            bulk_writer.queue_untagged_vlan(self.get_identifiers(), attrs.get("untagged_vlan"))
+            return super().update(attrs)
         # An interface must exist before vlan assignments can be updated
         try:
             ids = self.get_identifiers()
@@ -492,7 +511,10 @@ class SyncNetworkDataLagToInterface(DiffSyncModel):
     @classmethod
     def create(cls, adapter, ids, attrs):
         """Assign a lag to an interface."""
-        if attrs["lag__interface__name"]:
+        bulk_writer = _get_bulk_writer(adapter)
+        if attrs["lag__interface__name"] and bulk_writer:
+            bulk_writer.queue_lag(ids, attrs["lag__interface__name"])
+        elif attrs["lag__interface__name"]:
             try:
                 interface = Device.objects.get(name=ids["device__name"]).all_interfaces.get(name=ids["name"])
             except ObjectDoesNotExist as err:
@@ -514,6 +536,10 @@ class SyncNetworkDataLagToInterface(DiffSyncModel):
 
     def update(self, attrs):
         """Update and interface lag."""
+        bulk_writer = _get_bulk_writer(self.adapter)
+        if bulk_writer:
+            bulk_writer.queue_lag(self.get_identifiers(), attrs.get("lag__interface__name"))
+            return super().update(attrs)
         # An interface must exist before lag can be updated
         try:
             ids = self.get_identifiers()
@@ -611,7 +637,10 @@ class SyncNetworkDataVrfToInterface(DiffSyncModel):
     @classmethod
     def create(cls, adapter, ids, attrs):
         """Assign a vrf to an interface."""
-        if attrs.get("vrf"):
+        bulk_writer = _get_bulk_writer(adapter)
+        if attrs.get("vrf") and bulk_writer:
+            bulk_writer.queue_vrf(ids, attrs["vrf"])
+        elif attrs.get("vrf"):
             try:
                 interface = Device.objects.get(name=ids["device__name"]).all_interfaces.get(name=ids["name"])
             except ObjectDoesNotExist as err:
@@ -633,6 +662,10 @@ class SyncNetworkDataVrfToInterface(DiffSyncModel):
 
     def update(self, attrs):
         """Update the vrf on an interface."""
+        bulk_writer = _get_bulk_writer(self.adapter)
+        if bulk_writer:
+            bulk_writer.queue_vrf(self.get_identifiers(), attrs.get("vrf"))
+            return super().update(attrs)
         # An interface must exist before vrf can be updated
         try:
             ids = self.get_identifiers()
@@ -9,6 +9,7 @@ from netutils.ip import is_ip
 from netutils.vlan import vlanconfig_to_list
 
 from nautobot_device_onboarding.constants import INTERFACE_TYPE_MAP_STATIC
+from nautobot_device_onboarding.nornir_plays.parsed_table import ParsedTable
 
 # https://docs.nautobot.com/projects/core/en/stable/development/apps/api/platform-features/jinja2-filters/
 
@@ -83,6 +84,21 @@ def get_entry_from_dict(dict_obj, key):
     return dict_obj.get(key, "")
 
 
+@library.filter
+def table_lookup(table, column, key, value_column=None):
+    """Take a parsed table (ParsedTable or list of rows) and return the rows where `column` equals `key`.
+
+    With a `value_column`, return the values of that column of the matching rows instead.
+    """
+    if isinstance(table, ParsedTable):
+        rows = table.lookup(column, key)
+    else:
+        rows = [row for row in table if isinstance(row, dict) and row.get(column) == key]
+    if value_column:
+        return [row.get(value_column) for row in rows]
+    return rows
+
+
 def _interface_mode_logic(dict_item):  # pylint: disable=too-many-return-statements
     """Helper for interface_mode_logic to make it more DRY."""
     if dict_item.get("admin_mode"):
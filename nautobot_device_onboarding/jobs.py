@@ -11,6 +11,7 @@ from diffsync.enum import DiffSyncFlags
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db.models import Q
 from nautobot.apps.jobs import (
     BooleanVar,
     ChoiceVar,
@@ -71,6 +72,34 @@ LOGGER = logging.getLogger(__name__)
 name = "Device Onboarding"  # pylint: disable=invalid-name
 
 
+def _ensure_last_network_data_sync_field(job):
+    """Get or create the last_network_data_sync custom field set on devices by the network data sync.
+
+    Returns:
+        bool: False if the custom field could not be created, the network data sync can't run.
+    """
+    if job.debug:
+        job.logger.debug("Checking for last_network_data_sync custom field")
+    try:
+        CustomField.objects.get(key="last_network_data_sync")
+    except ObjectDoesNotExist:
+        cf, _ = CustomField.objects.get_or_create(  # pylint:disable=invalid-name
+            label="Last Network Data Sync",
+            key="last_network_data_sync",
+            type=CustomFieldTypeChoices.TYPE_DATE,
+            required=False,
+        )
+
+        cf.content_types.add(ContentType.objects.get_for_model(Device))
+
+        if job.debug:
+            job.logger.debug("Custom field found or created")
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        job.logger.error(f"Failed to get or create last_network_data_sync custom field, {err}")
+        return False
+    return True
+
+
 class OnboardingTask(Job):  # pylint: disable=too-many-instance-attributes
     """Nautobot Job for onboarding a new device (original)."""
 
@@ -274,6 +303,31 @@ class SSOTSyncDevices(DataSource):  # pylint: disable=too-many-instance-attribut
         default=False,
         description="Enable to test connectivity to the device(s) prior to attempting onboarding.",
     )
+    parse_in_process_pool = BooleanVar(
+        default=False,
+        label="Parse In Process Pool",
+        description="Parse, extract and validate command outputs in a pool of worker processes instead of the device connection threads. Recommended for large syncs.",
+    )
+    use_asyncio_engine = BooleanVar(
+        default=False,
+        label="Use Asyncio Engine",
+        description="Collect command outputs with asyncio SSH sessions instead of the threaded Nornir runner, keeping many more devices in flight at once. Requires the asyncssh extra of the app.",
+    )
+    spool_command_outputs = BooleanVar(
+        default=False,
+        label="Spool Command Outputs",
+        description="Write raw command outputs to compressed files as they are collected instead of holding them in memory until all devices are done. Recommended for large syncs.",
+    )
+    record_command_outputs = BooleanVar(
+        default=False,
+        label="Record Command Outputs",
+        description="Attach the raw command outputs of the devices to the job result, to be replayed by a later run.",
+    )
+    replay_command_outputs = FileVar(
+        label="Replay Command Outputs",
+        required=False,
+        description="Command outputs recorded by a previous run. If a file is provided, its outputs are parsed and synced instead of connecting to the devices.",
+    )
     csv_file = FileVar(
         label="CSV File",
         required=False,
@@ -518,6 +572,11 @@ class SSOTSyncDevices(DataSource):  # pylint: disable=too-many-instance-attribut
         port=22,
         timeout=30,
         connectivity_test=False,
+        parse_in_process_pool=False,
+        use_asyncio_engine=False,
+        spool_command_outputs=False,
+        record_command_outputs=False,
+        replay_command_outputs=None,
         update_devices_without_primary_ip=False,
         set_mgmt_only=True,
         csv_file=None,
@@ -598,6 +657,11 @@ class SSOTSyncDevices(DataSource):  # pylint: disable=too-many-instance-attribut
                 self.ip_address_inventory[resolved] = {"original_ip_address": ip_address, **default_values}
 
         self.connectivity_test = connectivity_test
+        self.parse_in_process_pool = parse_in_process_pool
+        self.use_asyncio_engine = use_asyncio_engine
+        self.spool_command_outputs = spool_command_outputs
+        self.record_command_outputs = record_command_outputs
+        self.replay_command_outputs = replay_command_outputs
         self.csv_file = csv_file
 
         if self.found_invalid_ip_address:
@@ -629,6 +693,31 @@ class SSOTSyncNetworkData(DataSource):  # pylint: disable=too-many-instance-attr
         default=False,
         description="Enable to test connectivity to the device(s) prior to attempting onboarding.",
     )
+    parse_in_process_pool = BooleanVar(
+        default=False,
+        label="Parse In Process Pool",
+        description="Parse, extract and validate command outputs in a pool of worker processes instead of the device connection threads. Recommended for large syncs.",
+    )
+    use_asyncio_engine = BooleanVar(
+        default=False,
+        label="Use Asyncio Engine",
+        description="Collect command outputs with asyncio SSH sessions instead of the threaded Nornir runner, keeping many more devices in flight at once. Requires the asyncssh extra of the app.",
+    )
+    spool_command_outputs = BooleanVar(
+        default=False,
+        label="Spool Command Outputs",
+        description="Write raw command outputs to compressed files as they are collected instead of holding them in memory until all devices are done. Recommended for large syncs.",
+    )
+    record_command_outputs = BooleanVar(
+        default=False,
+        label="Record Command Outputs",
+        description="Attach the raw command outputs of the devices to the job result, to be replayed by a later run.",
+    )
+    replay_command_outputs = FileVar(
+        label="Replay Command Outputs",
+        required=False,
+        description="Command outputs recorded by a previous run. If a file is provided, its outputs are parsed and synced instead of connecting to the devices.",
+    )
     sync_vlans = BooleanVar(default=False, description="Sync VLANs and interface VLAN assignments.")
     sync_vrfs = BooleanVar(default=False, description="Sync VRFs and interface VRF assignments.")
     sync_vrf_to_prefix = BooleanVar(
@@ -640,6 +729,11 @@ class SSOTSyncNetworkData(DataSource):  # pylint: disable=too-many-instance-attr
     )
     sync_cables = BooleanVar(default=False, description="Sync cables between interfaces via a LLDP or CDP.")
     sync_software_version = BooleanVar(default=False, description="Sync software version from device.")
+    bulk_write_interface_assignments = BooleanVar(
+        default=False,
+        label="Bulk Write Interface Assignments",
+        description="Write interface VLAN, LAG and VRF assignments in bulk once the sync is complete instead of saving each interface. Recommended for large syncs. No change log entries are written and no change signals are sent for these assignments, unless the bulk write fails and the interfaces are saved one by one.",
+    )
     update_devices_with_changed_serial = BooleanVar(
         default=False,
         description="If a device at the specified location already exists in Nautobot but the serial number "
@@ -729,6 +823,12 @@ class SSOTSyncNetworkData(DataSource):  # pylint: disable=too-many-instance-attr
         ip_address_status,
         default_prefix_status,
         parallel_loading=False,
+        parse_in_process_pool=False,
+        use_asyncio_engine=False,
+        spool_command_outputs=False,
+        record_command_outputs=False,
+        replay_command_outputs=None,
+        bulk_write_interface_assignments=False,
         devices=None,
         location=None,
         device_role=None,
@@ -751,33 +851,19 @@ class SSOTSyncNetworkData(DataSource):  # pylint: disable=too-many-instance-attr
         self.ip_address_status = ip_address_status
         self.default_prefix_status = default_prefix_status
         self.parallel_loading = parallel_loading
+        self.parse_in_process_pool = parse_in_process_pool
+        self.use_asyncio_engine = use_asyncio_engine
+        self.spool_command_outputs = spool_command_outputs
+        self.record_command_outputs = record_command_outputs
+        self.replay_command_outputs = replay_command_outputs
+        self.bulk_write_interface_assignments = bulk_write_interface_assignments
         self.devices = devices
         self.location = location
         self.device_role = device_role
         self.platform = platform
         self.fail_job_on_task_failure = fail_job_on_task_failure
 
-        # Check for last_network_data_sync CustomField
-        if self.debug:
-            self.logger.debug("Checking for last_network_data_sync custom field")
-        try:
-            cf = CustomField.objects.get(  # pylint:disable=invalid-name
-                key="last_network_data_sync"
-            )
-        except ObjectDoesNotExist:
-            cf, _ = CustomField.objects.get_or_create(  # pylint:disable=invalid-name
-                label="Last Network Data Sync",
-                key="last_network_data_sync",
-                type=CustomFieldTypeChoices.TYPE_DATE,
-                required=False,
-            )
-
-            cf.content_types.add(ContentType.objects.get_for_model(Device))
-
-            if self.debug:
-                self.logger.debug("Custom field found or created")
-        except Exception as err:  # pylint: disable=broad-exception-caught
-            self.logger.error(f"Failed to get or create last_network_data_sync custom field, {err}")
+        if not _ensure_last_network_data_sync_field(self):
             return
 
         # Filter devices based on form input
@@ -811,6 +897,147 @@ class SSOTSyncNetworkData(DataSource):  # pylint: disable=too-many-instance-attr
         super().run(dryrun=dryrun, memory_profiling=memory_profiling)
 
 
+class SSOTSyncDevicesAndNetworkData(SSOTSyncDevices):  # pylint: disable=too-many-instance-attributes
+    """Job syncing devices and their extended attributes into Nautobot, with one connection to each device.
+
+    The commands of the sync devices and sync network data command mappers run in the same connection, their outputs
+    are extracted for both syncs. The devices are synced first, then their network data.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Initialize SSOTSyncDevicesAndNetworkData."""
+        super().__init__(*args, **kwargs)
+        self.collect_network_data = True  # Read by sync_devices_command_getter
+        self.network_data_command_getter_result = None  # Dict result of the network data ETL, keyed by ip address
+        self.sync_stage = "sync_devices"
+        self.filtered_devices = None
+        self.command_getter_result = None
+        self.devices_to_load = None
+
+    class Meta:
+        """Metadata about this Job."""
+
+        name = "Sync Devices And Network Data From Network"
+        description = "Synchronize basic device information and extended device attribute information into Nautobot from one or more network devices, logging into each device once. Information includes Device Name, Serial Number, Management IP/Interface, Interfaces, IP Addresses, Prefixes, VLANs and VRFs."
+        has_sensitive_variables = False
+
+    sync_vlans = BooleanVar(default=False, description="Sync VLANs and interface VLAN assignments.")
+    sync_vrfs = BooleanVar(default=False, description="Sync VRFs and interface VRF assignments.")
+    sync_vrf_to_prefix = BooleanVar(
+        default=False,
+        description=(
+            "Associate each interface's VRF with the parent prefix of the interface's IP addresses. "
+            "Requires 'Sync VRFs'. Associations are add-only; stale prefix/VRF links are not removed."
+        ),
+    )
+    sync_cables = BooleanVar(default=False, description="Sync cables between interfaces via a LLDP or CDP.")
+    sync_software_version = BooleanVar(default=False, description="Sync software version from device.")
+    bulk_write_interface_assignments = BooleanVar(
+        default=False,
+        label="Bulk Write Interface Assignments",
+        description="Write interface VLAN, LAG and VRF assignments in bulk once the sync is complete instead of saving each interface. Recommended for large syncs. No change log entries are written and no change signals are sent for these assignments, unless the bulk write fails and the interfaces are saved one by one.",
+    )
+    default_prefix_status = ObjectVar(
+        model=Status,
+        query_params={"content_types": "ipam.prefix"},
+        required=False,
+        description="Status to be applied to all new created prefixes. Prefix status does not update with additional syncs.",
+    )
+
+    def load_source_adapter(self):
+        """Load the network adapter of the current sync stage."""
+        if self.sync_stage != "sync_network_data":
+            super().load_source_adapter()
+            return
+        self.source_adapter = SyncNetworkDataNetworkAdapter(job=self, sync=self.sync)
+        self.source_adapter.load()
+        if self.devices_to_load is not None:
+            # The network adapter looks the devices up by name and serial in all locations, only the devices synced by
+            # this run are loaded.
+            self.devices_to_load = self.devices_to_load.filter(pk__in=self.filtered_devices.values("pk"))
+
+    def load_target_adapter(self):
+        """Load the Nautobot adapter of the current sync stage."""
+        if self.sync_stage != "sync_network_data":
+            super().load_target_adapter()
+            return
+        self.target_adapter = SyncNetworkDataNautobotAdapter(job=self, sync=self.sync)
+        self.target_adapter.load()
+
+    def _get_network_data_by_hostname(self):
+        """Key the network data collected for each synced device by the device name instead of its ip address.
+
+        Returns:
+            tuple: the network data keyed by device name, and the queryset of the devices it was collected from.
+        """
+        network_data = {}
+        synced_devices = Q()
+        for ip_address, device_data in (self.source_adapter.device_data or {}).items():
+            if ip_address in (self.network_data_command_getter_result or {}) and device_data.get("hostname"):
+                network_data[device_data["hostname"]] = self.network_data_command_getter_result[ip_address]
+                # Device names are only unique per location and tenant, the devices are matched like the sync of the
+                # devices does, by name and location, and by the serial the device reported.
+                synced_devices |= Q(
+                    name=device_data["hostname"],
+                    location=self.ip_address_inventory[ip_address]["location"],
+                    serial=device_data.get("serial"),
+                )
+        if not network_data:
+            return network_data, Device.objects.none()
+        return network_data, Device.objects.filter(synced_devices)
+
+    def run(  # pylint: disable=arguments-differ
+        self,
+        *args,
+        sync_vlans=False,
+        sync_vrfs=False,
+        sync_vrf_to_prefix=False,
+        sync_cables=False,
+        sync_software_version=False,
+        bulk_write_interface_assignments=False,
+        default_prefix_status=None,
+        **kwargs,
+    ):
+        """Run the sync of the devices, then of their network data."""
+        missing_required_inputs = [
+            form_field
+            for form_field in ["namespace", "interface_status", "ip_address_status"]
+            if not kwargs.get(form_field)
+        ]
+        if not default_prefix_status:
+            missing_required_inputs.append("default_prefix_status")
+        if missing_required_inputs:
+            self.logger.error(f"Missing required inputs from job form: {missing_required_inputs}")
+            raise ValidationError(message=f"Missing required inputs {missing_required_inputs}")
+        self.sync_vlans = sync_vlans
+        self.sync_vrfs = sync_vrfs
+        self.sync_vrf_to_prefix = sync_vrf_to_prefix
+        self.sync_cables = sync_cables
+        self.sync_software_version = sync_software_version
+        self.bulk_write_interface_assignments = bulk_write_interface_assignments
+        self.update_devices_with_changed_serial = False
+        self.namespace = kwargs["namespace"]
+        self.interface_status = kwargs["interface_status"]
+        self.ip_address_status = kwargs["ip_address_status"]
+        self.default_prefix_status = default_prefix_status
+
+        super().run(*args, **kwargs)
+
+        network_data, synced_devices = self._get_network_data_by_hostname()
+        if not network_data:
+            self.logger.info("No network data was collected, the network data of the devices will not be synced.")
+            return
+        if not _ensure_last_network_data_sync_field(self):
+            return
+        self.network_data_command_getter_result = network_data
+        self.filtered_devices = synced_devices
+        self.logger.info(f"Syncing the network data of {len(network_data)} devices.")
+        self.sync_stage = "sync_network_data"
+        self.diffsync_flags = DiffSyncFlags.CONTINUE_ON_FAILURE | DiffSyncFlags.LOG_UNCHANGED_RECORDS
+        # A second SSoT sync, recorded separately from the sync of the devices.
+        super(SSOTSyncDevices, self).run(dryrun=self.dryrun, memory_profiling=self.memory_profiling)
+
+
 class DeviceOnboardingTroubleshootingJob(Job):
     """Simple Job to Execute Show Command."""
 
@@ -898,6 +1125,7 @@ jobs = [
     OnboardingTask,
     SSOTSyncDevices,
     SSOTSyncNetworkData,
+    SSOTSyncDevicesAndNetworkData,
     DeviceOnboardingTroubleshootingJob,
 ]
 register_jobs(*jobs)
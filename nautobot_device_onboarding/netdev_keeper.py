@@ -15,6 +15,7 @@ from paramiko.ssh_exception import SSHException
 from nautobot_device_onboarding.constants import NETMIKO_TO_NAPALM_STATIC
 from nautobot_device_onboarding.exceptions import OnboardException
 from nautobot_device_onboarding.onboarding.onboarding import StandaloneOnboarding
+from nautobot_device_onboarding.utils.platform_detection import detect_platform
 
 logger = logging.getLogger("rq.worker")
 
@@ -146,8 +147,9 @@ class NetdevKeeper:  # pylint: disable=too-many-instance-attributes
 
         try:
             logger.info("INFO guessing device type: %s", self.hostname)
-            guesser = SSHDetect(**remote_device)
-            guessed_device_type = guesser.autodetect()
+            guessed_device_type = detect_platform(
+                self.hostname, self.port or 22, lambda: SSHDetect(**remote_device).autodetect()
+            )
             logger.info("INFO guessed device type: %s", guessed_device_type)
 
         except NetMikoAuthenticationException as err:
@@ -0,0 +1,507 @@
+"""Asyncio command collection engine, an alternative to the threaded Nornir runner.
+
+The Nornir runner holds one thread and one blocking Netmiko session per device it works on. This engine runs the same
+command plans over asyncssh sessions in a single event loop, so thousands of devices can be in flight at once, and
+hands the raw command outputs to the `CommandGetterProcessor` like the Nornir run does.
+"""
+
+import asyncio
+import functools
+import pprint
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from nautobot.dcim.utils import get_all_network_driver_mappings
+
+from nautobot_device_onboarding.constants import PLUGIN_CFG
+from nautobot_device_onboarding.utils.command_latency import DEFAULT_READ_TIMEOUT, get_command_read_timeout
+from nautobot_device_onboarding.utils.helper import close_threaded_db_connections, format_log_message
+
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+# Maximum number of device sessions open at once, see the `asyncio_engine_max_sessions` app setting.
+DEFAULT_MAX_SESSIONS = 1000
+
+# Seconds to wait for the connection, login and first prompt of a device.
+DEFAULT_CONNECT_TIMEOUT = 30
+
+# Commands run after login so that command outputs aren't paginated, keyed by netmiko platform. The asyncio engine only
+# collects the outputs of these platforms, see `is_platform_supported`.
+DISABLE_PAGING_COMMANDS = {
+    "arista_eos": ["terminal width 511", "terminal length 0"],
+    "aruba_aoscx": ["no page"],
+    "aruba_os": ["no paging"],
+    "brocade_fastiron": ["skip-page-display"],
+    "cisco_ios": ["terminal width 511", "terminal length 0"],
+    "cisco_nxos": ["terminal width 511", "terminal length 0"],
+    "cisco_xe": ["terminal width 511", "terminal length 0"],
+    "cisco_xr": ["terminal width 511", "terminal length 0"],
+    "hp_comware": ["screen-length disable"],
+    "juniper_junos": ["set cli screen-width 511", "set cli screen-length 0"],
+    "paloalto_panos": ["set cli pager off"],
+}
+
+# Platforms entering the privileged mode after login, before paging is disabled, like their netmiko driver does.
+ENABLE_MODE_PLATFORMS = {"brocade_fastiron"}
+
+# Prompts of the enable command for a username, e.g. with RADIUS, and for the enable secret.
+ENABLE_USERNAME_PATTERN = re.compile(r"(user name|login):?\s*$", re.IGNORECASE)
+ENABLE_PASSWORD_PATTERN = re.compile(r"password:?\s*$", re.IGNORECASE)
+
+# A prompt is the last line of the output, ending with one of these characters.
+PROMPT_TERMINATOR_PATTERN = re.compile(r"[>#$%\]]\s*$")
+
+
+class AsyncEngineError(Exception):
+    """Error collecting command outputs with the asyncio engine."""
+
+
+class AsyncEngineAuthenticationError(AsyncEngineError):
+    """The device rejected the credentials."""
+
+
+class AsyncEngineTimeoutError(AsyncEngineError):
+    """The device could not be connected to, or didn't answer in time."""
+
+
+def is_platform_supported(platform):
+    """Return whether the asyncio engine can collect the outputs of a platform.
+
+    The other platforms, e.g. hp_procurve, f5_tmsh and cisco_wlc, need a login or a session preparation only their
+    netmiko driver implements, their hosts are run by the Nornir runner.
+    """
+    return platform in DISABLE_PAGING_COMMANDS
+
+
+class AsyncSSHSession:
+    """Interactive CLI session on a device over asyncssh, sending commands and reading up to the prompt."""
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, hostname, port, username, password, platform, connect_timeout=DEFAULT_CONNECT_TIMEOUT, secret=None
+    ):
+        """Initialize the session, `open` connects to the device.
+
+        Args:
+            hostname (str): hostname or IP address of the device.
+            port (int): SSH port of the device.
+            username (str): username to log in with.
+            password (str): password to log in with.
+            platform (str): netmiko platform of the device, used to disable paging.
+            connect_timeout (int): seconds to wait for the connection, login and first prompt.
+            secret (str): enable secret of the platforms entering the privileged mode, the password if not given.
+        """
+        self.hostname = hostname
+        self.port = port or 22
+        self.username = username
+        self.password = password
+        self.platform = platform
+        self.connect_timeout = connect_timeout
+        self.secret = secret
+        self.connection = None
+        self.reader = None
+        self.writer = None
+        self.prompt = None
+        self.prompt_pattern = None
+
+    async def open(self):
+        """Connect and log in to the device, find its prompt, enter the privileged mode if needed and disable paging."""
+        if asyncssh is None:
+            raise AsyncEngineError(
+                "The asyncio engine requires the asyncssh library, install it with `pip install nautobot-device-onboarding[asyncssh]`."
+            )
+        try:
+            self.connection = await asyncio.wait_for(
+                asyncssh.connect(
+                    self.hostname,
+                    port=int(self.port),
+                    username=self.username,
+                    password=self.password,
+                    known_hosts=None,
+                    client_keys=None,
+                ),
+                self.connect_timeout,
+            )
+            process = await self.connection.create_process(term_type="vt100", term_size=(511, 24))
+        except asyncssh.PermissionDenied as err:
+            raise AsyncEngineAuthenticationError(str(err)) from err
+        except (OSError, asyncio.TimeoutError, asyncssh.Error) as err:
+            raise AsyncEngineTimeoutError(str(err) or type(err).__name__) from err
+        self.reader = process.stdout
+        self.writer = process.stdin
+        await self.find_prompt()
+        if self.platform in ENABLE_MODE_PLATFORMS:
+            await self.enable()
+        for command in DISABLE_PAGING_COMMANDS.get(self.platform, []):
+            await self.send_command(command, read_timeout=self.connect_timeout)
+
+    async def find_prompt(self):
+        """Read up to the first prompt of the device and compile the pattern matching its prompts."""
+        self.writer.write("\n")
+        output = await self._read_until(PROMPT_TERMINATOR_PATTERN, self.connect_timeout)
+        self.prompt = output.rstrip().splitlines()[-1].strip()
+        # Match the prompt of the other modes too, e.g. `router>` and `router#`, or `router(config)#`.
+        self.prompt_pattern = re.compile(rf"(^|\n)\s*{re.escape(self.prompt[:-1])}[^\n]*[>#$%\]]\s*$")
+        return self.prompt
+
+    async def enable(self):
+        """Enter the privileged mode, answering the prompts of the enable command with the username and secret."""
+        if self.prompt.endswith("#"):
+            return
+        answer_pattern = re.compile(
+            rf"{ENABLE_USERNAME_PATTERN.pattern}|{ENABLE_PASSWORD_PATTERN.pattern}|{self.prompt_pattern.pattern}",
+            re.IGNORECASE,
+        )
+        self.writer.write("enable\n")
+        output = await self._read_until(answer_pattern, self.connect_timeout, echo="enable")
+        if ENABLE_USERNAME_PATTERN.search(output):
+            self.writer.write(f"{self.username}\n")
+            output = await self._read_until(answer_pattern, self.connect_timeout)
+        if ENABLE_PASSWORD_PATTERN.search(output):
+            self.writer.write(f"{self.secret or self.password}\n")
+            output = await self._read_until(answer_pattern, self.connect_timeout)
+        if not self.prompt_pattern.search(output) or not output.rstrip().endswith("#"):
+            raise AsyncEngineError(f"Failed to enter enable mode on {self.hostname}.")
+
+    async def _read_until(self, pattern, timeout, echo=None):
+        """Read the output of the device until `pattern` matches its end, past the `echo` of the command if given.
+
+        Returns:
+            str: the output, starting after the line echoing the command if `echo` is given.
+        """
+        output = ""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            # A prompt printed before the command was echoed, e.g. for an extra newline, is not the end of the output.
+            if echo is None:
+                if pattern.search(output):
+                    return output
+            elif echo in output:
+                echo_end = output.find("\n", output.index(echo))
+                if echo_end != -1 and pattern.search(output[echo_end:]):
+                    return output[echo_end + 1 :]
+            try:
+                data = await asyncio.wait_for(self.reader.read(65536), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError as err:
+                raise AsyncEngineTimeoutError(
+                    f"Timed out reading from {self.hostname} after {timeout} seconds."
+                ) from err
+            if not data:
+                raise AsyncEngineTimeoutError(f"Session to {self.hostname} closed.")
+            output += data.replace("\r\n", "\n").replace("\r", "")
+
+    async def send_command(self, command, read_timeout=DEFAULT_READ_TIMEOUT):
+        """Send a command and return its output, without the echoed command and the trailing prompt.
+
+        Args:
+            command (str): command to send.
+            read_timeout (int): seconds to wait for the prompt after the output of the command.
+        """
+        self.writer.write(f"{command}\n")
+        output = await self._read_until(self.prompt_pattern, read_timeout, echo=command)
+        return output.rsplit("\n", 1)[0].strip("\n") if "\n" in output else ""
+
+    async def close(self):
+        """Close the connection to the device."""
+        if self.connection is not None:
+            self.connection.close()
+            await self.connection.wait_closed()
+            self.connection = None
+
+    async def __aenter__(self):
+        """Open the session for use as an async context manager."""
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        """Close the session."""
+        await self.close()
+
+
+async def run_sync(executor, func, *args, **kwargs):
+    """Call a blocking function from the event loop in a thread of `executor`, the default executor if None.
+
+    The Django ORM refuses to run in the thread of an event loop, so everything that logs to the JobResult, e.g. the
+    NornirLogger and `report_failed_host`, is called this way.
+    """
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+def _get_host_command_plan(host, command_getter_yaml_data, command_getter_job, command_plans):
+    """Return the CommandPlan of a host, or why its commands can't be run, the same checks as `netmiko_send_commands`.
+
+    Returns:
+        tuple: (CommandPlan, None) or (None, failed reason).
+    """
+    if host.platform not in get_all_network_driver_mappings():
+        return None, f"{host.name} has a unsupported platform set."
+    if not is_platform_supported(host.platform):
+        return None, f"{host.name} has a platform the asyncio engine doesn't support."
+    if not (command_getter_yaml_data.get(host.platform) or {}).get(command_getter_job):
+        return None, f"{host.name} has missing definitions in command_mapper YAML file."
+    command_plan = command_plans.get(host.platform)
+    if not command_plan:
+        return None, f"{host.name} has missing definitions in command_mapper YAML file."
+    return command_plan, None
+
+
+async def collect_host_outputs(  # pylint: disable=too-many-arguments
+    session, commands, logger, nautobot_job, read_timeout=DEFAULT_READ_TIMEOUT, latency_profile=None, log_executor=None
+):
+    """Run the commands of a command plan in an open session, like `netmiko_send_commands` does in one connection.
+
+    Args:
+        session (AsyncSSHSession): open session to the device.
+        commands (tuple): command definitions of the command plan.
+        logger (NornirLogger): logger for the job.
+        nautobot_job (Job): the Nautobot job, used for the debug and failure options.
+        read_timeout (int): seconds to wait for the output of the commands without `read_timeout` in the command mapper.
+        latency_profile (CommandLatencyProfile): profile the read timeouts are learned from, and latencies recorded to.
+        log_executor (Executor): executor the logger is called in, see `run_sync`.
+
+    Returns:
+        dict: raw command outputs keyed by command, an empty list for the commands that failed.
+    """
+    command_outputs = {}
+    for command in commands:
+        if latency_profile:
+            command_read_timeout = latency_profile.get_read_timeout(session.hostname, command, read_timeout)
+        else:
+            command_read_timeout = get_command_read_timeout(command, read_timeout)
+        started = time.monotonic()
+        try:
+            command_outputs[command["command"]] = await session.send_command(command["command"], command_read_timeout)
+        except AsyncEngineTimeoutError:
+            if latency_profile:
+                latency_profile.record_timeout(session.hostname, command["command"])
+            if nautobot_job.fail_job_on_task_failure:
+                raise
+            # Handled as an empty result in the ETL stage, like the failed subtasks of the Nornir run.
+            command_outputs[command["command"]] = []
+            continue
+        if latency_profile:
+            latency_profile.record(session.hostname, command["command"], time.monotonic() - started)
+        if nautobot_job.debug:
+            log_message = format_log_message(pprint.pformat(command_outputs[command["command"]]))
+            await run_sync(
+                log_executor, logger.debug, f"Result of '{command['command']}' command:<br><br>{log_message}"
+            )
+    return command_outputs
+
+
+def _prepare_hosts(hosts, processor, options):
+    """Return what the event loop needs to run each host, read before it starts since it can't use the ORM.
+
+    Returns:
+        tuple: list of (host, command plan, netmiko connection parameters, concurrency group), and the names of the
+            hosts that failed.
+    """
+    host_runs = []
+    failed_hosts = []
+    for name, host in hosts.items():
+        if not host.platform:
+            processor.logger.info(f"{name} has no platform set.", extra={"object": name})
+            continue
+        command_plan, failed_reason = _get_host_command_plan(
+            host, options["command_getter_yaml_data"], options["command_getter_job"], options["command_plans"]
+        )
+        if failed_reason:
+            processor.report_failed_host(name, host.platform, failed_reason)
+            failed_hosts.append(name)
+            continue
+        host_runs.append([host, command_plan, host.get_connection_parameters("netmiko"), None])
+    limiter = options["limiter"]
+    if limiter:
+        groups = limiter.get_groups(host_run[0] for host_run in host_runs)
+        for host_run in host_runs:
+            host_run[3] = groups[host_run[0].name]
+    return host_runs, failed_hosts
+
+
+async def _run_host(host_run, processor, semaphore, options):  # pylint: disable=too-many-return-statements
+    """Collect and process the command outputs of a single host, return whether the host failed."""
+    host, command_plan, parameters, _ = host_run
+    auth_breaker = options["auth_breaker"]
+    log_executor = options["log_executor"]
+    async with semaphore:
+        if auth_breaker and auth_breaker.is_open(parameters.username, parameters.password):
+            await run_sync(
+                log_executor,
+                processor.report_failed_host,
+                host.name,
+                host.platform,
+                auth_breaker.get_failed_reason(host.name, parameters.username),
+            )
+            return True
+        await run_sync(
+            log_executor,
+            processor.logger.info,
+            f"Collecting command outputs of {host.name}.",
+            extra={"object": host.name},
+        )
+        session = options["session_class"](
+            parameters.hostname or host.name,
+            parameters.port,
+            parameters.username,
+            parameters.password,
+            host.platform,
+            secret=(parameters.extras or {}).get("secret"),
+        )
+        try:
+            try:
+                await session.open()
+            except AsyncEngineAuthenticationError:
+                if auth_breaker:
+                    await run_sync(log_executor, auth_breaker.record_failure, parameters.username, parameters.password)
+                await run_sync(
+                    log_executor,
+                    processor.report_failed_host,
+                    host.name,
+                    host.platform,
+                    f"{host.name} failed authentication.",
+                )
+                return True
+            except AsyncEngineTimeoutError:
+                await run_sync(
+                    log_executor,
+                    processor.report_failed_host,
+                    host.name,
+                    host.platform,
+                    f"{host.name} SSH Timeout Occured.",
+                )
+                return True
+            if auth_breaker:
+                auth_breaker.record_success(parameters.username, parameters.password)
+            command_outputs = await collect_host_outputs(
+                session,
+                command_plan.commands,
+                processor.logger,
+                processor.job,
+                options["read_timeout"],
+                options["latency_profile"],
+                log_executor=log_executor,
+            )
+        finally:
+            await session.close()
+    host.data["command_plan"] = command_plan
+    if processor.recorder:
+        for command, output in command_outputs.items():
+            # The failed commands have an empty list as output, like the failed subtasks they aren't recorded.
+            if isinstance(output, str):
+                processor.recorder.record(host, command, output)
+    # Parsing and extraction is CPU bound, it runs in a worker thread so that the other sessions keep being read.
+    return await run_sync(
+        None,
+        close_threaded_db_connections(processor.process_command_outputs),
+        host,
+        command_outputs,
+        options["command_getter_job"],
+        options["parser_context"],
+    )
+
+
+async def _run_group_limited_host(group_semaphore, host_run, processor, semaphore, options):
+    """Run a host once its group is below its concurrency limit, before taking one of the global sessions."""
+    async with group_semaphore:
+        return await _run_host(host_run, processor, semaphore, options)
+
+
+async def _run_hosts(host_runs, processor, options):
+    """Run every host concurrently, return the names of the hosts that failed."""
+    semaphore = asyncio.Semaphore(options["max_sessions"])
+    limiter = options["limiter"]
+    group_semaphores = {}
+    failed_hosts = []
+    tasks = {}
+    for host_run in host_runs:
+        host, _, _, group = host_run
+        if limiter and limiter.get_limit(group):
+            if group not in group_semaphores:
+                group_semaphores[group] = asyncio.Semaphore(limiter.get_limit(group))
+            coroutine = _run_group_limited_host(group_semaphores[group], host_run, processor, semaphore, options)
+        else:
+            coroutine = _run_host(host_run, processor, semaphore, options)
+        tasks[host] = asyncio.create_task(coroutine)
+    for host, task in tasks.items():
+        try:
+            failed = await task
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            await run_sync(
+                options["log_executor"],
+                processor.report_failed_host,
+                host.name,
+                host.platform,
+                f"{host.name} failed with exception {err}.",
+            )
+            failed = True
+        if failed:
+            failed_hosts.append(host.name)
+    return failed_hosts
+
+
+def run_async_command_getter(  # pylint: disable=too-many-arguments
+    hosts,
+    processor,
+    command_getter_yaml_data,
+    command_getter_job,
+    command_plans,
+    parser_context,
+    *,
+    max_sessions=None,
+    read_timeout=DEFAULT_READ_TIMEOUT,
+    session_class=AsyncSSHSession,
+    auth_breaker=None,
+    limiter=None,
+    latency_profile=None,
+):
+    """Collect the command outputs of all hosts in an asyncio event loop and hand them to the processor.
+
+    Args:
+        hosts (dict): Nornir hosts keyed by name, e.g. `nornir_obj.inventory.hosts`.
+        processor (CommandGetterProcessor): processor the outputs are processed by and failed hosts reported to.
+        command_getter_yaml_data (dict): command mappers of all platforms, see `add_platform_parsing_info`.
+        command_getter_job (str): sync_devices or sync_network_data.
+        command_plans (dict): CommandPlan keyed by platform, see `compile_command_plans`.
+        parser_context (dict): result of `get_parser_context()`.
+        max_sessions (int): maximum number of sessions open at once, defaults to the `asyncio_engine_max_sessions`
+            app setting.
+        read_timeout (int): seconds to wait for the output of each command.
+        session_class (type): session used to connect to the devices.
+        auth_breaker (AuthCircuitBreaker): breaker skipping the hosts whose credentials failed authentication on too
+            many other devices.
+        limiter (ConcurrencyLimiter): limiter of the number of sessions open at once in each group of hosts.
+        latency_profile (CommandLatencyProfile): profile the read timeouts are learned from, and latencies recorded to.
+
+    Returns:
+        list: names of the hosts that failed.
+    """
+    if asyncssh is None and session_class is AsyncSSHSession:
+        raise AsyncEngineError(
+            "The asyncio engine requires the asyncssh library, install it with `pip install nautobot-device-onboarding[asyncssh]`."
+        )
+    options = {
+        "command_getter_yaml_data": command_getter_yaml_data,
+        "command_getter_job": command_getter_job,
+        "command_plans": command_plans,
+        "parser_context": parser_context,
+        "max_sessions": max_sessions or PLUGIN_CFG.get("asyncio_engine_max_sessions", DEFAULT_MAX_SESSIONS),
+        "read_timeout": read_timeout,
+        "session_class": session_class,
+        "auth_breaker": auth_breaker,
+        "limiter": limiter,
+        "latency_profile": latency_profile,
+    }
+    host_runs, failed_hosts = _prepare_hosts(hosts, processor, options)
+    # The logs are written to the JobResult from a single thread, with a single database connection.
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="async_engine_log") as log_executor:
+        options["log_executor"] = log_executor
+        try:
+            failed_hosts.extend(asyncio.run(_run_hosts(host_runs, processor, options)))
+        finally:
+            log_executor.submit(connections.close_all).result()
+    return failed_hosts
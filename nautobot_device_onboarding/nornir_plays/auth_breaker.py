@@ -0,0 +1,82 @@
+"""Circuit breaker for the credentials that keep failing authentication.
+
+Hosts onboarded with the same SecretsGroup log in with the same credentials. Once these credentials failed
+authentication on a number of devices in a row, the remaining hosts using them are failed without logging in, instead
+of each waiting for its own authentication failure and risking to lock the account out on the AAA server.
+"""
+
+import hashlib
+import threading
+
+from nautobot_device_onboarding.constants import PLUGIN_CFG
+
+# Number of authentication failures in a row after which the credentials aren't tried anymore, see the
+# `auth_failure_threshold` app setting. The breaker is off unless the setting is set.
+DEFAULT_AUTH_FAILURE_THRESHOLD = 0
+
+
+class AuthCircuitOpenError(Exception):
+    """The credentials of the host failed authentication on too many devices to be tried again."""
+
+
+class AuthCircuitBreaker:
+    """Thread safe count of the authentication failures of each set of credentials during a job.
+
+    The count of a set of credentials is reset when they are accepted by a device, so that a device with a local
+    account doesn't stop the credentials from being tried on the other devices.
+    """
+
+    def __init__(self, threshold=None, logger=None):
+        """Initialize the breaker.
+
+        Args:
+            threshold (int): authentication failures in a row after which the credentials aren't tried anymore,
+                defaults to the `auth_failure_threshold` app setting. 0 disables the breaker.
+            logger (NornirLogger): logger the credentials that aren't tried anymore are reported to.
+        """
+        if threshold is None:
+            threshold = PLUGIN_CFG.get("auth_failure_threshold", DEFAULT_AUTH_FAILURE_THRESHOLD)
+        self.threshold = threshold
+        self.logger = logger
+        self.failures = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_key(username, password):
+        """Key the credentials by username and a digest of the password, the password itself isn't kept."""
+        return username, hashlib.sha256(str(password or "").encode()).hexdigest()
+
+    def is_open(self, username, password):
+        """Return whether the credentials failed authentication too many times to be tried again."""
+        if not self.threshold:
+            return False
+        with self._lock:
+            return self.failures.get(self._get_key(username, password), 0) >= self.threshold
+
+    def record_failure(self, username, password):
+        """Count an authentication failure of the credentials."""
+        if not self.threshold:
+            return
+        key = self._get_key(username, password)
+        with self._lock:
+            self.failures[key] = self.failures.get(key, 0) + 1
+            opened = self.failures[key] == self.threshold
+        if opened and self.logger:
+            self.logger.warning(
+                f"The credentials of user {username} failed authentication on {self.threshold} devices in a row, "
+                "the remaining devices using them will be skipped."
+            )
+
+    def record_success(self, username, password):
+        """Reset the authentication failure count of the credentials accepted by a device."""
+        if not self.threshold:
+            return
+        with self._lock:
+            self.failures.pop(self._get_key(username, password), None)
+
+    def get_failed_reason(self, host_name, username):
+        """Return the failure reason of a host skipped because its credentials failed authentication too often."""
+        return (
+            f"{host_name} skipped, the credentials of user {username} failed authentication on {self.threshold} "
+            "devices in a row."
+        )
@@ -1,9 +1,10 @@
 """CommandGetter."""
 
 import json
-import os
 import pprint
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from typing import Dict, Tuple, Union
 
@@ -13,114 +14,83 @@ from nautobot.extras.choices import SecretsGroupAccessTypeChoices, SecretsGroupS
 from nautobot.extras.models import SecretsGroup, SecretsGroupAssociation
 from nautobot_plugin_nornir.constants import NORNIR_SETTINGS
 from nautobot_plugin_nornir.plugins.inventory.nautobot_orm import NautobotORMInventory
+from netmiko.exceptions import NetmikoAuthenticationException
 from netutils.ping import tcp_ping
 from nornir import InitNornir
 from nornir.core.exceptions import NornirSubTaskError
 from nornir.core.plugins.inventory import InventoryPluginRegister
 from nornir.core.task import Result, Task
 from nornir_netmiko.tasks import netmiko_send_command
-from ntc_templates.parse import parse_output
-from ttp import ttp
 
 from nautobot_device_onboarding.constants import SUPPORTED_COMMAND_PARSERS
+from nautobot_device_onboarding.nornir_plays.async_engine import is_platform_supported, run_async_command_getter
+from nautobot_device_onboarding.nornir_plays.auth_breaker import AuthCircuitBreaker, AuthCircuitOpenError
+from nautobot_device_onboarding.nornir_plays.command_plan import (
+    compile_command_plan,
+    compile_command_plans,
+    merge_command_plans,
+)
+from nautobot_device_onboarding.nornir_plays.concurrency import ConcurrencyLimitedRunner, get_concurrency_limiter
 from nautobot_device_onboarding.nornir_plays.empty_inventory import EmptyInventory
+from nautobot_device_onboarding.nornir_plays.etl import (
+    get_etl_pool,
+    get_parser_context,
+    get_ttp_template_files,
+    parse_textfsm_output,
+    parse_ttp_output,
+)
 from nautobot_device_onboarding.nornir_plays.inventory_creator import _set_inventory
 from nautobot_device_onboarding.nornir_plays.logger import NornirLogger
+from nautobot_device_onboarding.nornir_plays.parsed_table import to_parsed_table
 from nautobot_device_onboarding.nornir_plays.processor import CommandGetterProcessor
-from nautobot_device_onboarding.nornir_plays.transform import (
-    add_platform_parsing_info,
-    get_git_repo_parser_path,
-    load_files_with_precedence,
+from nautobot_device_onboarding.nornir_plays.reachability import sweep_tcp_reachability
+from nautobot_device_onboarding.nornir_plays.recording import (
+    CommandOutputNotRecordedError,
+    get_command_output_recorder,
+    get_command_output_replay,
+    replay_send_command,
 )
+from nautobot_device_onboarding.nornir_plays.spool import get_command_output_spool
+from nautobot_device_onboarding.nornir_plays.transform import add_platform_parsing_info
+from nautobot_device_onboarding.utils.command_latency import get_command_latency_profile, get_command_read_timeout
 from nautobot_device_onboarding.utils.helper import (
-    check_for_required_file,
     close_threaded_db_connections,
     format_log_message,
+    get_job_option,
 )
 
-PARSER_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), "parsers"))
-
 InventoryPluginRegister.register("nautobot-inventory", NautobotORMInventory)
 InventoryPluginRegister.register("empty-inventory", EmptyInventory)
 
 
-def deduplicate_command_list(data):
-    """Deduplicates a list of dictionaries based on 'command' and 'parser' keys.
-
-    Args:
-        data: A list of dictionaries.
-
-    Returns:
-        A new list containing only unique elements based on 'command' and 'parser'.
-    """
-    seen = set()
-    unique_list = []
-    for item in data:
-        # Create a tuple containing only 'command' and 'parser' for comparison
-        key = (item["command"], item["parser"])
-        if key not in seen:
-            seen.add(key)
-            unique_list.append(item)
-    return unique_list
-
-
 def _get_commands_to_run(yaml_parsed_info, sync_vlans, sync_vrfs, sync_cables, sync_software_version):
     """Using merged command mapper info and look up all commands that need to be run."""
-    all_commands = []
-    for key, value in yaml_parsed_info.items():
-        if key == "pre_processor":
-            for pre_processor, v in value.items():
-                if not sync_vlans and pre_processor == "vlan_map":
-                    continue
-                current_root_key = v.get("commands")
-                if isinstance(current_root_key, list):
-                    # Means their is any "nested" structures. e.g multiple commands
-                    for command in v["commands"]:
-                        all_commands.append(command)
-                else:
-                    if isinstance(current_root_key, dict):
-                        all_commands.append(current_root_key)
-        else:
-            # Deduplicate commands + parser key
-            current_root_key = value.get("commands")
-            if isinstance(current_root_key, list):
-                # Means there is a "nested" structures. e.g. multiple commands
-                for command in value["commands"]:
-                    # If syncing vlans isn't in scope don't run the unneeded commands.
-                    if not sync_vlans and key in ["interfaces__tagged_vlans", "interfaces__untagged_vlan"]:
-                        continue
-                    # If syncing vrfs isn't in scope remove the unneeded commands.
-                    if not sync_vrfs and key == "interfaces__vrf":
-                        continue
-                    # If syncing cables isn't in scope remove the unneeded commands.
-                    if not sync_cables and key == "cables":
-                        continue
-                    # If syncing software_versions isn't in scope remove the unneeded commands.
-                    if not sync_software_version and key == "software_version":
-                        continue
-                    all_commands.append(command)
-            else:
-                if isinstance(current_root_key, dict):
-                    # Means there isn't a "nested" structures. e.g. 1 command
-                    # If syncing vlans isn't in scope don't run the unneeded commands.
-                    if not sync_vlans and key in ["interfaces__tagged_vlans", "interfaces__untagged_vlan"]:
-                        continue
-                    # If syncing vrfs isn't in scope remove the unneeded commands.
-                    if not sync_vrfs and key == "interfaces__vrf":
-                        continue
-                    # If syncing cables isn't in scope remove the unneeded commands.
-                    if not sync_cables and key == "cables":
-                        continue
-                    # If syncing software_versions isn't in scope remove the unneeded commands.
-                    if not sync_software_version and key == "software_version":
-                        continue
-                    all_commands.append(current_root_key)
-    return deduplicate_command_list(all_commands)
+    command_plan = compile_command_plan(yaml_parsed_info, sync_vlans, sync_vrfs, sync_cables, sync_software_version)
+    return list(command_plan.commands)
 
 
 @close_threaded_db_connections
-def netmiko_send_commands(task: Task, command_getter_yaml_data: Dict, command_getter_job: str, logger, nautobot_job):
-    """Run commands specified in PLATFORM_COMMAND_MAP."""
+def netmiko_send_commands(
+    task: Task,
+    command_getter_yaml_data: Dict,
+    command_getter_job: str,
+    logger,
+    nautobot_job,
+    textfsm_template_dir=None,
+    ttp_template_files=None,
+    command_plans=None,
+    auth_breaker=None,
+    latency_profile=None,
+    replay=None,
+):
+    """Run commands specified in PLATFORM_COMMAND_MAP.
+
+    `textfsm_template_dir` and `ttp_template_files` are resolved once per job with `get_parser_context`, and
+    `command_plans` compiled once per job with `compile_command_plans`. The `auth_breaker` shared by all hosts of the
+    job skips the hosts whose credentials failed authentication on too many other devices. The read timeout of each
+    command is its `read_timeout` in the command mapper, or learned by the `latency_profile` from previous runs. With
+    a `replay`, the outputs of the commands are the recorded ones instead of the outputs of the device.
+    """
     if not task.host.platform:
         return Result(host=task.host, result=f"{task.host.name} has no platform set.", failed=True)
     if task.host.platform not in get_all_network_driver_mappings().keys() or not "cisco_wlc_ssh":
@@ -129,19 +99,31 @@ def netmiko_send_commands(task: Task, command_getter_yaml_data: Dict, command_ge
         return Result(
             host=task.host, result=f"{task.host.name} has missing definitions in command_mapper YAML file.", failed=True
         )
-    if nautobot_job.connectivity_test:
+    # Hosts are checked before the Nornir run by `_sweep_unreachable_hosts`, which records their latency.
+    if nautobot_job.connectivity_test and "tcp_latency" not in task.host.data and not replay:
         if not tcp_ping(task.host.hostname, task.host.port if task.host.port else 22):
             return Result(
                 host=task.host, result=f"{task.host.name} failed connectivity check via tcp_ping.", failed=True
             )
+    if auth_breaker and not replay:
+        connection_parameters = task.host.get_connection_parameters("netmiko")
+        username, password = connection_parameters.username, connection_parameters.password
+        if auth_breaker.is_open(username, password):
+            return Result(host=task.host, result=auth_breaker.get_failed_reason(task.host.name, username), failed=True)
     task.host.data["platform_parsing_info"] = command_getter_yaml_data[task.host.platform]
-    commands = _get_commands_to_run(
-        command_getter_yaml_data[task.host.platform][command_getter_job],
-        getattr(nautobot_job, "sync_vlans", False),
-        getattr(nautobot_job, "sync_vrfs", False),
-        getattr(nautobot_job, "sync_cables", False),
-        getattr(nautobot_job, "sync_software_version", False),
-    )
+    command_plan = command_plans.get(task.host.platform) if command_plans else None
+    if command_plan:
+        # The formatter extracts the data with the same plan, see extract_show_data.
+        task.host.data["command_plan"] = command_plan
+        commands = command_plan.commands
+    else:
+        commands = _get_commands_to_run(
+            command_getter_yaml_data[task.host.platform][command_getter_job],
+            getattr(nautobot_job, "sync_vlans", False),
+            getattr(nautobot_job, "sync_vrfs", False),
+            getattr(nautobot_job, "sync_cables", False),
+            getattr(nautobot_job, "sync_software_version", False),
+        )
     if (
         getattr(nautobot_job, "sync_cables", False)
         and "cables" not in command_getter_yaml_data[task.host.platform][command_getter_job].keys()
@@ -151,20 +133,42 @@ def netmiko_send_commands(task: Task, command_getter_yaml_data: Dict, command_ge
         )
 
     logger.debug(f"Commands to run: {[cmd['command'] for cmd in commands]}")
+    # When parsing runs in the ETL process pool, or the outputs are spooled, the raw outputs are handed over as is, see
+    # CommandGetterProcessor.
+    parse_in_process_pool = get_job_option(nautobot_job, "parse_in_process_pool", False) or get_job_option(
+        nautobot_job, "spool_command_outputs", False
+    )
+    send_command_task = netmiko_send_command
+    send_command_kwargs = {}
+    if replay:
+        send_command_task = replay_send_command
+        send_command_kwargs["replay"] = replay
     # All commands in this for loop are running within 1 device connection.
     for result_idx, command in enumerate(commands):
-        send_command_kwargs = {}
+        if latency_profile:
+            read_timeout = latency_profile.get_read_timeout(task.host.hostname, command)
+        else:
+            read_timeout = get_command_read_timeout(command)
+        # The first command opens the connection, its latency includes the login and isn't recorded.
+        connected = "netmiko" in task.host.connections
         try:
+            started = time.monotonic()
             current_result = task.run(
-                task=netmiko_send_command,
+                task=send_command_task,
                 name=command["command"],
                 command_string=command["command"],
-                read_timeout=60,
+                read_timeout=read_timeout,
                 **send_command_kwargs,
             )
+            if latency_profile and connected:
+                latency_profile.record(task.host.hostname, command["command"], time.monotonic() - started)
+            if auth_breaker and not replay:
+                auth_breaker.record_success(username, password)
             if nautobot_job.debug:
                 log_message = format_log_message(pprint.pformat(current_result.result))
                 logger.debug(f"Result of '{command['command']}' command:<br><br>{log_message}")
+            if parse_in_process_pool:
+                continue
             if command.get("parser") in SUPPORTED_COMMAND_PARSERS:
                 if isinstance(current_result.result, str):
                     if "Invalid input detected at" in current_result.result:
@@ -176,29 +180,18 @@ def netmiko_send_commands(task: Task, command_getter_yaml_data: Dict, command_ge
                     else:
                         if command["parser"] == "textfsm":
                             try:
-                                # Look for custom textfsm templates in the git repo
-                                git_template_dir = get_git_repo_parser_path(parser_type="textfsm")
-                                if git_template_dir:
-                                    if not check_for_required_file(git_template_dir, "index"):
-                                        logger.debug(
-                                            f"Unable to find required index file in {git_template_dir} for textfsm parsing. Falling back to default templates."
-                                        )
-                                        git_template_dir = None
-                                # Parsing textfsm ourselves instead of using netmikos use_<parser> function to be able to handle exceptions
-                                # ourselves. Default for netmiko is if it can't parse to return raw text which is tougher to handle.
-                                parsed_output = parse_output(
+                                parsed_output = parse_textfsm_output(
                                     platform=get_all_network_driver_mappings()[task.host.platform]["ntc_templates"],
-                                    template_dir=git_template_dir if git_template_dir else None,
                                     command=command["command"],
                                     data=current_result.result,
-                                    try_fallback=bool(git_template_dir),
+                                    template_dir=textfsm_template_dir,
                                 )
                                 if nautobot_job.debug:
                                     log_message = format_log_message(pprint.pformat(parsed_output))
                                     logger.debug(
                                         f"Parsed output of '{command['command']}' command:<br><br>{log_message}"
                                     )
-                                task.results[result_idx].result = parsed_output
+                                task.results[result_idx].result = to_parsed_table(parsed_output)
                                 task.results[result_idx].failed = False
                             except Exception:  # https://github.com/networktocode/ntc-templates/issues/369
                                 if nautobot_job.fail_job_on_task_failure:
@@ -219,18 +212,12 @@ def netmiko_send_commands(task: Task, command_getter_yaml_data: Dict, command_ge
                             try:
                                 # Parsing ttp ourselves instead of using netmikos use_<parser> function to be able to handle exceptions
                                 # ourselves.
-                                ttp_template_files = load_files_with_precedence(
-                                    filesystem_dir=f"{PARSER_DIR}/ttp", parser_type="ttp"
-                                )
+                                if ttp_template_files is None:
+                                    ttp_template_files = get_ttp_template_files()
                                 template_name = f"{task.host.platform}_{command['command'].replace(' ', '_')}.ttp"
-                                parser = ttp(
-                                    data=current_result.result,
-                                    template=ttp_template_files[template_name],
+                                task.results[result_idx].result = to_parsed_table(
+                                    parse_ttp_output(ttp_template_files[template_name], current_result.result)
                                 )
-                                parser.parse()
-                                parsed_result = parser.result(format="json")[0]
-                                # task.results[result_idx].result = json.loads(json.dumps(parsed_result))
-                                task.results[result_idx].result = json.loads(parsed_result)
                                 task.results[result_idx].failed = False
                             except Exception:
                                 if nautobot_job.fail_job_on_task_failure:
@@ -263,9 +250,13 @@ def netmiko_send_commands(task: Task, command_getter_yaml_data: Dict, command_ge
             # These exceptions indicate that the device is unreachable or the credentials are incorrect.
             # We should fail the task early to avoid trying all commands on a device that is unreachable.
             if type(task.results[result_idx].exception).__name__ == "NetmikoAuthenticationException":
+                if auth_breaker and not replay:
+                    auth_breaker.record_failure(username, password)
                 return Result(host=task.host, result=f"{task.host.name} failed authentication.", failed=True)
             if type(task.results[result_idx].exception).__name__ == "NetmikoTimeoutException":
                 return Result(host=task.host, result=f"{task.host.name} SSH Timeout Occured.", failed=True)
+            if latency_profile and type(task.results[result_idx].exception).__name__ == "ReadTimeout":
+                latency_profile.record_timeout(task.host.hostname, command["command"])
             # We don't want to fail the entire subtask if SubTaskError is hit, set result to empty list and failed to False
             # Handle this type or result latter in the ETL process.
             task.results[result_idx].result = []
@@ -304,6 +295,199 @@ def _parse_credentials(secrets_group: Union[SecretsGroup, None], logger: NornirL
     return (username, password)
 
 
+def _sweep_unreachable_hosts(targets, processor, logger):
+    """Check the reachability of all hosts at once, and report the unreachable ones as failed.
+
+    Args:
+        targets (dict): (hostname, port, platform) tuples keyed by host name.
+        processor (CommandGetterProcessor): processor the unreachable hosts are reported to.
+        logger (NornirLogger): logger for the job.
+
+    Returns:
+        dict: seconds it took to open a TCP connection to each reachable host, keyed by host name.
+    """
+    started = time.monotonic()
+    latencies = sweep_tcp_reachability({name: (hostname, port or 22) for name, (hostname, port, _) in targets.items()})
+    reachable = {}
+    for name, latency in latencies.items():
+        if latency is None:
+            processor.report_failed_host(name, targets[name][2], f"{name} failed connectivity check via tcp_ping.")
+        else:
+            reachable[name] = latency
+            logger.debug(f"{name} is reachable, TCP connection opened in {latency * 1000:.1f} ms.")
+    logger.info(
+        f"Connectivity check: {len(reachable)} of {len(targets)} hosts reachable, "
+        f"checked in {time.monotonic() - started:.1f} seconds."
+    )
+    return reachable
+
+
+def _get_runner_num_workers():
+    """Return the number of hosts the configured Nornir runner works on concurrently."""
+    runner = NORNIR_SETTINGS.get("runner") or {}
+    if runner.get("plugin", "threaded") != "threaded":
+        return 1
+    # 20 is the default number of workers of the threaded runner.
+    return (runner.get("options") or {}).get("num_workers", 20)
+
+
+def _autodetect_inventory(kwargs, auth_breaker=None):
+    """Construct the Nornir inventory of a host without a platform, counting the autodetection login in the breaker."""
+    if auth_breaker and auth_breaker.is_open(kwargs["username"], kwargs["password"]):
+        return {}, AuthCircuitOpenError(auth_breaker.get_failed_reason(kwargs["host_ip"], kwargs["username"]))
+    inventory, exc_info = _set_inventory(**kwargs)
+    if auth_breaker:
+        if isinstance(exc_info, NetmikoAuthenticationException):
+            auth_breaker.record_failure(kwargs["username"], kwargs["password"])
+        elif not exc_info:
+            auth_breaker.record_success(kwargs["username"], kwargs["password"])
+    return inventory, exc_info
+
+
+def _replay_inventory(kwargs, replay):
+    """Construct the Nornir inventory of a host without a platform, with the platform its outputs were recorded with."""
+    network_driver = replay.get_platform(kwargs["host_ip"])
+    if not network_driver:
+        return {}, CommandOutputNotRecordedError(f"No command outputs were recorded for {kwargs['host_ip']}.")
+    return _set_inventory(**kwargs, network_driver=network_driver)
+
+
+def _set_inventories(inventory_kwargs, auth_breaker=None, replay=None):
+    """Construct the Nornir inventory of each host, autodetecting the platforms concurrently.
+
+    Platform autodetection logs in to the device, so hosts without a platform are constructed in a thread pool sized
+    like the Nornir runner, instead of one login after the other. With a `replay`, the platforms aren't autodetected,
+    they're the platforms the outputs were recorded with.
+
+    Args:
+        inventory_kwargs (dict): `_set_inventory` keyword arguments keyed by host ip address.
+        auth_breaker (AuthCircuitBreaker): breaker counting the authentication failures of the autodetection logins.
+        replay (CommandOutputReplay): recorded outputs replayed instead of connecting to the devices.
+
+    Returns:
+        dict: `_set_inventory` result keyed by host ip address, in the order of `inventory_kwargs`.
+    """
+    results = {}
+    autodetect = {}
+    for ip_address, kwargs in inventory_kwargs.items():
+        if kwargs["platform"]:
+            results[ip_address] = _set_inventory(**kwargs)
+        elif replay:
+            results[ip_address] = _replay_inventory(kwargs, replay)
+        else:
+            results[ip_address] = None
+            autodetect[ip_address] = kwargs
+    if autodetect:
+        with ThreadPoolExecutor(max_workers=min(_get_runner_num_workers(), len(autodetect))) as executor:
+            futures = {
+                ip_address: executor.submit(_autodetect_inventory, kwargs, auth_breaker)
+                for ip_address, kwargs in autodetect.items()
+            }
+        for ip_address, future in futures.items():
+            results[ip_address] = future.result()
+    return results
+
+
+def _compile_command_plans(job, command_getter_yaml_data, command_getter_job):
+    """Compile the CommandPlan of every platform for the job type, with the sync options of the job."""
+    return compile_command_plans(
+        command_getter_yaml_data,
+        command_getter_job,
+        sync_vlans=getattr(job, "sync_vlans", False),
+        sync_vrfs=getattr(job, "sync_vrfs", False),
+        sync_cables=getattr(job, "sync_cables", False),
+        sync_software_version=getattr(job, "sync_software_version", False),
+    )
+
+
+def _run_commands(  # pylint: disable=too-many-arguments
+    nr_with_processors, processor, job, logger, command_getter_job, parser_context, auth_breaker=None, replay=None
+):
+    """Run the commands of the job on every host of the inventory, with Nornir or the asyncio engine.
+
+    Args:
+        nr_with_processors (Nornir): Nornir object with the inventory and the processor.
+        processor (CommandGetterProcessor): processor the command outputs are handed to.
+        job (Job): the Nautobot job.
+        logger (NornirLogger): logger for the job.
+        command_getter_job (str): sync_devices or sync_network_data.
+        parser_context (dict): result of `get_parser_context()`.
+        auth_breaker (AuthCircuitBreaker): breaker shared by all hosts, skipping the credentials failing authentication.
+        replay (CommandOutputReplay): recorded outputs replayed instead of connecting to the devices.
+    """
+    command_getter_yaml_data = nr_with_processors.inventory.defaults.data["platform_parsing_info"]
+    command_plans = _compile_command_plans(job, command_getter_yaml_data, command_getter_job)
+    if processor.network_data_plans:
+        # The sync_network_data commands run in the same connection, their outputs are extracted by the processor.
+        command_plans = {
+            platform: (
+                merge_command_plans(command_plan, processor.network_data_plans[platform])
+                if platform in processor.network_data_plans
+                else command_plan
+            )
+            for platform, command_plan in command_plans.items()
+        }
+    limiter = get_concurrency_limiter()
+    latency_profile = None
+    if not replay:
+        # Replayed outputs take no time, they would skew the learned read timeouts.
+        latency_profile = get_command_latency_profile(
+            [host.hostname for host in nr_with_processors.inventory.hosts.values()]
+        )
+    try:
+        # The asyncio engine only collects outputs from the devices, recorded outputs are replayed by Nornir.
+        if get_job_option(job, "use_asyncio_engine", False) and not replay:
+            hosts = nr_with_processors.inventory.hosts
+            nornir_host_names = {
+                name for name, host in hosts.items() if host.platform and not is_platform_supported(host.platform)
+            }
+            for name in sorted(nornir_host_names):
+                logger.info(
+                    f"The asyncio engine doesn't support the {hosts[name].platform} platform of {name}, "
+                    "its commands are run by the Nornir runner.",
+                    extra={"object": name},
+                )
+            failed_hosts = run_async_command_getter(
+                {name: host for name, host in hosts.items() if name not in nornir_host_names},
+                processor,
+                command_getter_yaml_data,
+                command_getter_job,
+                command_plans,
+                parser_context,
+                auth_breaker=auth_breaker,
+                limiter=limiter,
+                latency_profile=latency_profile,
+            )
+            if job.fail_job_on_task_failure and failed_hosts:
+                raise RuntimeError(f"Collecting command outputs failed for {failed_hosts}.")
+            if not nornir_host_names:
+                return
+            nr_with_processors = nr_with_processors.filter(filter_func=lambda host: host.name in nornir_host_names)
+        if limiter:
+            # Hosts are handed to the workers once their group is below its concurrency limit.
+            nr_with_processors = nr_with_processors.with_runner(
+                ConcurrencyLimitedRunner(num_workers=_get_runner_num_workers(), limiter=limiter)
+            )
+        result = nr_with_processors.run(
+            task=netmiko_send_commands,
+            command_getter_yaml_data=command_getter_yaml_data,
+            command_getter_job=command_getter_job,
+            logger=logger,
+            nautobot_job=job,
+            textfsm_template_dir=parser_context["textfsm_template_dir"],
+            ttp_template_files=parser_context["ttp_template_files"],
+            command_plans=command_plans,
+            auth_breaker=auth_breaker,
+            latency_profile=latency_profile,
+            replay=replay,
+        )
+        if job.fail_job_on_task_failure and result.failed:
+            raise RuntimeError(f"netmiko_send_commads task failed with {result.failed_hosts.items()}.")
+    finally:
+        if latency_profile:
+            latency_profile.save()
+
+
 def sync_devices_command_getter(job, log_level):
     """Nornir play to run show commands for sync_devices ssot job."""
     logger = NornirLogger(job.job_result, log_level)
@@ -311,14 +495,38 @@ def sync_devices_command_getter(job, log_level):
     # Initiate Nornir instance with empty inventory
     try:
         compiled_results = {}
-        with InitNornir(
-            runner=NORNIR_SETTINGS.get("runner"),
-            logging={"enabled": False},
-            inventory={
-                "plugin": "empty-inventory",
-            },
-        ) as nornir_obj:
-            nr_with_processors = nornir_obj.with_processors([CommandGetterProcessor(logger, compiled_results, job)])
+        parser_context = get_parser_context(logger)
+        with (
+            InitNornir(
+                runner=NORNIR_SETTINGS.get("runner"),
+                logging={"enabled": False},
+                inventory={
+                    "plugin": "empty-inventory",
+                },
+            ) as nornir_obj,
+            get_command_output_recorder(job) as recorder,
+            # The spool is removed once the ETL process pool, which reads from it, is shut down.
+            get_command_output_spool(job) as spool,
+            get_etl_pool(job, "sync_devices", parser_context) as etl_pool,
+        ):
+            replay = get_command_output_replay(job)
+            network_data_plans = None
+            if getattr(job, "collect_network_data", False):
+                network_data_plans = _compile_command_plans(
+                    job, nornir_obj.inventory.defaults.data["platform_parsing_info"], "sync_network_data"
+                )
+            processor = CommandGetterProcessor(
+                logger,
+                compiled_results,
+                job,
+                etl_pool=etl_pool,
+                network_data_plans=network_data_plans,
+                spool=spool,
+                recorder=recorder,
+            )
+            nr_with_processors = nornir_obj.with_processors([processor])
+            auth_breaker = AuthCircuitBreaker(logger=logger)
+            inventory_kwargs = {}
             for ip_address, values in job.ip_address_inventory.items():
                 # parse secrets from secrets groups provided via csv
                 secrets_group = values["secrets_group"]
@@ -327,32 +535,58 @@ def sync_devices_command_getter(job, log_level):
                     username, password = _parse_credentials(secrets_group, logger=logger)
                     if not username or not password:
                         logger.error(f"Unable to onboard {values['original_ip_address']}, failed to parse credentials")
-                    single_host_inventory_constructed, exc_info = _set_inventory(
-                        host_ip=ip_address,
-                        platform=values["platform"],
-                        port=values["port"],
-                        username=username,
-                        password=password,
-                    )
-                    if exc_info:
-                        logger.error(
-                            f"Unable to onboard {values['original_ip_address']}, failed with exception {exc_info}"
-                        )
-                        if job.fail_job_on_task_failure:
-                            raise RuntimeError(
-                                f"Unable to onboard {values['original_ip_address']}, failed with exception {exc_info}."
-                            ) from exc_info
-                        continue
+                    inventory_kwargs[ip_address] = {
+                        "host_ip": ip_address,
+                        "platform": values["platform"],
+                        "port": values["port"],
+                        "username": username,
+                        "password": password,
+                    }
+            tcp_latencies = {}
+            unreachable_hosts = []
+            if job.connectivity_test and not replay:
+                # Unreachable hosts are dropped before their platform is autodetected.
+                tcp_latencies = _sweep_unreachable_hosts(
+                    {
+                        ip_address: (ip_address, kwargs["port"], kwargs["platform"])
+                        for ip_address, kwargs in inventory_kwargs.items()
+                    },
+                    processor,
+                    logger,
+                )
+                unreachable_hosts = [ip_address for ip_address in inventory_kwargs if ip_address not in tcp_latencies]
+                inventory_kwargs = {
+                    ip_address: kwargs for ip_address, kwargs in inventory_kwargs.items() if ip_address in tcp_latencies
+                }
+            for ip_address, (single_host_inventory_constructed, exc_info) in _set_inventories(
+                inventory_kwargs, auth_breaker, replay
+            ).items():
+                if exc_info:
+                    original_ip_address = job.ip_address_inventory[ip_address]["original_ip_address"]
+                    logger.error(f"Unable to onboard {original_ip_address}, failed with exception {exc_info}")
+                    if job.fail_job_on_task_failure:
+                        raise RuntimeError(
+                            f"Unable to onboard {original_ip_address}, failed with exception {exc_info}."
+                        ) from exc_info
+                    continue
+                for host in single_host_inventory_constructed.values():
+                    # Read by the ConcurrencyLimiter, the device isn't in Nautobot yet.
+                    host.data["onboarding_location"] = job.ip_address_inventory[ip_address]["location"]
+                    if ip_address in tcp_latencies:
+                        host.data["tcp_latency"] = tcp_latencies[ip_address]
                 nr_with_processors.inventory.hosts.update(single_host_inventory_constructed)
-            result = nr_with_processors.run(
-                task=netmiko_send_commands,
-                command_getter_yaml_data=nr_with_processors.inventory.defaults.data["platform_parsing_info"],
-                command_getter_job="sync_devices",
-                logger=logger,
-                nautobot_job=job,
+            _run_commands(
+                nr_with_processors, processor, job, logger, "sync_devices", parser_context, auth_breaker, replay
             )
-            if job.fail_job_on_task_failure and result.failed:
-                raise RuntimeError(f"netmiko_send_commads task failed with {result.failed_hosts.items()}.")
+            if recorder:
+                recorder.save(job)
+            etl_failed_hosts = processor.collect_etl_results()
+            if network_data_plans is not None:
+                job.network_data_command_getter_result = processor.network_data
+            if job.fail_job_on_task_failure and unreachable_hosts:
+                raise RuntimeError(f"Connectivity check failed for {unreachable_hosts}.")
+            if job.fail_job_on_task_failure and etl_failed_hosts:
+                raise RuntimeError(f"Parsing command outputs failed for {etl_failed_hosts}.")
     except Exception as err:  # pylint: disable=broad-exception-caught
         if job.fail_job_on_task_failure:
             raise RuntimeError("Error During Sync Devices Command Getter.") from err
@@ -376,35 +610,61 @@ def sync_network_data_command_getter(job, log_level):
         qs = job.filtered_devices
         if not qs:
             return None
-        with InitNornir(
-            runner=NORNIR_SETTINGS.get("runner"),
-            logging={"enabled": False},
-            inventory={
-                "plugin": "nautobot-inventory",
-                "options": {
-                    "credentials_class": NORNIR_SETTINGS.get("credentials"),
-                    "queryset": qs,
-                    "defaults": {
-                        "platform_parsing_info": add_platform_parsing_info(),
-                        "network_driver_mappings": list(get_all_network_driver_mappings().keys()),
-                        "sync_vlans": job.sync_vlans,
-                        "sync_vrfs": job.sync_vrfs,
-                        "sync_cables": job.sync_cables,
-                        "sync_software_version": job.sync_software_version,
+        parser_context = get_parser_context(logger)
+        with (
+            InitNornir(
+                runner=NORNIR_SETTINGS.get("runner"),
+                logging={"enabled": False},
+                inventory={
+                    "plugin": "nautobot-inventory",
+                    "options": {
+                        "credentials_class": NORNIR_SETTINGS.get("credentials"),
+                        "queryset": qs,
+                        "defaults": {
+                            "platform_parsing_info": add_platform_parsing_info(),
+                            "network_driver_mappings": list(get_all_network_driver_mappings().keys()),
+                            "sync_vlans": job.sync_vlans,
+                            "sync_vrfs": job.sync_vrfs,
+                            "sync_cables": job.sync_cables,
+                            "sync_software_version": job.sync_software_version,
+                        },
                     },
                 },
-            },
-        ) as nornir_obj:
-            nr_with_processors = nornir_obj.with_processors([CommandGetterProcessor(logger, compiled_results, job)])
-            result = nr_with_processors.run(
-                task=netmiko_send_commands,
-                command_getter_yaml_data=nr_with_processors.inventory.defaults.data["platform_parsing_info"],
-                command_getter_job="sync_network_data",
-                logger=logger,
-                nautobot_job=job,
+            ) as nornir_obj,
+            get_command_output_recorder(job) as recorder,
+            # The spool is removed once the ETL process pool, which reads from it, is shut down.
+            get_command_output_spool(job) as spool,
+            get_etl_pool(job, "sync_network_data", parser_context) as etl_pool,
+        ):
+            replay = get_command_output_replay(job)
+            processor = CommandGetterProcessor(
+                logger, compiled_results, job, etl_pool=etl_pool, spool=spool, recorder=recorder
+            )
+            nr_with_processors = nornir_obj.with_processors([processor])
+            unreachable_hosts = []
+            if job.connectivity_test and not replay:
+                hosts = nr_with_processors.inventory.hosts
+                tcp_latencies = _sweep_unreachable_hosts(
+                    {name: (host.hostname, host.port, host.platform) for name, host in hosts.items()},
+                    processor,
+                    logger,
+                )
+                unreachable_hosts = [name for name in hosts if name not in tcp_latencies]
+                for name in unreachable_hosts:
+                    del hosts[name]
+                for name, latency in tcp_latencies.items():
+                    hosts[name].data["tcp_latency"] = latency
+            auth_breaker = AuthCircuitBreaker(logger=logger)
+            _run_commands(
+                nr_with_processors, processor, job, logger, "sync_network_data", parser_context, auth_breaker, replay
             )
-            if job.fail_job_on_task_failure and result.failed:
-                raise RuntimeError(f"netmiko_send_commads task failed with {result.failed_hosts.items()}.")
+            if recorder:
+                recorder.save(job)
+            etl_failed_hosts = processor.collect_etl_results()
+            if job.fail_job_on_task_failure and unreachable_hosts:
+                raise RuntimeError(f"Connectivity check failed for {unreachable_hosts}.")
+            if job.fail_job_on_task_failure and etl_failed_hosts:
+                raise RuntimeError(f"Parsing command outputs failed for {etl_failed_hosts}.")
     except Exception as err:  # pylint: disable=broad-exception-caught
         if job.fail_job_on_task_failure:
             raise RuntimeError("Error During Sync Network Data Command Getter.") from err
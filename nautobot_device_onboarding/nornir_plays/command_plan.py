@@ -0,0 +1,255 @@
+"""Compile command mappers into the plan of commands to run and fields to extract for a platform."""
+
+from functools import lru_cache
+
+from jinja2 import Environment, TemplateSyntaxError, nodes
+
+from nautobot_device_onboarding.post_processors import get_post_processor
+
+# Fields that are only extracted, and whose commands are only run, if the job sync option is enabled.
+SYNC_OPTION_FIELDS = {
+    "sync_vlans": ("interfaces__tagged_vlans", "interfaces__untagged_vlan"),
+    "sync_vrfs": ("interfaces__vrf",),
+    "sync_cables": ("cables",),
+    "sync_software_version": ("software_version",),
+}
+
+# Pre processors that are only run if the job sync option is enabled.
+PRE_PROCESSOR_SYNC_OPTIONS = {
+    "vlan_map": "sync_vlans",
+}
+
+
+# Only used to find the variables of the jpath and post_processor templates, they're rendered by the formatter.
+_TEMPLATE_ENV = Environment(autoescape=True)
+
+
+@lru_cache(maxsize=2048)
+def get_template_variables(template_string):
+    """Return the names of the variables a jpath or post_processor template uses, None if it can't be parsed.
+
+    The names are read from the parsed template rather than compiling it, which would fail on the app's custom filters,
+    so the variables the template sets itself are included too.
+    """
+    try:
+        template = _TEMPLATE_ENV.parse(template_string)
+    except TemplateSyntaxError:
+        return None
+    return frozenset(name.name for name in template.find_all(nodes.Name) if name.ctx == "load")
+
+
+def get_command_context_keys(command):
+    """Return the keys of the render context a command definition uses, None if they can't be told.
+
+    The keys are the variables of its `jpath` and `post_processor` templates, or the `context_keys` its
+    `python_post_processor` was registered with.
+    """
+    context_keys = set()
+    for template_key in ("jpath", "post_processor"):
+        if not isinstance(command.get(template_key), str):
+            continue
+        template_variables = get_template_variables(command[template_key])
+        if template_variables is None:
+            return None
+        context_keys.update(template_variables)
+    if command.get("python_post_processor"):
+        try:
+            post_processor_context_keys = getattr(
+                get_post_processor(command["python_post_processor"]), "context_keys", None
+            )
+        except ValueError:
+            return None
+        if post_processor_context_keys is None:
+            return None
+        context_keys.update(post_processor_context_keys)
+    return context_keys
+
+
+def _get_field_pre_processors(commands, pre_processor_names):
+    """Return the names of the pre processors the commands of a field use, all of them if it can't be told."""
+    used_names = set()
+    for command in commands:
+        context_keys = get_command_context_keys(command)
+        if context_keys is None:
+            return tuple(pre_processor_names)
+        used_names.update(context_keys)
+    return tuple(name for name in pre_processor_names if name in used_names)
+
+
+def _as_command_list(commands):
+    """Normalize the `commands` of a command mapper field, a single command can be specified as a dict."""
+    if isinstance(commands, dict):
+        return [commands]
+    if isinstance(commands, list):
+        return commands
+    return []
+
+
+def deduplicate_command_list(data):
+    """Deduplicates a list of dictionaries based on 'command' and 'parser' keys.
+
+    A command defined several times keeps the longest `read_timeout` set on any of its definitions.
+
+    Args:
+        data: A list of dictionaries.
+
+    Returns:
+        A new list containing only unique elements based on 'command' and 'parser'.
+    """
+    seen = {}
+    unique_list = []
+    for item in data:
+        # Create a tuple containing only 'command' and 'parser' for comparison
+        key = (item["command"], item["parser"])
+        if key not in seen:
+            seen[key] = len(unique_list)
+            unique_list.append(item)
+            continue
+        kept = unique_list[seen[key]]
+        if item.get("read_timeout") and item["read_timeout"] > (kept.get("read_timeout") or 0):
+            # The command mapper definitions are shared, the kept definition is copied rather than modified.
+            unique_list[seen[key]] = {**kept, "read_timeout": item["read_timeout"]}
+    return unique_list
+
+
+class FieldPlan:
+    """A command mapper field (or pre processor) and the commands its value is extracted from."""
+
+    def __init__(self, name, commands, root_key=False, pre_processors=()):
+        """Initialize the field plan.
+
+        Args:
+            name (str): name of the field, e.g. `serial` or `interfaces__mtu`.
+            commands (list): command definitions from the command mapper.
+            root_key (bool): whether the field is the root key the nested `<root>__<field>` fields are keyed by.
+            pre_processors (tuple): names of the pre processors whose results the field is extracted with.
+        """
+        self.name = name
+        self.commands = tuple(commands)
+        self.root_key = bool(root_key)
+        self.nesting = tuple(name.split("__"))
+        self.pre_processors = tuple(pre_processors)
+
+    def __repr__(self):
+        """Return a representation showing the field and the commands it uses."""
+        return f"FieldPlan({self.name!r}, commands={[command['command'] for command in self.commands]})"
+
+
+class CommandPlan:
+    """What to run on, and extract from, the devices of a platform for a job type and set of sync options.
+
+    Plans are built once per platform and job run by `compile_command_plan` and shared by all hosts, they must not be
+    modified once built.
+    """
+
+    def __init__(self, pre_processors, fields, commands, sync_options):
+        """Initialize the command plan.
+
+        Args:
+            pre_processors (tuple): FieldPlan of each pre processor to run, in order.
+            fields (tuple): FieldPlan of each field to extract, in order.
+            commands (tuple): deduplicated command definitions to run on the device.
+            sync_options (dict): job sync options the plan was compiled for.
+        """
+        self.pre_processors = pre_processors
+        self.fields = fields
+        self.commands = commands
+        self.sync_options = sync_options
+
+    def __repr__(self):
+        """Return a representation showing the commands and fields of the plan."""
+        return (
+            f"CommandPlan(commands={[command['command'] for command in self.commands]}, "
+            f"fields={[field.name for field in self.fields]})"
+        )
+
+
+def compile_command_plan(
+    command_mapper, sync_vlans=False, sync_vrfs=False, sync_cables=False, sync_software_version=False
+):
+    """Compile the command mapper of a platform and job type into a CommandPlan.
+
+    Args:
+        command_mapper (dict): command mapper of a platform for a job type, e.g. `platform_parsing_info["sync_devices"]`.
+        sync_vlans (bool): extract the vlan fields and run their commands.
+        sync_vrfs (bool): extract the vrf fields and run their commands.
+        sync_cables (bool): extract the cable fields and run their commands.
+        sync_software_version (bool): extract the software version fields and run their commands.
+    """
+    sync_options = {
+        "sync_vlans": sync_vlans,
+        "sync_vrfs": sync_vrfs,
+        "sync_cables": sync_cables,
+        "sync_software_version": sync_software_version,
+    }
+    skipped_fields = {
+        field for option, fields in SYNC_OPTION_FIELDS.items() if not sync_options[option] for field in fields
+    }
+    pre_processor_mappers = {
+        pre_processor_name: pre_processor_data
+        for pre_processor_name, pre_processor_data in (command_mapper.get("pre_processor") or {}).items()
+        if sync_options.get(PRE_PROCESSOR_SYNC_OPTIONS.get(pre_processor_name), True)
+    }
+    fields = []
+    for key, value in command_mapper.items():
+        if key == "pre_processor" or key in skipped_fields:
+            continue
+        commands = _as_command_list(value.get("commands"))
+        fields.append(
+            FieldPlan(
+                key,
+                commands,
+                root_key=value.get("root_key"),
+                pre_processors=_get_field_pre_processors(commands, pre_processor_mappers),
+            )
+        )
+    # The pre processors that no field uses aren't run, nor their commands unless a field uses them too.
+    used_pre_processors = {name for field_plan in fields for name in field_plan.pre_processors}
+    pre_processors = [
+        FieldPlan(pre_processor_name, _as_command_list(pre_processor_data.get("commands")))
+        for pre_processor_name, pre_processor_data in pre_processor_mappers.items()
+        if pre_processor_name in used_pre_processors
+    ]
+    all_commands = [command for field_plan in pre_processors + fields for command in field_plan.commands]
+    return CommandPlan(
+        tuple(pre_processors), tuple(fields), tuple(deduplicate_command_list(all_commands)), sync_options
+    )
+
+
+def compile_command_plans(platform_parsing_info, command_getter_job, **sync_options):
+    """Compile the CommandPlan of every platform that has a command mapper for the job type.
+
+    Args:
+        platform_parsing_info (dict): command mappers of all platforms, see `add_platform_parsing_info`.
+        command_getter_job (str): sync_devices or sync_network_data.
+        sync_options: job sync options, see `compile_command_plan`.
+
+    Returns:
+        dict: CommandPlan keyed by platform.
+    """
+    return {
+        platform: compile_command_plan(command_mappers[command_getter_job], **sync_options)
+        for platform, command_mappers in platform_parsing_info.items()
+        if command_mappers and command_mappers.get(command_getter_job)
+    }
+
+
+def merge_command_plans(command_plan, *other_command_plans):
+    """Return a CommandPlan running the commands of all plans, and extracting the fields of the first one.
+
+    Used to run the commands of several job types in one connection to each device, the outputs are extracted with
+    each plan afterwards.
+
+    Args:
+        command_plan (CommandPlan): plan whose pre processors and fields are kept.
+        other_command_plans (CommandPlan): plans whose commands are run too.
+    """
+    commands = list(command_plan.commands)
+    for other_command_plan in other_command_plans:
+        commands.extend(other_command_plan.commands)
+    return CommandPlan(
+        command_plan.pre_processors,
+        command_plan.fields,
+        tuple(deduplicate_command_list(commands)),
+        command_plan.sync_options,
+    )
@@ -0,0 +1,182 @@
+"""Concurrency limits per group of hosts, e.g. per Location or per AAA server, on top of the global worker count.
+
+The number of hosts worked on at once is limited globally by the `num_workers` of the Nornir runner. The
+`concurrency_limits` app setting additionally limits the number of hosts worked on at once in each group of hosts,
+so that a slow WAN site or an AAA server isn't overloaded while the other groups keep all the workers busy.
+"""
+
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from nautobot.dcim.models import Location
+from nornir.core.task import AggregatedResult
+
+from nautobot_device_onboarding.constants import PLUGIN_CFG
+
+# Hosts are grouped by the name of their Location unless `group_by` is set in the `concurrency_limits` app setting.
+DEFAULT_GROUP_BY = "location"
+
+
+class ConcurrencyLimiter:
+    """Group the hosts and give the maximum number of hosts of each group worked on at once.
+
+    Hosts are grouped by:
+
+    - `location`: the name of the Location of the device.
+    - `location_type:<name>`: the name of the ancestor Location of the given Location Type, e.g. `location_type:Region`.
+    - `config_context:<key>`: the value of a key of the config context of the device, e.g. `config_context:aaa_server`.
+
+    Hosts without a group aren't limited.
+    """
+
+    def __init__(self, group_by=DEFAULT_GROUP_BY, default_limit=0, limits=None):
+        """Initialize the limiter.
+
+        Args:
+            group_by (str): how the hosts are grouped, see the class docstring.
+            default_limit (int): maximum number of hosts of a group worked on at once, 0 for no limit.
+            limits (dict): maximum number of hosts worked on at once keyed by group name, overriding `default_limit`.
+        """
+        self.group_by = group_by
+        self.default_limit = default_limit
+        self.limits = limits or {}
+        self.groups = {}
+
+    @staticmethod
+    def _get_host_location(host):
+        """Return the Location of the device of the host, or the Location it's onboarded in."""
+        device = host.data.get("obj")
+        if device is not None:
+            return device.location
+        return host.data.get("onboarding_location")
+
+    def _get_group(self, host):
+        if self.group_by.startswith("config_context:"):
+            return (host.data.get("config_context") or {}).get(self.group_by.split(":", 1)[1])
+        location = self._get_host_location(host)
+        if self.group_by.startswith("location_type:"):
+            location_type = self.group_by.split(":", 1)[1]
+            while location is not None and location.location_type.name != location_type:
+                location = location.parent
+        return location.name if location is not None else None
+
+    def _set_group(self, host_name, group):
+        self.groups[host_name] = str(group) if group is not None else None
+
+    def get_group(self, host):
+        """Return the name of the group of the host, None if it's not in a group."""
+        if host.name not in self.groups:
+            self._set_group(host.name, self._get_group(host))
+        return self.groups[host.name]
+
+    @staticmethod
+    def _get_host_location_id(host):
+        device = host.data.get("obj")
+        if device is not None:
+            return device.location_id
+        location = host.data.get("onboarding_location")
+        return location.pk if location is not None else None
+
+    def get_groups(self, hosts):
+        """Return the name of the group of each host keyed by host name, reading the Locations in a single query.
+
+        From then on `get_group` doesn't query the database for these hosts, so it can be called from an event loop.
+        """
+        hosts = list(hosts)
+        pending = [host for host in hosts if host.name not in self.groups]
+        if self.group_by.startswith("config_context:"):
+            for host in pending:
+                self.get_group(host)
+        elif pending:
+            location_ids = {host.name: self._get_host_location_id(host) for host in pending}
+            locations = Location.objects.all()
+            if not self.group_by.startswith("location_type:"):
+                # The ancestors of the Locations are only needed to group by Location Type.
+                locations = locations.filter(pk__in={pk for pk in location_ids.values() if pk is not None})
+            # pk: (name, parent pk, location type name)
+            locations = {
+                pk: (name, parent_id, location_type)
+                for pk, name, parent_id, location_type in locations.values_list(
+                    "pk", "name", "parent_id", "location_type__name"
+                )
+            }
+            location_type = self.group_by.split(":", 1)[1] if self.group_by.startswith("location_type:") else None
+            for host_name, location_id in location_ids.items():
+                while location_type and location_id in locations and locations[location_id][2] != location_type:
+                    location_id = locations[location_id][1]
+                self._set_group(host_name, locations[location_id][0] if location_id in locations else None)
+        return {host.name: self.groups[host.name] for host in hosts}
+
+    def get_limit(self, group):
+        """Return the maximum number of hosts of the group worked on at once, 0 for no limit."""
+        if group is None:
+            return 0
+        return self.limits.get(group, self.default_limit)
+
+
+def get_concurrency_limiter():
+    """Return the ConcurrencyLimiter configured by the `concurrency_limits` app setting, None if there are no limits."""
+    settings = PLUGIN_CFG.get("concurrency_limits") or {}
+    if not settings.get("default_limit") and not settings.get("limits"):
+        return None
+    return ConcurrencyLimiter(
+        group_by=settings.get("group_by", DEFAULT_GROUP_BY),
+        default_limit=settings.get("default_limit", 0),
+        limits=settings.get("limits"),
+    )
+
+
+class ConcurrencyLimitedRunner:
+    """Nornir runner working on the hosts in threads, with a maximum number of hosts of each group at once.
+
+    Unlike a lock taken by the task, a host is only handed to a worker once its group is below its limit, so the
+    workers don't wait on the busy groups while hosts of the other groups are pending. The hosts are started in turn
+    from each group, and their connections are closed as soon as their task is done.
+
+    Arguments:
+        num_workers: number of threads to use
+        limiter: ConcurrencyLimiter grouping the hosts
+    """
+
+    def __init__(self, num_workers=20, limiter=None):
+        """Initialize the runner."""
+        self.num_workers = num_workers
+        self.limiter = limiter or ConcurrencyLimiter()
+
+    @staticmethod
+    def _start(task, host):
+        try:
+            return task.start(host)
+        finally:
+            host.close_connections()
+
+    def run(self, task, hosts):
+        """Run the task over the hosts, see the Nornir `RunnerPlugin` protocol."""
+        result = AggregatedResult(task.name)
+        pending = {}
+        groups = self.limiter.get_groups(hosts)
+        for host in hosts:
+            pending.setdefault(groups[host.name], deque()).append(host)
+        in_flight = Counter()
+        futures = {}
+        with ThreadPoolExecutor(self.num_workers) as pool:
+            while pending or futures:
+                started = True
+                while started and len(futures) < self.num_workers:
+                    started = False
+                    for group in list(pending):
+                        limit = self.limiter.get_limit(group)
+                        if len(futures) >= self.num_workers or (limit and in_flight[group] >= limit):
+                            continue
+                        host = pending[group].popleft()
+                        if not pending[group]:
+                            del pending[group]
+                        futures[pool.submit(self._start, task.copy(), host)] = group
+                        in_flight[group] += 1
+                        started = True
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight[futures.pop(future)] -= 1
+                    worker_result = future.result()
+                    result[worker_result.host.name] = worker_result
+        return result
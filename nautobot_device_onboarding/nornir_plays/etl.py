@@ -0,0 +1,428 @@
+"""Parsing, extraction and validation (ETL) of command getter outputs, optionally run in a process pool."""
+
+import json
+import multiprocessing
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+
+import nautobot
+from django.conf import settings
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
+from nornir.core.inventory import Host
+from ntc_templates.parse import ParsingException, _get_template_dir, parse_output
+from textfsm import TextFSM, clitable
+from ttp import ttp
+
+from nautobot_device_onboarding.constants import SUPPORTED_COMMAND_PARSERS
+from nautobot_device_onboarding.nornir_plays.command_plan import SYNC_OPTION_FIELDS, compile_command_plan
+from nautobot_device_onboarding.nornir_plays.formatter import extract_show_data
+from nautobot_device_onboarding.nornir_plays.parsed_table import to_parsed_table
+from nautobot_device_onboarding.nornir_plays.schemas import (
+    NETWORK_DATA_INTERFACE_SCHEMA,
+    NETWORK_DATA_SCHEMA,
+    NETWORK_DEVICES_SCHEMA,
+)
+from nautobot_device_onboarding.nornir_plays.spool import read_spool_file
+from nautobot_device_onboarding.nornir_plays.transform import get_git_repo_parser_path, load_files_with_precedence
+from nautobot_device_onboarding.utils.helper import check_for_required_file, get_job_option
+
+PARSER_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), "parsers"))
+
+COMMAND_GETTER_SCHEMAS = {
+    "sync_devices": NETWORK_DEVICES_SCHEMA,
+    "sync_network_data": NETWORK_DATA_SCHEMA,
+}
+
+# Compiled TextFSM objects hold the state of the parse in progress, so they are cached per thread (and process).
+_compiled_textfsm_templates = threading.local()
+
+
+@lru_cache(maxsize=16)
+def _get_textfsm_index(template_dir, index_mtime):  # pylint: disable=unused-argument
+    """Read the index file of a template directory, `index_mtime` is only part of the cache key."""
+    # clitable keeps its own cache of index files keyed by path only, drop it so an updated index is read again.
+    clitable.CliTable.INDEX.pop(os.path.join(template_dir, "index"), None)
+    return clitable.CliTable("index", template_dir).index
+
+
+@lru_cache(maxsize=4096)
+def _get_textfsm_template_files(platform, command, template_dir, index_mtime):
+    """Resolve the template file(s) matching a platform and command in the index of `template_dir`."""
+    index = _get_textfsm_index(template_dir, index_mtime)
+    row_idx = index.GetRowMatch({"Command": command, "Platform": platform})
+    if not row_idx:
+        raise clitable.CliTableError(f'No template found for attributes: "{command}" on {platform}')
+    return tuple(os.path.join(template_dir, template) for template in index.index[row_idx]["Template"].split(":"))
+
+
+def get_textfsm_template_files(platform, command, template_dir):
+    """Resolve the template file(s) used to parse a command, cached until the index file of `template_dir` changes.
+
+    Raises:
+        CliTableError: if no template in the index matches the platform and command.
+    """
+    return _get_textfsm_template_files(
+        platform, command, template_dir, os.path.getmtime(os.path.join(template_dir, "index"))
+    )
+
+
+def get_compiled_textfsm_template(template_file):
+    """Return the compiled TextFSM template for this thread, reset and ready to parse.
+
+    Templates are compiled again when the file changes on disk, e.g. after a git repository sync.
+    """
+    if not hasattr(_compiled_textfsm_templates, "templates"):
+        _compiled_textfsm_templates.templates = {}
+    cache_key = (template_file, os.path.getmtime(template_file))
+    fsm = _compiled_textfsm_templates.templates.get(cache_key)
+    if fsm is None:
+        with open(template_file, "r", encoding="utf-8") as template:
+            fsm = TextFSM(template)
+        _compiled_textfsm_templates.templates[cache_key] = fsm
+    else:
+        fsm.Reset()
+    return fsm
+
+
+def _parse_textfsm_output_with_cache(platform, command, data, template_dir):
+    """Parse a command output with the cached template of `template_dir`, returning a list of dicts like ntc does."""
+    template_files = get_textfsm_template_files(platform, command, template_dir)
+    if len(template_files) > 1:
+        # Merging the tables of several templates is left to ntc-templates (clitable), it is rarely used.
+        return parse_output(platform=platform, template_dir=template_dir, command=command, data=data)
+    fsm = get_compiled_textfsm_template(template_files[0])
+    header = [column.lower() for column in fsm.header]
+    return [dict(zip(header, row)) for row in fsm.ParseText(data)]
+
+
+def parse_textfsm_output(platform, command, data, template_dir=None):
+    """Parse a command output with TextFSM, preferring templates from `template_dir` over the ntc-templates ones.
+
+    Behaves like `ntc_templates.parse.parse_output`, but the index lookup and the compiled template are cached so
+    a template is compiled once per worker thread instead of once per host.
+
+    Args:
+        platform (str): ntc-templates platform name.
+        command (str): command that was run on the device.
+        data (str): raw command output.
+        template_dir (str): optional directory holding custom templates and their index file.
+    """
+    # Parsing textfsm ourselves instead of using netmikos use_<parser> function to be able to handle exceptions
+    # ourselves. Default for netmiko is if it can't parse to return raw text which is tougher to handle.
+    default_template_dir = _get_template_dir()
+    try:
+        return _parse_textfsm_output_with_cache(platform, command, data, template_dir or default_template_dir)
+    except clitable.CliTableError as err:
+        if template_dir and template_dir != default_template_dir:
+            return parse_textfsm_output(platform, command, data)
+        raise ParsingException(f'Unable to parse command "{command}" on platform {platform} - {str(err)}') from err
+
+
+@lru_cache(maxsize=256)
+def _read_ttp_template(template_file, template_mtime):  # pylint: disable=unused-argument
+    """Read a TTP template file, `template_mtime` is only part of the cache key."""
+    with open(template_file, "r", encoding="utf-8") as template:
+        return template.read()
+
+
+def get_ttp_template(template_file):
+    """Return the content of a TTP template file, cached until the file changes on disk."""
+    return _read_ttp_template(template_file, os.path.getmtime(template_file))
+
+
+def parse_ttp_output(template_file, data):
+    """Parse a command output with a TTP template file and return the python data structure.
+
+    TTP parser objects share module level state with the latest parser created, so they can't be reused safely across
+    hosts and threads. A parser is built for every output, only the template file is cached.
+    """
+    parser = ttp(data=data, template=get_ttp_template(template_file))
+    parser.parse()
+    parsed_result = parser.result(format="json")[0]
+    return json.loads(parsed_result)
+
+
+def get_textfsm_template_dir(logger=None):
+    """Return the custom textfsm template directory from the command mapper git repository, if it is usable.
+
+    This queries the database, resolve it once per job rather than from the Nornir worker threads.
+    """
+    git_template_dir = get_git_repo_parser_path(parser_type="textfsm")
+    if git_template_dir and not check_for_required_file(git_template_dir, "index"):
+        if logger:
+            logger.debug(
+                f"Unable to find required index file in {git_template_dir} for textfsm parsing. Falling back to default templates."
+            )
+        return None
+    return git_template_dir
+
+
+def get_ttp_template_files():
+    """Return the TTP template files by name, the ones in the command mapper git repository take precedence.
+
+    This queries the database, resolve it once per job rather than from the Nornir worker threads.
+    """
+    return load_files_with_precedence(filesystem_dir=f"{PARSER_DIR}/ttp", parser_type="ttp")
+
+
+def get_parser_context(logger=None):
+    """Resolve everything the parsers need from the database and filesystem, so parsing can run without either."""
+    return {
+        "textfsm_template_dir": get_textfsm_template_dir(logger),
+        "ttp_template_files": get_ttp_template_files(),
+    }
+
+
+def clear_parser_caches():
+    """Drop the cached parser templates, e.g. when the command mapper git repository is synced.
+
+    Compiled TextFSM templates are keyed on the template file and its mtime, so they are not used again once the files
+    changed and don't need to be cleared.
+    """
+    _get_textfsm_index.cache_clear()
+    _get_textfsm_template_files.cache_clear()
+    _read_ttp_template.cache_clear()
+
+
+def parse_command_output(command, raw_output, platform, ntc_platform, parser_context):
+    """Parse a single raw command output the same way `netmiko_send_commands` does inline.
+
+    Args:
+        command (dict): command definition from the command mapper.
+        raw_output (str): raw output of the command, or an already handled (empty) result.
+        platform (str): netmiko platform of the host.
+        ntc_platform (str): ntc-templates platform of the host.
+        parser_context (dict): result of `get_parser_context()`.
+    """
+    if not isinstance(raw_output, str):
+        return raw_output
+    parser = command.get("parser")
+    if parser in SUPPORTED_COMMAND_PARSERS:
+        if "Invalid input detected at" in raw_output:
+            return []
+        if parser == "textfsm":
+            return to_parsed_table(
+                parse_textfsm_output(
+                    ntc_platform, command["command"], raw_output, parser_context["textfsm_template_dir"]
+                )
+            )
+        template_name = f"{platform}_{command['command'].replace(' ', '_')}.ttp"
+        return to_parsed_table(parse_ttp_output(parser_context["ttp_template_files"][template_name], raw_output))
+    if parser == "raw":
+        return {"raw": raw_output}
+    if parser == "none":
+        return json.loads(raw_output)
+    return raw_output
+
+
+@lru_cache(maxsize=None)
+def get_schema_validator(schema_name):
+    """Return the validator of a schema, checked and built once instead of on every validation.
+
+    Args:
+        schema_name (str): a command getter job of `COMMAND_GETTER_SCHEMAS`, or `interface` for the schema of the
+            interfaces of sync_network_data.
+    """
+    schema = NETWORK_DATA_INTERFACE_SCHEMA if schema_name == "interface" else COMMAND_GETTER_SCHEMAS[schema_name]
+    validator_class = validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
+
+def format_validation_error(error):
+    """Return the message of a validation error prefixed with the path of the invalid field, e.g. `mtu: ...`."""
+    if not error.absolute_path:
+        return error.message
+    return f"{'.'.join(str(field) for field in error.absolute_path)}: {error.message}"
+
+
+def validate_ssot_data(ready_for_ssot_data, command_getter_job):
+    """Validate extracted data against the schema of the command getter job.
+
+    The interfaces of sync_network_data are validated on their own by `drop_invalid_interfaces`.
+
+    Returns:
+        ValidationError or None
+    """
+    if command_getter_job not in COMMAND_GETTER_SCHEMAS:
+        return None
+    validator = get_schema_validator(command_getter_job)
+    if validator.is_valid(ready_for_ssot_data):
+        return None
+    return best_match(validator.iter_errors(ready_for_ssot_data))
+
+
+def drop_invalid_interfaces(ready_for_ssot_data):
+    """Drop the interfaces of sync_network_data that don't pass schema validation, keeping the rest of the device.
+
+    Returns:
+        dict: validation errors of each dropped interface, keyed by interface name.
+    """
+    interfaces = ready_for_ssot_data.get("interfaces") if isinstance(ready_for_ssot_data, dict) else None
+    if not isinstance(interfaces, dict):
+        return {}
+    validator = get_schema_validator("interface")
+    invalid_interfaces = {
+        interface_name: [format_validation_error(error) for error in validator.iter_errors(interface_data)]
+        for interface_name, interface_data in interfaces.items()
+        if not validator.is_valid(interface_data)
+    }
+    for interface_name in invalid_interfaces:
+        del interfaces[interface_name]
+    return invalid_interfaces
+
+
+def run_etl(host_name, platform, ntc_platform, command_plan, command_outputs, etl_options):
+    """Parse, extract and validate the raw command outputs of a single host.
+
+    This is the unit of work sent to the process pool, everything it needs is passed in and picklable. The commands of
+    `command_plan` are parsed and its fields extracted.
+
+    Returns:
+        dict: with `host`, `command_getter_job`, `data` (extracted data), `validation_error`, `invalid_interfaces`
+            (validation errors of the dropped interfaces) and `failed_reason` keys.
+    """
+    result = {
+        "host": host_name,
+        "command_getter_job": etl_options["command_getter_job"],
+        "data": None,
+        "validation_error": None,
+        "invalid_interfaces": {},
+        "failed_reason": None,
+    }
+    parsed_command_outputs = {}
+    for command in command_plan.commands:
+        try:
+            parsed_command_outputs[command["command"]] = parse_command_output(
+                command,
+                command_outputs.get(command["command"], []),
+                platform,
+                ntc_platform,
+                etl_options["parser_context"],
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            if etl_options["fail_job_on_task_failure"]:
+                result["failed_reason"] = f"Parsing failed for '{command['command']}' command."
+                if etl_options["debug"]:
+                    result["failed_reason"] += f" {traceback.format_exc()}"
+                return result
+            parsed_command_outputs[command["command"]] = []
+    host = Host(name=host_name, platform=platform, data={"command_plan": command_plan})
+    try:
+        result["data"] = extract_show_data(
+            host, parsed_command_outputs, etl_options["command_getter_job"], etl_options["debug"]
+        )
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        result["failed_reason"] = f"Data extraction failed. {err}"
+        return result
+    if etl_options["command_getter_job"] == "sync_network_data":
+        result["invalid_interfaces"] = drop_invalid_interfaces(result["data"])
+    validation_error = validate_ssot_data(result["data"], etl_options["command_getter_job"])
+    if validation_error:
+        result["validation_error"] = str(validation_error)
+    return result
+
+
+def run_spooled_etl(host_name, platform, ntc_platform, command_plan, spool_file, etl_options):
+    """Run the ETL stage on the raw command outputs of a host read from its spool file, see `CommandOutputSpool`.
+
+    Submitted to the process pool instead of `run_etl` so the outputs aren't held by the job process until a worker
+    process is free.
+    """
+    return run_etl(host_name, platform, ntc_platform, command_plan, read_spool_file(spool_file), etl_options)
+
+
+class ETLProcessPool:
+    """Run the ETL stage of the command getter in worker processes, keeping the Nornir threads for network I/O."""
+
+    def __init__(self, job, command_getter_job, parser_context=None, max_workers=None):
+        """Start the process pool.
+
+        Args:
+            job (Job): the Nautobot job, used for the sync, debug and failure options.
+            command_getter_job (str): sync_devices or sync_network_data.
+            parser_context (dict): result of `get_parser_context()`, resolved here if not given.
+            max_workers (int): number of worker processes, defaults to the number of CPUs.
+        """
+        self.command_getter_job = command_getter_job
+        self.etl_options = {
+            "command_getter_job": command_getter_job,
+            "debug": job.debug,
+            "fail_job_on_task_failure": job.fail_job_on_task_failure,
+            "parser_context": parser_context if parser_context is not None else get_parser_context(),
+        }
+        # Spawn instead of fork, forking a process that is running Nornir threads is not safe. Nautobot has to be
+        # set up in the worker before this module is imported there, as it reads the settings at import time.
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=nautobot.setup,
+            initargs=(getattr(settings, "SETTINGS_PATH", None),),
+        )
+        self.futures = {}
+
+    def __enter__(self):
+        """Return the pool for use as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        """Shut the process pool down, dropping any pending work if an exception occurred."""
+        self.executor.shutdown(wait=True, cancel_futures=exc_type is not None)
+
+    def submit(  # pylint: disable=too-many-arguments
+        self, host, ntc_platform, command_outputs, command_plan=None, command_getter_job=None, spool_file=None
+    ):
+        """Queue the raw command outputs of a host for parsing, extraction and validation.
+
+        Args:
+            host (Host): Nornir host the commands were run on.
+            ntc_platform (str): ntc-templates platform of the host.
+            command_outputs (dict): raw command outputs keyed by command, None if they're read from `spool_file`.
+            command_plan (CommandPlan): plan to extract the outputs with, defaults to the plan of the host.
+            command_getter_job (str): job type the outputs are extracted for, defaults to the job type of the pool.
+            spool_file (str): spool file the worker process reads the raw command outputs from.
+        """
+        etl_options = self.etl_options
+        if command_getter_job:
+            etl_options = {**self.etl_options, "command_getter_job": command_getter_job}
+        if command_plan is None:
+            command_plan = host.data.get("command_plan") or compile_command_plan(
+                host.data["platform_parsing_info"][self.command_getter_job],
+                **{option: host.defaults.data.get(option, False) for option in SYNC_OPTION_FIELDS},
+            )
+        if spool_file:
+            future = self.executor.submit(
+                run_spooled_etl, host.name, host.platform, ntc_platform, command_plan, spool_file, etl_options
+            )
+        else:
+            future = self.executor.submit(
+                run_etl, host.name, host.platform, ntc_platform, command_plan, command_outputs, etl_options
+            )
+        self.futures[future] = (host.name, etl_options["command_getter_job"])
+
+    def results(self):
+        """Yield the ETL result of every submitted host, in submission order."""
+        for future, (host_name, command_getter_job) in self.futures.items():
+            try:
+                yield future.result()
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                yield {
+                    "host": host_name,
+                    "command_getter_job": command_getter_job,
+                    "data": None,
+                    "validation_error": None,
+                    "invalid_interfaces": {},
+                    "failed_reason": f"ETL worker process failed. {err}",
+                }
+
+
+def get_etl_pool(job, command_getter_job, parser_context=None):
+    """Return a context manager yielding an ETLProcessPool if the job enabled it, otherwise None."""
+    if get_job_option(job, "parse_in_process_pool", False):
+        return ETLProcessPool(job, command_getter_job, parser_context=parser_context)
+    return nullcontext()
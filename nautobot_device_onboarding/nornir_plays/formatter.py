@@ -1,15 +1,38 @@
 """Command Extraction and Formatting or SSoT Based Jobs."""
 
+import copy
 import json
 import logging
+import re
+from collections import Counter
+from functools import lru_cache
 from json.decoder import JSONDecodeError
 
 import jinja2
+import jmespath
 from django.template import engines
 from django.utils.module_loading import import_string
 from jdiff import extract_data_from_json
+from jdiff.utils.data_normalization import flatten_list
 from jinja2.sandbox import SandboxedEnvironment
 
+from nautobot_device_onboarding.nornir_plays.command_plan import CommandPlan, compile_command_plan
+from nautobot_device_onboarding.nornir_plays.parsed_table import ParsedTable
+from nautobot_device_onboarding.post_processors import get_post_processor
+
+# Matches nested field jpaths of the form "[?<column>=='{{ <current_key expression> }}']<remainder>", which can be
+# resolved against an index of the parsed rows instead of re-scanning the whole command output per current_key.
+INDEXED_JPATH_RE = re.compile(
+    r"^\[\?\s*(?P<column>[A-Za-z_]\w*)\s*==\s*'(?P<key_template>\{\{.+?\}\})'\s*\](?P<remainder>.*)$",
+    re.DOTALL,
+)
+
+# A jpath returning a column of a parsed table, e.g. "[*].interface".
+COLUMN_JPATH_RE = re.compile(r"^\[\*\]\.(?P<column>[A-Za-z_]\w*)$")
+
+# jmespath nodes whose other children are applied to what their first child returns.
+JPATH_CHAIN_NODES = ("subexpression", "projection", "filter_projection", "index_expression", "flatten", "pipe")
+
 
 def setup_logger(logger_name, debug_on):
     """Creates a logger for the ETL process."""
@@ -40,6 +63,179 @@ def get_django_env():
     return jinja_env
 
 
+@lru_cache(maxsize=None)
+def get_shared_django_env():
+    """Return a single process-wide SandboxedEnvironment used to compile the command mapper templates.
+
+    Returns:
+        SandboxedEnvironment
+    """
+    return get_django_env()
+
+
+@lru_cache(maxsize=2048)
+def get_compiled_template(template_string):
+    """Compile a jpath or post_processor template string once and reuse it for every host and interface.
+
+    Args:
+        template_string (str): jpath or post_processor source from a command mapper.
+
+    Returns:
+        jinja2.Template
+    """
+    return get_shared_django_env().from_string(template_string)
+
+
+@lru_cache(maxsize=4096)
+def get_compiled_jpath(jpath):
+    """Compile a rendered jpath once and reuse it for every host with the same interfaces.
+
+    The rendered jpaths of the nested fields differ by `current_key`, which is more expressions than the cache of the
+    jmespath library holds, so they were parsed again for every interface of every host.
+
+    Args:
+        jpath (str): rendered jpath without jdiff reference keys, e.g. "[?interface=='Ethernet1/1'].mtu".
+
+    Returns:
+        jmespath.parser.ParsedResult
+    """
+    return jmespath.compile(jpath)
+
+
+def extract_data(data, jpath):
+    """Extract data with a rendered jpath like `jdiff.extract_data_from_json`, with the jmespath compiled once.
+
+    Jpaths with jdiff reference keys (`$`) are extracted by jdiff.
+
+    Raises:
+        TypeError: if the jpath returns None, or returns lists mixing values and dictionaries, like jdiff.
+    """
+    if not jpath or jpath == "*" or "$" in jpath:
+        return extract_data_from_json(data, jpath)
+    values = get_compiled_jpath(jpath).search(data)
+    if values is None:
+        raise TypeError("JMSPath returned 'None'. Please, verify your JMSPath regex.")
+    # Nested lists are flattened like jdiff does.
+    if any(isinstance(value, list) for value in values):
+        for element in values:
+            for item in element:
+                if isinstance(item, dict):
+                    raise TypeError(
+                        f'Must be list of lists i.e. [["Idle", 75759616], ["Idle", 75759620]]. You have "{values}".'
+                    )
+                if isinstance(item, list):
+                    values = flatten_list(values)
+                    break
+    return values
+
+
+def _get_row_fields(node):
+    """Return the fields a jmespath node applied to a row reads from it, None if it may read the whole row."""
+    if node["type"] == "field":
+        return {node["value"]}
+    if node["type"] in JPATH_CHAIN_NODES:
+        return _get_row_fields(node["children"][0])
+    if node["type"] in ("identity", "current", "value_projection", "expref"):
+        return None
+    fields = set()
+    for child in node.get("children", []):
+        child_fields = _get_row_fields(child)
+        if child_fields is None:
+            return None
+        fields.update(child_fields)
+    return fields
+
+
+@lru_cache(maxsize=2048)
+def get_table_columns(jpath):
+    """Return the columns of a parsed table a rendered jpath reads, None if it may read whole rows.
+
+    E.g. {"interface", "link_status"} for "[*].{name: interface, enabled: link_status}".
+    """
+    if not jpath or jpath == "*" or "$" in jpath:
+        return None
+    try:
+        node = get_compiled_jpath(jpath).parsed
+    except jmespath.exceptions.JMESPathError:
+        return None
+    # Find the projection over the rows, e.g. "[*].serial" in "[*].serial | [0]".
+    while node["type"] in JPATH_CHAIN_NODES:
+        if node["type"] in ("projection", "filter_projection") and node["children"][0]["type"] == "identity":
+            return _get_row_fields({"type": "multi_select_list", "children": node["children"][1:]})
+        node = node["children"][0]
+    return None
+
+
+def get_table_data(table, jpath):
+    """Return the data of a ParsedTable a rendered jpath is evaluated against, and the jpath to evaluate.
+
+    A column jpath is evaluated against the values of the column, other jpaths against rows built with only the
+    columns they read. These are built for the extraction and not kept.
+    """
+    column_match = COLUMN_JPATH_RE.match(jpath.strip())
+    if column_match:
+        # Like `[*].<column>` of the rows, `[*]` of the values of the column leaves out the null values.
+        return table.column(column_match.group("column")), "[*]"
+    return table.rows(get_table_columns(jpath)), jpath
+
+
+@lru_cache(maxsize=2048)
+def get_indexed_jpath(jpath):
+    """Split a nested field jpath into the parts needed to resolve it against a row index.
+
+    Args:
+        jpath (str): jpath from a command mapper, e.g. "[?interface=='{{ current_key }}'].mtu".
+
+    Returns:
+        tuple: (column, key_template, remainder_jpath) e.g. ("interface", "{{ current_key }}", "[*].mtu"),
+            or None if the jpath can't be resolved against a row index.
+    """
+    if "$" in jpath:
+        # jdiff reference keys change how the result is shaped, always use the full jpath for those.
+        return None
+    match = INDEXED_JPATH_RE.match(jpath.strip())
+    if not match:
+        return None
+    remainder = match.group("remainder").strip()
+    if remainder and remainder[0] not in ".[|":
+        return None
+    return match.group("column"), match.group("key_template"), f"[*]{remainder}"
+
+
+class ParsedRowIndex:
+    """Index of parsed command output rows by column value, built lazily once per column."""
+
+    def __init__(self, rows):
+        """Store the parsed rows, the per column indexes are built on first lookup."""
+        self.rows = rows
+        self._columns = {}
+
+    def lookup(self, column, key):
+        """Return the rows where `column` equals `key`, in the order they appear in the parsed output."""
+        if column not in self._columns:
+            column_index = {}
+            for row in self.rows:
+                if isinstance(row, dict) and isinstance(row.get(column), str):
+                    column_index.setdefault(row[column], []).append(row)
+            self._columns[column] = column_index
+        return self._columns[column].get(key, [])
+
+
+def build_row_index(parsed_command_output):
+    """Build a ParsedRowIndex for a parsed command output if it is a table (list of rows).
+
+    A ParsedTable indexes its own rows and is returned as is.
+
+    Returns:
+        ParsedRowIndex, ParsedTable or None
+    """
+    if isinstance(parsed_command_output, ParsedTable):
+        return parsed_command_output
+    if isinstance(parsed_command_output, list) and parsed_command_output:
+        return ParsedRowIndex(parsed_command_output)
+    return None
+
+
 def process_empty_result(iterable_type):
     """Helper to map iterable_type on an empty result."""
     iterable_mapping = {
@@ -49,12 +245,18 @@ def process_empty_result(iterable_type):
     return iterable_mapping.get(iterable_type, [])
 
 
-def normalize_processed_data(processed_data, iterable_type):
-    """Helper to normalize the processed data returned from jdiff/jmespath."""
+def normalize_processed_data(processed_data, iterable_type, native=False):
+    """Helper to normalize the processed data returned from jdiff/jmespath.
+
+    A `native` processed_data returned by a `python_post_processor` is normalized like the data loaded from the JSON
+    rendered by a Jinja2 `post_processor`, unless it's a string.
+    """
+    if native and not isinstance(processed_data, str):
+        post_processed_data = processed_data
     # If processed_data is an empty data structure, return default based on iterable_type
-    if not processed_data:
+    elif not processed_data:
         return process_empty_result(iterable_type)
-    if isinstance(processed_data, str) and not processed_data.isdigit():
+    elif isinstance(processed_data, str) and not processed_data.isdigit():
         try:
             # If processed_data is a json string try to load it into a python datatype.
             post_processed_data = json.loads(processed_data)
@@ -81,32 +283,73 @@ def normalize_processed_data(processed_data, iterable_type):
     return post_processed_data
 
 
-def extract_and_post_process(parsed_command_output, yaml_command_element, j2_data_context, iter_type, job_debug):
-    """Helper to extract and apply post_processing on a single element."""
+def extract_and_post_process(  # pylint: disable=too-many-arguments
+    parsed_command_output,
+    yaml_command_element,
+    j2_data_context,
+    iter_type,
+    job_debug,
+    row_index=None,
+    extraction_cache=None,
+):
+    """Helper to extract and apply post_processing on a single element.
+
+    If a `row_index` built from `parsed_command_output` is passed in and the jpath filters rows on `current_key`,
+    the matching rows are looked up in the index and only the remainder of the jpath is evaluated against them.
+
+    If an `extraction_cache` dictionary is passed in, the data extracted from the output of a command with a rendered
+    jpath is kept there and reused by the other fields extracting it, before their own post processing. Each of them
+    is given its own copy, so that a post processor modifying it doesn't change the data of the other fields.
+    """
     logger = logger = setup_logger("DEVICE_ONBOARDING_ETL_LOGGER", job_debug)
     # if parsed_command_output is an empty data structure, no need to go through all the processing.
     if not parsed_command_output:
         return parsed_command_output, normalize_processed_data(parsed_command_output, iter_type)
-    j2_env = get_django_env()
-    # This just renders the jpath itself if any interpolation is needed.
-    jpath_template = j2_env.from_string(yaml_command_element["jpath"])
-    j2_rendered_jpath = jpath_template.render(**j2_data_context)
-    logger.debug("Post Rendered Jpath: %s", j2_rendered_jpath)
-    try:
-        if isinstance(parsed_command_output, str):
-            try:
-                parsed_command_output = json.loads(parsed_command_output)
-            except (JSONDecodeError, TypeError):
-                logger.debug("Parsed Command Output is a string but not jsonable: %s", parsed_command_output)
-        extracted_value = extract_data_from_json(parsed_command_output, j2_rendered_jpath)
-    except TypeError as err:
-        logger.debug("Error occurred during extraction: %s setting default extracted value to []", err)
-        extracted_value = []
+    indexed_jpath = get_indexed_jpath(yaml_command_element["jpath"]) if row_index is not None else None
+    if indexed_jpath:
+        column, key_template, j2_rendered_jpath = indexed_jpath
+        key = get_compiled_template(key_template).render(**j2_data_context)
+        cache_key = (yaml_command_element["command"], column, key, j2_rendered_jpath)
+        logger.debug("Indexed Jpath: %s, %s == %s", j2_rendered_jpath, column, key)
+    else:
+        # This just renders the jpath itself if any interpolation is needed.
+        jpath_template = get_compiled_template(yaml_command_element["jpath"])
+        j2_rendered_jpath = jpath_template.render(**j2_data_context)
+        cache_key = (yaml_command_element["command"], j2_rendered_jpath)
+        logger.debug("Post Rendered Jpath: %s", j2_rendered_jpath)
+    if extraction_cache is not None and cache_key in extraction_cache:
+        extracted_value = copy.deepcopy(extraction_cache[cache_key])
+    else:
+        if indexed_jpath:
+            parsed_command_output = row_index.lookup(column, key)
+        elif isinstance(parsed_command_output, ParsedTable):
+            parsed_command_output, j2_rendered_jpath = get_table_data(parsed_command_output, j2_rendered_jpath)
+        try:
+            if isinstance(parsed_command_output, str):
+                try:
+                    parsed_command_output = json.loads(parsed_command_output)
+                except (JSONDecodeError, TypeError):
+                    logger.debug("Parsed Command Output is a string but not jsonable: %s", parsed_command_output)
+            extracted_value = extract_data(parsed_command_output, j2_rendered_jpath)
+        except TypeError as err:
+            logger.debug("Error occurred during extraction: %s setting default extracted value to []", err)
+            extracted_value = []
+        if extraction_cache is not None:
+            extraction_cache[cache_key] = extracted_value
+            extracted_value = copy.deepcopy(extracted_value)
     pre_processed_extracted = extracted_value
-    if yaml_command_element.get("post_processor"):
+    native = False
+    if yaml_command_element.get("python_post_processor"):
+        # Takes precedence over the Jinja2 post_processor, no template is rendered and loaded back from JSON.
+        post_processor = get_post_processor(yaml_command_element["python_post_processor"])
+        extracted_processed = post_processor(
+            extracted_value, j2_data_context, **yaml_command_element.get("post_processor_kwargs", {})
+        )
+        native = True
+    elif yaml_command_element.get("post_processor"):
         # j2 context data changes obj(hostname) -> extracted_value for post_processor
         j2_data_context["obj"] = extracted_value
-        template = j2_env.from_string(yaml_command_element["post_processor"])
+        template = get_compiled_template(yaml_command_element["post_processor"])
         try:
             extracted_processed = template.render(**j2_data_context)
         except jinja2.exceptions.UndefinedError:
@@ -115,112 +358,169 @@ def extract_and_post_process(parsed_command_output, yaml_command_element, j2_dat
             )
     else:
         extracted_processed = extracted_value
-    post_processed_data = normalize_processed_data(extracted_processed, iter_type)
+    post_processed_data = normalize_processed_data(extracted_processed, iter_type, native=native)
     logger.debug("Pre Processed Extracted: %s", pre_processed_extracted)
     logger.debug("Post Processed Data: %s", post_processed_data)
     return pre_processed_extracted, post_processed_data
 
 
-def perform_data_extraction(host, command_info_dict, command_outputs_dict, job_debug):
-    """Extract, process data."""
-    result_dict = {}
-    sync_vlans = host.defaults.data.get("sync_vlans", False)
-    sync_vrfs = host.defaults.data.get("sync_vrfs", False)
-    sync_cables = host.defaults.data.get("sync_cables", False)
-    sync_software_version = host.defaults.data.get("sync_software_version", False)
-    get_context_from_pre_processor = {}
-    if command_info_dict.get("pre_processor"):
-        for pre_processor_name, field_data in command_info_dict["pre_processor"].items():
-            if pre_processor_name == "vlan_map" and not sync_vlans:
-                continue
-            if isinstance(field_data["commands"], dict):
-                # only one command is specified as a dict force it to a list.
-                loop_commands = [field_data["commands"]]
-            else:
-                loop_commands = field_data["commands"]
-            for show_command_dict in loop_commands:
-                final_iterable_type = show_command_dict.get("iterable_type")
-                _, current_field_post = extract_and_post_process(
-                    command_outputs_dict[show_command_dict["command"]],
+class FieldExtraction:
+    """Lazy extraction of the fields of a CommandPlan from the parsed command outputs of a host.
+
+    A field is extracted once the pre processors and the root key field it depends on are, each of them only the first
+    time a field needs it. The row indexes of the command outputs are shared by all the fields, and so is the data
+    extracted with the same command and jpath by the fields using them both.
+    """
+
+    def __init__(self, host, command_plan, command_outputs, job_debug):
+        """Initialize the extraction, nothing is extracted until `extract` or `extract_field` is called.
+
+        Args:
+            host (host): host from task
+            command_plan (CommandPlan): plan of the fields to extract.
+            command_outputs (dict): parsed command outputs keyed by command.
+            job_debug (bool): to know if debug button was checked.
+        """
+        self.host = host
+        self.command_plan = command_plan
+        self.command_outputs = command_outputs
+        self.job_debug = job_debug
+        self.result = {}
+        self._pre_processor_plans = {pre_processor.name: pre_processor for pre_processor in command_plan.pre_processors}
+        self._field_plans = {field.name: field for field in command_plan.fields}
+        self._pre_processor_results = {}
+        self._root_keys = {}
+        self._extracted_fields = set()
+        self._row_indexes = {}
+        self._extraction_cache = {}
+        jpath_counts = Counter(
+            (command["command"], command.get("jpath"))
+            for field in command_plan.pre_processors + command_plan.fields
+            for command in field.commands
+        )
+        # Only the data other fields extract too is kept, each of them is given a copy of it.
+        self._shared_jpaths = {command_jpath for command_jpath, count in jpath_counts.items() if count > 1}
+
+    def extract(self):
+        """Extract every field of the plan and return the extracted data."""
+        for field in self.command_plan.fields:
+            self.extract_field(field)
+        return self.result
+
+    def _get_extraction_cache(self, show_command_dict):
+        if (show_command_dict["command"], show_command_dict.get("jpath")) in self._shared_jpaths:
+            return self._extraction_cache
+        return None
+
+    def _get_pre_processor_result(self, name):
+        if name not in self._pre_processor_results:
+            for show_command_dict in self._pre_processor_plans[name].commands:
+                _, self._pre_processor_results[name] = extract_and_post_process(
+                    self.command_outputs[show_command_dict["command"]],
                     show_command_dict,
-                    {"obj": host.name, "original_host": host.name},
-                    final_iterable_type,
-                    job_debug,
+                    {"obj": self.host.name, "original_host": self.host.name},
+                    show_command_dict.get("iterable_type"),
+                    self.job_debug,
+                    extraction_cache=self._get_extraction_cache(show_command_dict),
                 )
-                get_context_from_pre_processor[pre_processor_name] = current_field_post
-    for ssot_field, field_data in command_info_dict.items():
-        if not sync_vlans and ssot_field in ["interfaces__tagged_vlans", "interfaces__untagged_vlan"]:
-            continue
-        # If syncing vrfs isn't inscope remove the unneeded commands.
-        if not sync_vrfs and ssot_field == "interfaces__vrf":
-            continue
-        if not sync_cables and ssot_field == "cables":
-            continue
-        if not sync_software_version and ssot_field == "software_version":
-            continue
-        if ssot_field == "pre_processor":
-            continue
-        if isinstance(field_data["commands"], dict):
-            # only one command is specified as a dict force it to a list.
-            loop_commands = [field_data["commands"]]
-        else:
-            loop_commands = field_data["commands"]
-        for show_command_dict in loop_commands:
+        return self._pre_processor_results[name]
+
+    def _get_context(self, field, **context):
+        """Return the render context of a field, with the results of the pre processors it uses."""
+        return {
+            **context,
+            "obj": self.host.name,
+            "original_host": self.host.name,
+            **{name: self._get_pre_processor_result(name) for name in field.pre_processors},
+        }
+
+    def _get_root_keys(self, root_field_name):
+        """Return the keys the nested fields of a root key field are extracted for, e.g. the interface names."""
+        root_field = self._field_plans.get(root_field_name)
+        if not root_field or not root_field.root_key:
+            raise ValueError(f"There is no root_key field {root_field_name} to extract {root_field_name}__ fields for.")
+        self.extract_field(root_field)
+        return self._root_keys[root_field_name]
+
+    def _get_row_index(self, command):
+        if command not in self._row_indexes:
+            self._row_indexes[command] = build_row_index(self.command_outputs[command])
+        return self._row_indexes[command]
+
+    def extract_field(self, field):
+        """Extract a field of the plan into `result`, unless it already is.
+
+        Args:
+            field (FieldPlan): the field.
+        """
+        if field.name in self._extracted_fields:
+            return
+        self._extracted_fields.add(field.name)
+        for show_command_dict in field.commands:
+            command_output = self.command_outputs[show_command_dict["command"]]
             final_iterable_type = show_command_dict.get("iterable_type")
-            if field_data.get("root_key"):
-                original_context = {"obj": host.name, "original_host": host.name}
-                merged_context = {**original_context, **get_context_from_pre_processor}
-                root_key_pre, root_key_post = extract_and_post_process(
-                    command_outputs_dict[show_command_dict["command"]],
+            if field.root_key:
+                _, root_key_post = extract_and_post_process(
+                    command_output,
                     show_command_dict,
-                    merged_context,
+                    self._get_context(field),
                     final_iterable_type,
-                    job_debug,
+                    self.job_debug,
+                    extraction_cache=self._get_extraction_cache(show_command_dict),
                 )
-                result_dict[ssot_field] = root_key_post
-            else:
-                field_nesting = ssot_field.split("__")
-                # for current_nesting in field_nesting:
-                if len(field_nesting) > 1:
-                    # Means there is "anticipated" data nesting `interfaces__mtu` means final data would be
-                    # {"Ethernet1/1": {"mtu": <value>}}
-                    for current_key in root_key_post:
-                        # current_key is a single iteration from the root_key extracted value. Typically we want this to be
-                        # a list of data that we want to become our nested key. E.g. current_key "Ethernet1/1"
-                        # These get passed into the render context for the template render to allow nested jpaths to use
-                        # the current_key context for more flexible jpath queries.
-                        original_context = {"current_key": current_key, "obj": host.name, "original_host": host.name}
-                        merged_context = {**original_context, **get_context_from_pre_processor}
-                        _, current_key_post = extract_and_post_process(
-                            command_outputs_dict[show_command_dict["command"]],
-                            show_command_dict,
-                            merged_context,
-                            final_iterable_type,
-                            job_debug,
-                        )
-                        result_dict[field_nesting[0]][current_key][field_nesting[1]] = current_key_post
-                else:
-                    original_context = {"obj": host.name, "original_host": host.name}
-                    merged_context = {**original_context, **get_context_from_pre_processor}
-                    _, current_field_post = extract_and_post_process(
-                        command_outputs_dict[show_command_dict["command"]],
+                self.result[field.name] = self._root_keys[field.name] = root_key_post
+            elif len(field.nesting) > 1:
+                # Means there is "anticipated" data nesting `interfaces__mtu` means final data would be
+                # {"Ethernet1/1": {"mtu": <value>}}
+                # Index the parsed rows once per command so each current_key is a lookup instead of a full scan.
+                row_index = self._get_row_index(show_command_dict["command"])
+                for current_key in self._get_root_keys(field.nesting[0]):
+                    # current_key is a single iteration from the root_key extracted value. Typically we want this to be
+                    # a list of data that we want to become our nested key. E.g. current_key "Ethernet1/1"
+                    # These get passed into the render context for the template render to allow nested jpaths to use
+                    # the current_key context for more flexible jpath queries.
+                    _, current_key_post = extract_and_post_process(
+                        command_output,
                         show_command_dict,
-                        merged_context,
+                        self._get_context(field, current_key=current_key),
                         final_iterable_type,
-                        job_debug,
+                        self.job_debug,
+                        row_index=row_index,
+                        extraction_cache=self._get_extraction_cache(show_command_dict),
                     )
-                    result_dict[ssot_field] = current_field_post
-        # if command_info_dict.get("validator_pattern"):
-        #     # temp validator
-        #     if command_info_dict["validator_pattern"] == "not None":
-        #         if not extracted_processed:
-        #             logger.debug("validator pattern not detected, checking next command.")
-        #             continue
-        #         else:
-        #             logger.debug("About to break the sequence due to valid pattern found")
-        #             result_dict[dict_field] = extracted_processed
-        #             break
-    return result_dict
+                    self.result[field.nesting[0]][current_key][field.nesting[1]] = current_key_post
+            else:
+                _, self.result[field.name] = extract_and_post_process(
+                    command_output,
+                    show_command_dict,
+                    self._get_context(field),
+                    final_iterable_type,
+                    self.job_debug,
+                    extraction_cache=self._get_extraction_cache(show_command_dict),
+                )
+
+
+def perform_data_extraction(host, command_info_dict, command_outputs_dict, job_debug):
+    """Extract, process data.
+
+    Args:
+        host (host): host from task
+        command_info_dict (CommandPlan or dict): compiled plan, or the raw command mapper of the host platform and job
+            type which is compiled with the sync options of the host defaults.
+        command_outputs_dict (dict): parsed command outputs keyed by command.
+        job_debug (bool): to know if debug button was checked.
+    """
+    if isinstance(command_info_dict, CommandPlan):
+        command_plan = command_info_dict
+    else:
+        command_plan = compile_command_plan(
+            command_info_dict,
+            sync_vlans=host.defaults.data.get("sync_vlans", False),
+            sync_vrfs=host.defaults.data.get("sync_vrfs", False),
+            sync_cables=host.defaults.data.get("sync_cables", False),
+            sync_software_version=host.defaults.data.get("sync_software_version", False),
+        )
+    return FieldExtraction(host, command_plan, command_outputs_dict, job_debug).extract()
 
 
 def extract_show_data(host, command_outputs, command_getter_type, job_debug):
@@ -232,6 +532,7 @@ def extract_show_data(host, command_outputs, command_getter_type, job_debug):
         command_getter_type (str): to know what dict to pull, sync_devices or sync_network_data.
         job_debug (logging.INFO or logging.DEBUG): to know if debug button was checked.
     """
-    command_getter_iterable = host.data["platform_parsing_info"][command_getter_type]
+    # The plan the commands were run with, otherwise compile one from the command mapper.
+    command_getter_iterable = host.data.get("command_plan") or host.data["platform_parsing_info"][command_getter_type]
     all_results_extracted = perform_data_extraction(host, command_getter_iterable, command_outputs, job_debug)
     return all_results_extracted
@@ -6,6 +6,7 @@ from netmiko import SSHDetect
 from nornir.core.inventory import ConnectionOptions, Host
 
 from nautobot_device_onboarding.constants import NETMIKO_EXTRAS
+from nautobot_device_onboarding.utils.platform_detection import detect_platform
 
 
 def guess_netmiko_device_type(
@@ -24,8 +25,7 @@ def guess_netmiko_device_type(
     }
     guessed_exc = None
     try:
-        guesser = SSHDetect(**remote_device)
-        guessed_device_type = guesser.autodetect()
+        guessed_device_type = detect_platform(hostname, port, lambda: SSHDetect(**remote_device).autodetect())
 
     except Exception as err:  # pylint: disable=broad-exception-caught
         guessed_device_type = None
@@ -35,13 +35,20 @@ def guess_netmiko_device_type(
 
 
 def _set_inventory(
-    host_ip: str, platform: str, port: str, username: str, password: str
+    host_ip: str, platform: str, port: str, username: str, password: str, network_driver: str = None
 ) -> Tuple[Dict, Union[Exception, None]]:
-    """Construct Nornir Inventory."""
+    """Construct Nornir Inventory.
+
+    The platform of a host without a `platform` is its `network_driver` if known, e.g. from a recording of its command
+    outputs, otherwise it's autodetected.
+    """
     inv = {}
     if platform:
         platform_guess_exc = None
         platform = platform.network_driver_mappings.get("netmiko")
+    elif network_driver:
+        platform_guess_exc = None
+        platform = network_driver
     else:
         platform, platform_guess_exc = guess_netmiko_device_type(host_ip, username, password, port)
     host = Host(
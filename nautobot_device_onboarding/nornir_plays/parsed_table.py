@@ -0,0 +1,107 @@
+"""Columnar representation of the tables parsed from the command outputs by TextFSM and TTP.
+
+A parsed table is a list of rows, each a dictionary repeating the name of every column. A ParsedTable holds one list of
+values per column instead, and indexes the rows by the value of a column the first time it's looked up, so that the
+nested fields of the command mappers (e.g. `[?interface=='{{ current_key }}'].mtu`) are lookups instead of scans of
+the whole table for every interface.
+"""
+
+from nautobot_device_onboarding.constants import PLUGIN_CFG
+
+
+class ParsedTable:
+    """Parsed table of a command output, stored by column."""
+
+    def __init__(self, columns, row_count):
+        """Store the columns of the table.
+
+        Args:
+            columns (dict): list of the values of each row, keyed by column name. Every list has `row_count` values.
+            row_count (int): number of rows.
+        """
+        self.columns = columns
+        self.row_count = row_count
+        self._keys = {}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Return the ParsedTable of a list of rows with the same columns, None if `rows` isn't such a table.
+
+        A single row isn't a table, e.g. the dictionary keyed by interface name some TTP templates return.
+        """
+        if not isinstance(rows, list) or len(rows) < 2 or not isinstance(rows[0], dict):
+            return None
+        column_names = list(rows[0])
+        columns = {column_name: [] for column_name in column_names}
+        for row in rows:
+            if not isinstance(row, dict) or len(row) != len(column_names):
+                return None
+            for column_name, values in columns.items():
+                if column_name not in row:
+                    return None
+                values.append(row[column_name])
+        return cls(columns, len(rows))
+
+    def __len__(self):
+        """Return the number of rows."""
+        return self.row_count
+
+    def __iter__(self):
+        """Iterate over the rows, as dictionaries."""
+        return (self.row(index) for index in range(self.row_count))
+
+    def column(self, column_name):
+        """Return the values of a column, an empty list if there is no such column."""
+        return self.columns.get(column_name, [])
+
+    def row(self, index):
+        """Return a row as a dictionary."""
+        return {column_name: values[index] for column_name, values in self.columns.items()}
+
+    def rows(self, column_names=None):
+        """Return the rows as dictionaries, with only the given columns if any, for the jpaths `lookup` can't resolve.
+
+        The rows are built on each call and not kept, so that the table doesn't hold a copy of the parsed rows.
+        """
+        if column_names is None:
+            return list(self)
+        columns = {
+            column_name: self.columns[column_name] for column_name in column_names if column_name in self.columns
+        }
+        return [
+            {column_name: values[index] for column_name, values in columns.items()} for index in range(self.row_count)
+        ]
+
+    def get_row_indexes(self, column_name, key):
+        """Return the indexes of the rows where a column equals `key`, the column is indexed on its first lookup."""
+        if column_name not in self._keys:
+            keys = {}
+            for index, value in enumerate(self.column(column_name)):
+                if isinstance(value, str):
+                    keys.setdefault(value, []).append(index)
+            self._keys[column_name] = keys
+        return self._keys[column_name].get(key, [])
+
+    def lookup(self, column_name, key):
+        """Return the rows where a column equals `key`, in the order they appear in the table."""
+        return [self.row(index) for index in self.get_row_indexes(column_name, key)]
+
+    def get_value(self, column_name, key, value_column, default=None):
+        """Return the value of `value_column` in the first row where `column_name` equals `key`.
+
+        E.g. `table.get_value("interface", "Ethernet1/1", "mtu")`.
+        """
+        indexes = self.get_row_indexes(column_name, key)
+        if not indexes or value_column not in self.columns:
+            return default
+        return self.columns[value_column][indexes[0]]
+
+
+def to_parsed_table(parsed_output):
+    """Return the ParsedTable of a parsed command output if the `columnar_parsed_tables` app setting is enabled.
+
+    Parsed outputs that aren't a table of rows with the same columns are returned as is.
+    """
+    if not PLUGIN_CFG.get("columnar_parsed_tables"):
+        return parsed_output
+    return ParsedTable.from_rows(parsed_output) or parsed_output
@@ -1,39 +1,84 @@
 """Processor used by Nornir command getter tasks to prep data for SSoT framework sync and to catch unknown errors."""
 
+import os
 from typing import Dict
 
-from jsonschema import ValidationError, validate
+from nautobot.dcim.utils import get_all_network_driver_mappings
 from nornir.core.inventory import Host
 from nornir.core.task import MultiResult, Task
 from nornir_nautobot.plugins.processors import BaseLoggingProcessor
 
 from nautobot_device_onboarding.constants import NETWORK_DRIVER_TO_MANUFACTURER
+from nautobot_device_onboarding.nornir_plays.etl import drop_invalid_interfaces, run_etl, validate_ssot_data
 from nautobot_device_onboarding.nornir_plays.formatter import extract_show_data
-from nautobot_device_onboarding.nornir_plays.schemas import NETWORK_DATA_SCHEMA, NETWORK_DEVICES_SCHEMA
 from nautobot_device_onboarding.utils.helper import close_threaded_db_connections
 
 
 class CommandGetterProcessor(BaseLoggingProcessor):
     """Processor class for Command Getter Nornir Tasks."""
 
-    def __init__(self, logger, command_outputs, job):
-        """Set logging facility."""
+    def __init__(  # pylint: disable=too-many-arguments
+        self, logger, command_outputs, job, etl_pool=None, network_data_plans=None, spool=None, recorder=None
+    ):
+        """Set logging facility.
+
+        Args:
+            logger (NornirLogger): logger for the job.
+            command_outputs (dict): dictionary the ready for ssot data is collected into, keyed by host name.
+            job (Job): the Nautobot job.
+            etl_pool (ETLProcessPool): optional process pool to hand raw command outputs to for parsing, extraction
+                and validation. Results are merged in by `collect_etl_results` once the Nornir run is complete.
+            network_data_plans (dict): sync_network_data CommandPlan keyed by platform, when the commands of both
+                job types run in one connection. The outputs are then extracted with these plans too, into
+                `network_data`.
+            spool (CommandOutputSpool): optional spool the raw command outputs are written to as each command
+                completes. They're dropped from the Nornir results once the host is done, and read back from the spool
+                for the ETL stage.
+            recorder (CommandOutputRecorder): optional recorder the raw command outputs are recorded to as each command
+                completes.
+        """
         self.logger = logger
         self.data: Dict = command_outputs
         self.job = job
+        self.etl_pool = etl_pool
+        self.network_data_plans = network_data_plans
+        self.network_data: Dict = {}
+        self.spool = spool
+        self.recorder = recorder
+
+    @staticmethod
+    def _get_host_header(platform, default_manufacturer="PLACEHOLDER"):
+        return {
+            "platform": platform,
+            "manufacturer": (
+                NETWORK_DRIVER_TO_MANUFACTURER.get(platform, platform.split("_")[0].title())
+                if platform
+                else default_manufacturer
+            ),
+            "network_driver": platform,
+        }
+
+    def _init_host_data(self, host_name, platform):
+        if not self.data.get(host_name):
+            self.data[host_name] = self._get_host_header(platform)
 
     def task_instance_started(self, task: Task, host: Host) -> None:
         """Processor for logging and data processing on task start."""
-        if not self.data.get(host.name):
-            self.data[host.name] = {
-                "platform": host.platform,
-                "manufacturer": (
-                    NETWORK_DRIVER_TO_MANUFACTURER.get(host.platform, host.platform.split("_")[0].title())
-                    if host.platform
-                    else "PLACEHOLDER"
-                ),
-                "network_driver": host.platform,
-            }
+        self._init_host_data(host.name, host.platform)
+
+    def report_failed_host(self, host_name, platform, failed_reason):
+        """Mark a host that was removed from the inventory before the Nornir run as failed.
+
+        Args:
+            host_name (str): name of the host.
+            platform (str): platform of the host, if known. Its manufacturer is reported as Unknown otherwise, e.g. when
+                the host failed before its platform was autodetected.
+            failed_reason (str): why the host failed.
+        """
+        self.logger.info(f"{host_name} failed with result: {failed_reason}", extra={"object": host_name})
+        if not self.data.get(host_name):
+            self.data[host_name] = self._get_host_header(platform, default_manufacturer="Unknown")
+        self.data[host_name].update({"failed": True, "failed_reason": failed_reason})
 
     @close_threaded_db_connections
     def task_instance_completed(self, task: Task, host: Host, result: MultiResult) -> None:
@@ -63,36 +108,206 @@ class CommandGetterProcessor(BaseLoggingProcessor):
                 return
             else:
                 self.data[host.name].update({"failed": True})
+        if self.spool:
+            self._process_spooled_outputs(task, host, result)
+            return
         # [1:] because result 1 is the (network_send_commands ) task which runs all the subtask, it has no result.
         if not self.data[host.name].get("failed"):
             for res in result[1:]:
                 parsed_command_outputs[res.name] = res.result
 
+            if self.etl_pool:
+                self.etl_pool.submit(
+                    host,
+                    get_all_network_driver_mappings().get(host.platform, {}).get("ntc_templates"),
+                    parsed_command_outputs,
+                )
+                self._process_network_data(host, parsed_command_outputs, None)
+                return
             ready_for_ssot_data = extract_show_data(
                 host, parsed_command_outputs, task.params["command_getter_job"], self.job.debug
             )
-            if task.params["command_getter_job"] == "sync_devices":
-                try:
-                    validate(ready_for_ssot_data, NETWORK_DEVICES_SCHEMA)
-                except ValidationError as e:
-                    if self.job.debug:
-                        self.logger.debug(f"Schema validation failed for {host.name}. Error: {e}.")
-                    self.data[host.name] = {"failed": True, "failed_reason": "Schema validation failed."}
-                else:
-                    if self.job.debug:
-                        self.logger.debug(f"Ready for ssot data: {host.name} {ready_for_ssot_data}")
-                    self.data[host.name].update(ready_for_ssot_data)
-            elif task.params["command_getter_job"] == "sync_network_data":
-                try:
-                    validate(ready_for_ssot_data, NETWORK_DATA_SCHEMA)
-                except ValidationError as err:
-                    if self.job.debug:
-                        self.logger.debug(f"Schema validation failed for {host.name} Error: {err}")
-                    self.data[host.name] = {"failed": True, "failed_reason": "Schema validation failed."}
-                else:
-                    if self.job.debug:
-                        self.logger.debug(f"Ready for ssot data: {host.name} {ready_for_ssot_data}")
-                    self.data[host.name].update(ready_for_ssot_data)
+            invalid_interfaces = {}
+            if task.params["command_getter_job"] == "sync_network_data":
+                invalid_interfaces = drop_invalid_interfaces(ready_for_ssot_data)
+            validation_error = validate_ssot_data(ready_for_ssot_data, task.params["command_getter_job"])
+            self._update_ready_for_ssot_data(host.name, ready_for_ssot_data, validation_error, invalid_interfaces)
+            parser_context = {
+                "textfsm_template_dir": task.params.get("textfsm_template_dir"),
+                "ttp_template_files": task.params.get("ttp_template_files"),
+            }
+            self._process_network_data(host, parsed_command_outputs, parser_context)
+
+    def _process_spooled_outputs(self, task, host, result):
+        """Drop the raw command outputs of a completed host from its results, and process them from the spool."""
+        # [1:] because result 1 is the (network_send_commands ) task which runs all the subtask, it has no result.
+        for res in result[1:]:
+            res.result = None
+        if self.data[host.name].get("failed"):
+            self.spool.discard(host.name)
+            return
+        spool_file = self.spool.get_spool_file(host.name)
+        if self.etl_pool and os.path.exists(spool_file):
+            # The worker process reads the outputs from the spool file.
+            self.process_command_outputs(host, None, task.params["command_getter_job"], None, spool_file=spool_file)
+            return
+        command_outputs = self.spool.read(host.name)
+        self.spool.discard(host.name)
+        parser_context = {
+            "textfsm_template_dir": task.params.get("textfsm_template_dir"),
+            "ttp_template_files": task.params.get("ttp_template_files"),
+        }
+        self.process_command_outputs(host, command_outputs, task.params["command_getter_job"], parser_context)
+
+    def _report_invalid_interfaces(self, host_name, invalid_interfaces):
+        """Log the interfaces of a host dropped because they didn't pass schema validation."""
+        if not invalid_interfaces:
+            return
+        self.logger.warning(
+            f"Schema validation failed for {len(invalid_interfaces)} interfaces of {host_name}, they're not synced: "
+            f"{', '.join(invalid_interfaces)}",
+            extra={"object": host_name},
+        )
+        if self.job.debug:
+            for interface_name, errors in invalid_interfaces.items():
+                self.logger.debug(f"Schema validation failed for {host_name} {interface_name}. Errors: {errors}.")
+
+    def _update_ready_for_ssot_data(self, host_name, ready_for_ssot_data, validation_error, invalid_interfaces=None):
+        """Store the extracted data of a host, or mark the host as failed if it didn't pass schema validation."""
+        self._report_invalid_interfaces(host_name, invalid_interfaces)
+        if validation_error:
+            if self.job.debug:
+                self.logger.debug(f"Schema validation failed for {host_name}. Error: {validation_error}.")
+            self.data[host_name] = {"failed": True, "failed_reason": "Schema validation failed."}
+        else:
+            if self.job.debug:
+                self.logger.debug(f"Ready for ssot data: {host_name} {ready_for_ssot_data}")
+            self.data[host_name].update(ready_for_ssot_data)
+
+    def _process_network_data(self, host, command_outputs, parser_context, spool_file=None):
+        """Extract the sync_network_data of a host from the outputs of the commands run for both job types."""
+        if self.network_data_plans is None:
+            return
+        command_plan = self.network_data_plans.get(host.platform)
+        if not command_plan:
+            self.network_data[host.name] = {
+                "failed": True,
+                "failed_reason": f"{host.name} has missing definitions in command_mapper YAML file.",
+            }
+            return
+        ntc_platform = get_all_network_driver_mappings().get(host.platform, {}).get("ntc_templates")
+        if self.etl_pool:
+            self.etl_pool.submit(
+                host,
+                ntc_platform,
+                command_outputs,
+                command_plan=command_plan,
+                command_getter_job="sync_network_data",
+                spool_file=spool_file,
+            )
+            return
+        etl_options = {
+            "command_getter_job": "sync_network_data",
+            "debug": self.job.debug,
+            "fail_job_on_task_failure": self.job.fail_job_on_task_failure,
+            "parser_context": parser_context,
+        }
+        self._update_network_data(
+            run_etl(host.name, host.platform, ntc_platform, command_plan, command_outputs, etl_options),
+            host.platform,
+        )
+
+    def _update_network_data(self, etl_result, platform):
+        """Store the sync_network_data ETL result of a host, return whether the host failed in the ETL stage."""
+        failed_reason = etl_result["failed_reason"]
+        self._report_invalid_interfaces(etl_result["host"], etl_result.get("invalid_interfaces"))
+        if not failed_reason and etl_result["validation_error"]:
+            if self.job.debug:
+                self.logger.debug(
+                    f"Network data schema validation failed for {etl_result['host']}. "
+                    f"Error: {etl_result['validation_error']}."
+                )
+            failed_reason = "Schema validation failed."
+        if failed_reason:
+            self.logger.info(
+                f"Network data ETL failed on {etl_result['host']} with result: {failed_reason}",
+                extra={"object": etl_result["host"]},
+            )
+            self.network_data[etl_result["host"]] = {"failed": True, "failed_reason": failed_reason}
+            return True
+        self.network_data[etl_result["host"]] = {**self._get_host_header(platform), **etl_result["data"]}
+        return False
+
+    def _update_etl_result(self, etl_result):
+        """Store the ETL result of a host, return whether the host failed in the ETL stage."""
+        if etl_result.get("command_getter_job") == "sync_network_data" and self.network_data_plans is not None:
+            return self._update_network_data(etl_result, self.data.get(etl_result["host"], {}).get("platform"))
+        if etl_result["failed_reason"]:
+            self.logger.info(
+                f"ETL failed on {etl_result['host']} with result: {etl_result['failed_reason']}",
+                extra={"object": etl_result["host"]},
+            )
+            self.data[etl_result["host"]].update({"failed": True, "failed_reason": etl_result["failed_reason"]})
+            return True
+        self._update_ready_for_ssot_data(
+            etl_result["host"], etl_result["data"], etl_result["validation_error"], etl_result.get("invalid_interfaces")
+        )
+        return False
+
+    def collect_etl_results(self):
+        """Wait for the ETL process pool and merge its results, call once the Nornir run is complete.
+
+        Returns:
+            list: names of the hosts that failed in the ETL stage.
+        """
+        failed_hosts = []
+        if not self.etl_pool:
+            return failed_hosts
+        for etl_result in self.etl_pool.results():
+            if self._update_etl_result(etl_result):
+                failed_hosts.append(etl_result["host"])
+        return failed_hosts
+
+    @close_threaded_db_connections
+    def process_command_outputs(  # pylint: disable=too-many-arguments
+        self, host, command_outputs, command_getter_job, parser_context, spool_file=None
+    ):
+        """Parse, extract and validate the raw command outputs of a host collected outside of a Nornir run.
+
+        Used by the asyncio engine, see `run_async_command_getter`, and for the outputs read from the spool. The
+        outputs are handed to the ETL process pool if there is one, otherwise processed right away.
+
+        Args:
+            host (Host): Nornir host the commands were run on, with its `command_plan` set.
+            command_outputs (dict): raw command outputs keyed by command, None if they're in `spool_file`.
+            command_getter_job (str): sync_devices or sync_network_data.
+            parser_context (dict): result of `get_parser_context()`.
+            spool_file (str): spool file the ETL process pool reads the raw command outputs from.
+
+        Returns:
+            bool: whether the host failed in the ETL stage, always False when the ETL process pool is used.
+        """
+        self._init_host_data(host.name, host.platform)
+        ntc_platform = get_all_network_driver_mappings().get(host.platform, {}).get("ntc_templates")
+        if self.etl_pool and self.spool and spool_file is None:
+            # Spooled so that the ETL work waiting for a worker process doesn't hold the raw outputs.
+            for command, output in command_outputs.items():
+                self.spool.write(host.name, command, output)
+            spool_file = self.spool.get_spool_file(host.name)
+            command_outputs = None
+        self._process_network_data(host, command_outputs, parser_context, spool_file=spool_file)
+        if self.etl_pool:
+            self.etl_pool.submit(host, ntc_platform, command_outputs, spool_file=spool_file)
+            return False
+        etl_options = {
+            "command_getter_job": command_getter_job,
+            "debug": self.job.debug,
+            "fail_job_on_task_failure": self.job.fail_job_on_task_failure,
+            "parser_context": parser_context,
+        }
+        return self._update_etl_result(
+            run_etl(host.name, host.platform, ntc_platform, host.data["command_plan"], command_outputs, etl_options)
+        )
 
     def subtask_instance_completed(self, task: Task, host: Host, result: MultiResult) -> None:
         """Processor for logging and data processing on subtask completed."""
@@ -100,6 +315,10 @@ class CommandGetterProcessor(BaseLoggingProcessor):
             f"Subtask {'failed' if result.failed else 'succeeded'}: {task.name}, {task.host}.",
             extra={"object": task.host},
         )
+        if self.spool and not result.failed:
+            self.spool.write(host.name, task.name, result[0].result)
+        if self.recorder and not result.failed:
+            self.recorder.record(host, task.name, result[0].result)
         if result.failed:
             for res in result:
                 if res.exception:
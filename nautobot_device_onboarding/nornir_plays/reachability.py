@@ -0,0 +1,122 @@
+"""Concurrent TCP reachability sweep of the hosts to connect to."""
+
+import errno
+import ipaddress
+import selectors
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Seconds to wait for a TCP connection, the same default as `netutils.ping.tcp_ping`.
+DEFAULT_TIMEOUT = 1
+
+# Maximum number of connection attempts in flight at once, bounded by the number of open file descriptors.
+DEFAULT_MAX_IN_FLIGHT = 512
+
+# Maximum number of hostnames resolved at once, getaddrinfo blocks until the DNS server answers.
+DEFAULT_MAX_RESOLVERS = 32
+
+_CONNECT_IN_PROGRESS = (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+
+def _is_ip_address(hostname):
+    """Return whether the hostname is an IP address, which doesn't need a DNS lookup."""
+    try:
+        ipaddress.ip_address(hostname)
+    except ValueError:
+        return False
+    return True
+
+
+def _resolve(hostname, port):
+    """Return the (family, type, proto, canonname, address) to connect to, or None if the host can't be resolved."""
+    if not hostname:
+        return None
+    try:
+        return socket.getaddrinfo(hostname, int(port), type=socket.SOCK_STREAM)[0]
+    except (OSError, ValueError, UnicodeError):
+        return None
+
+
+def _resolve_all(targets, max_resolvers=DEFAULT_MAX_RESOLVERS):
+    """Resolve the (hostname, port) targets, keyed by host name, the hostnames that aren't IP addresses in threads."""
+    resolved = {}
+    hostnames = {}
+    for name, (hostname, port) in targets.items():
+        if hostname and not _is_ip_address(hostname):
+            hostnames[name] = (hostname, port)
+        else:
+            resolved[name] = _resolve(hostname, port)
+    if hostnames:
+        with ThreadPoolExecutor(max_workers=min(max_resolvers, len(hostnames))) as executor:
+            futures = {name: executor.submit(_resolve, hostname, port) for name, (hostname, port) in hostnames.items()}
+            resolved.update({name: future.result() for name, future in futures.items()})
+    return resolved
+
+
+def _start_connection(addrinfo):
+    """Start a non blocking TCP connection, return the socket or None if the connection failed right away."""
+    if addrinfo is None:
+        return None
+    family, sock_type, proto, _, address = addrinfo
+    sock = None
+    try:
+        sock = socket.socket(family, sock_type, proto)
+        sock.setblocking(False)
+        if sock.connect_ex(address) in _CONNECT_IN_PROGRESS:
+            return sock
+    except OSError:
+        # E.g. EMFILE when out of file descriptors, only this host is reported unreachable.
+        pass
+    if sock is not None:
+        sock.close()
+    return None
+
+
+def sweep_tcp_reachability(targets, timeout=DEFAULT_TIMEOUT, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """Check whether a TCP connection can be opened to each target, with all connection attempts in flight at once.
+
+    Hostnames are resolved beforehand in a thread pool, so that the DNS lookups don't hold up the connections.
+
+    Args:
+        targets (dict): (hostname, port) tuples keyed by host name.
+        timeout (float): seconds to wait for each connection.
+        max_in_flight (int): maximum number of connection attempts in flight at once.
+
+    Returns:
+        dict: seconds it took to open the connection, or None if the host is unreachable, keyed by host name.
+    """
+    results = {}
+    addrinfos = _resolve_all(targets)
+    pending = list(targets)
+    pending.reverse()
+    in_flight = {}
+    with selectors.DefaultSelector() as selector:
+        while pending or in_flight:
+            while pending and len(in_flight) < max_in_flight:
+                name = pending.pop()
+                sock = _start_connection(addrinfos[name])
+                if sock is None:
+                    results[name] = None
+                    continue
+                started = time.monotonic()
+                in_flight[sock] = (name, started)
+                selector.register(sock, selectors.EVENT_WRITE)
+            if not in_flight:
+                continue
+            now = time.monotonic()
+            next_deadline = min(started for _, started in in_flight.values()) + timeout
+            for key, _ in selector.select(timeout=max(next_deadline - now, 0)):
+                name, started = in_flight.pop(key.fileobj)
+                connected = key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+                results[name] = time.monotonic() - started if connected else None
+                selector.unregister(key.fileobj)
+                key.fileobj.close()
+            now = time.monotonic()
+            for sock, (name, started) in list(in_flight.items()):
+                if now - started >= timeout:
+                    results[name] = None
+                    del in_flight[sock]
+                    selector.unregister(sock)
+                    sock.close()
+    return {name: results[name] for name in targets}
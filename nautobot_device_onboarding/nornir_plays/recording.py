@@ -0,0 +1,156 @@
+"""Recording of the raw command outputs of a job run, and their replay in place of the device sessions.
+
+A recording is a gzip compressed file of JSON lines, one per command output, with the name, hostname and platform of
+the host it was collected from. It's attached to the job result of the run that recorded it, and can be uploaded to a
+later run of the sync jobs to parse, extract and sync the recorded outputs without connecting to the devices.
+"""
+
+import gzip
+import json
+import tempfile
+import threading
+from contextlib import nullcontext
+
+from nornir.core.task import Result
+
+from nautobot_device_onboarding.constants import PLUGIN_CFG
+from nautobot_device_onboarding.utils.helper import get_job_option
+
+RECORDING_FILE_NAME = "command_outputs_recording.jsonl.gz"
+
+
+class CommandOutputNotRecordedError(Exception):
+    """The output of a command wasn't recorded for a host."""
+
+
+class CommandOutputRecorder:
+    """Recorder of the raw command outputs of a job run, written to a compressed temporary file as they're collected.
+
+    Commands of different hosts complete concurrently, so the writes are serialized with a lock.
+    """
+
+    def __init__(self, directory=None):
+        """Create the temporary file of the recording.
+
+        Args:
+            directory (str): directory the temporary file is created in, defaults to the `command_output_spool_dir`
+                app setting or the system temporary directory.
+        """
+        self._file = tempfile.TemporaryFile(dir=directory or PLUGIN_CFG.get("command_output_spool_dir") or None)
+        self._gzip = gzip.GzipFile(fileobj=self._file, mode="wb")
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def __enter__(self):
+        """Return the recorder for use as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        """Remove the temporary file of the recording."""
+        self.close()
+
+    def record(self, host, command, output):
+        """Record the raw output of a command run on a host.
+
+        Args:
+            host (Host): Nornir host the command was run on.
+            command (str): the command.
+            output (str): raw output of the command.
+        """
+        line = json.dumps(
+            {
+                "host": host.name,
+                "hostname": host.hostname,
+                "platform": host.platform,
+                "command": command,
+                "output": output,
+            }
+        )
+        with self._lock:
+            self._gzip.write(f"{line}\n".encode("utf-8"))
+            self.count += 1
+
+    def read(self):
+        """Complete the recording and return the content of its compressed file."""
+        with self._lock:
+            self._gzip.close()
+            self._file.seek(0)
+            return self._file.read()
+
+    def save(self, job):
+        """Complete the recording and attach it to the job result, see `Job.create_file`."""
+        job.create_file(RECORDING_FILE_NAME, self.read())
+        job.logger.info(f"Recorded {self.count} command outputs to {RECORDING_FILE_NAME}.")
+
+    def close(self):
+        """Remove the temporary file of the recording."""
+        self._file.close()
+
+
+class CommandOutputReplay:
+    """Raw command outputs of a recording, returned in place of the outputs of the devices.
+
+    The outputs of a host are looked up by its name, then by its hostname, so that the outputs recorded by the sync
+    devices jobs, whose hosts are named after their IP address, can be replayed by the sync network data job. Outputs
+    recorded for another platform than the platform of the host aren't replayed.
+    """
+
+    def __init__(self, recording):
+        """Load the outputs of a recording.
+
+        Args:
+            recording (file): binary file object of a recording, e.g. the uploaded file of a job.
+        """
+        self.hosts = {}
+        with gzip.GzipFile(fileobj=recording, mode="rb") as lines:
+            for line in lines:
+                record = json.loads(line)
+                host = self.hosts.setdefault(record["host"], {"platform": record["platform"], "command_outputs": {}})
+                host["command_outputs"][record["command"]] = record["output"]
+                if record["hostname"] and record["hostname"] != record["host"]:
+                    self.hosts.setdefault(record["hostname"], host)
+
+    def _get_host(self, host_name, hostname=None):
+        return self.hosts.get(host_name) or self.hosts.get(hostname) or {}
+
+    def get_platform(self, host_name, hostname=None):
+        """Return the platform the outputs of a host were recorded with, None if none were recorded."""
+        return self._get_host(host_name, hostname).get("platform")
+
+    def get_output(self, host, command):
+        """Return the recorded raw output of a command run on a host.
+
+        Raises:
+            CommandOutputNotRecordedError: if the output wasn't recorded for the host and its platform.
+        """
+        recorded = self._get_host(host.name, host.hostname)
+        if recorded.get("platform") != host.platform or command not in recorded["command_outputs"]:
+            raise CommandOutputNotRecordedError(f"The output of '{command}' wasn't recorded for {host.name}.")
+        return recorded["command_outputs"][command]
+
+
+def replay_send_command(task, command_string, replay, **kwargs):  # pylint: disable=unused-argument
+    """Nornir task returning the recorded output of a command, in place of `netmiko_send_command`.
+
+    Args:
+        task (Task): Nornir task of the host.
+        command_string (str): the command.
+        replay (CommandOutputReplay): the recorded outputs.
+        kwargs: the other `netmiko_send_command` arguments, e.g. `read_timeout`, ignored.
+    """
+    return Result(host=task.host, result=replay.get_output(task.host, command_string))
+
+
+def get_command_output_recorder(job):
+    """Return a context manager yielding a CommandOutputRecorder if the job enabled it, otherwise None."""
+    if get_job_option(job, "record_command_outputs", False):
+        return CommandOutputRecorder()
+    return nullcontext()
+
+
+def get_command_output_replay(job):
+    """Return the CommandOutputReplay of the recording uploaded to the job, None if there is none."""
+    recording = get_job_option(job, "replay_command_outputs", None)
+    if not recording:
+        return None
+    return CommandOutputReplay(recording)
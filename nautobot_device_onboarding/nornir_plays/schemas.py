@@ -138,6 +138,71 @@ NETWORK_DEVICES_SCHEMA = {
     },
 }
 
+# Validated separately for each interface, so that a malformed interface is dropped instead of the whole device. Empty
+# values extracted from the command outputs are rendered as empty lists, whatever the type of the field.
+NETWORK_DATA_INTERFACE_SCHEMA = {
+    "title": "Sync Network Data Interface",
+    "description": "Schema of an interface of SSoT Sync Network Data From Network",
+    "type": "object",
+    "required": ["type", "ip_addresses", "mac_address", "mtu", "description", "link_status", "802.1Q_mode"],
+    "properties": {
+        "type": {"type": "string", "description": "Type of the network interface"},
+        "mac_address": {"type": ["string", "array"], "maxItems": 0, "description": "MAC address of the interface"},
+        "mtu": {"type": ["string", "integer"], "description": "MTU of the interface"},
+        "description": {"type": ["string", "array"], "maxItems": 0, "description": "Description of the interface"},
+        "link_status": {"type": ["string", "boolean"], "description": "Link status of the interface (up or down)"},
+        "ip_addresses": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["ip_address"],
+                "properties": {
+                    "ip_address": {"type": "string", "description": "IP address of the interface"},
+                    "prefix_length": {"type": ["string", "integer"], "description": "Prefix length of the IP address"},
+                },
+                # An empty ip_address is skipped, it may come without a prefix_length.
+                "if": {"properties": {"ip_address": {"minLength": 1}}},
+                "then": {"required": ["prefix_length"]},
+            },
+            "description": "List of IP addresses associated with the interface",
+        },
+        "802.1Q_mode": {"type": "string", "description": "802.1Q mode of the interface (access, trunk, etc.)"},
+        "lag": {
+            "type": ["string", "array"],
+            "maxItems": 0,
+            "description": "LAG (Link Aggregation Group) the interface belongs to (optional)",
+        },
+        "tagged_vlans": {
+            "anyOf": [
+                {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "required": ["name", "id"],
+                        "properties": {
+                            "name": {"type": "string", "description": "Name of the tagged VLAN"},
+                            "id": {"type": "string", "description": "ID of the tagged VLAN"},
+                        },
+                    },
+                },
+                {"type": "object", "maxProperties": 0},
+            ],
+            "description": "List of tagged VLANs associated with the interface (optional)",
+        },
+        "untagged_vlan": {
+            "type": ["object", "array"],
+            "maxItems": 0,
+            "description": "Untagged VLAN information (optional)",
+        },
+        "vrf": {
+            "type": ["object", "array"],
+            "maxItems": 0,
+            "properties": {"name": {"type": "string"}, "rd": {"type": "string"}},
+            "description": "VRF of the interface (optional)",
+        },
+    },
+}
+
 NETWORK_DATA_SCHEMA = {
     "title": "Sync Network Data From Network",
     "description": "Schema for SSoT Sync Network Data From Network",
@@ -151,59 +216,7 @@ NETWORK_DATA_SCHEMA = {
         },
         "interfaces": {
             "type": "object",
-            "items": {
-                "type": "object",
-                "required": [
-                    "type",
-                    "ip_addresses",
-                    "mac_address",
-                    "mtu",
-                    "description",
-                    "link_status",
-                    "802.1Q_mode",
-                ],
-                "properties": {
-                    "type": {"type": "string", "description": "Type of the network interface"},
-                    "mac_address": {"type": "string", "description": "MAC address of the interface"},
-                    "mtu": {"type": "string", "description": "MTU of the interface"},
-                    "description": {"type": "string", "description": "Description of the interface"},
-                    "link_status": {"type": "boolean", "description": "Link status of the interface (up or down)"},
-                    "ip_addresses": {
-                        "type": "array",
-                        "minItems": 1,
-                        "items": {
-                            "type": "object",
-                            "required": ["ip_address", "prefix_length"],
-                            "properties": {
-                                "ip_address": {"type": "string", "description": "IP address of the interface"},
-                                "prefix_length": {"type": "integer", "description": "Prefix length of the IP address"},
-                            },
-                        },
-                        "description": "List of IP addresses associated with the interface",
-                    },
-                    "802.1Q_mode": {
-                        "type": "string",
-                        "description": "802.1Q mode of the interface (access, trunk, etc.)",
-                    },
-                    "lag": {
-                        "type": "string",
-                        "description": "LAG (Link Aggregation Group) the interface belongs to (optional)",
-                    },
-                    "tagged_vlans": {
-                        "type": "array",
-                        "items": {
-                            "type": "object",
-                            "required": ["name", "id"],
-                            "properties": {
-                                "name": {"type": "string", "description": "Name of the tagged VLAN"},
-                                "id": {"type": "string", "description": "ID of the tagged VLAN"},
-                            },
-                        },
-                    },
-                    "untagged_vlan": {"type": "object", "description": "Untagged VLAN information (optional)"},
-                    "vrf": {"type": "object", "properties": {"name": {"type": "string"}, "rd": {"type": "string"}}},
-                },
-            },
+            "description": "Interfaces of the network device by name, see NETWORK_DATA_INTERFACE_SCHEMA",
         },
         "cables": {
             "type": "array",
@@ -0,0 +1,87 @@
+"""Spool of the raw command outputs of a job run, written to compressed files instead of held in memory.
+
+Without the spool, the raw outputs of every host stay in the Nornir results until the whole run is complete. With the
+spool, each output is appended to the compressed file of its host as soon as its command completes, and is dropped
+from the Nornir results once the host is done, so the memory used doesn't grow with the number of hosts.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import nullcontext
+
+from nautobot_device_onboarding.constants import PLUGIN_CFG
+from nautobot_device_onboarding.utils.helper import get_job_option
+
+
+def read_spool_file(spool_file):
+    """Return the raw command outputs keyed by command stored in a spool file."""
+    command_outputs = {}
+    with gzip.open(spool_file, "rt", encoding="utf-8") as spool:
+        for line in spool:
+            record = json.loads(line)
+            command_outputs[record["command"]] = record["output"]
+    return command_outputs
+
+
+class CommandOutputSpool:
+    """Directory of a job run holding a gzip compressed file of raw command outputs per host.
+
+    Each host is worked on by a single thread at a time, so appending to the files of the hosts needs no locking.
+    """
+
+    def __init__(self, prefix="onboarding-", directory=None):
+        """Create the spool directory.
+
+        Args:
+            prefix (str): prefix of the spool directory name, e.g. the job result id.
+            directory (str): directory the spool directory is created in, defaults to the `command_output_spool_dir`
+                app setting or the system temporary directory.
+        """
+        self.path = tempfile.mkdtemp(prefix=prefix, dir=directory or PLUGIN_CFG.get("command_output_spool_dir") or None)
+
+    def __enter__(self):
+        """Return the spool for use as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        """Remove the spool directory."""
+        self.close()
+
+    def get_spool_file(self, host_name):
+        """Return the path of the spool file of a host, named after a digest since host names can be any string."""
+        return os.path.join(self.path, f"{hashlib.sha256(host_name.encode()).hexdigest()}.jsonl.gz")
+
+    def write(self, host_name, command, output):
+        """Append the raw output of a command to the spool file of a host."""
+        # Each append adds a gzip member to the file, they're read back as one stream.
+        with gzip.open(self.get_spool_file(host_name), "at", encoding="utf-8") as spool:
+            spool.write(json.dumps({"command": command, "output": output}) + "\n")
+
+    def read(self, host_name):
+        """Return the raw command outputs of a host keyed by command, empty if none were spooled."""
+        spool_file = self.get_spool_file(host_name)
+        if not os.path.exists(spool_file):
+            return {}
+        return read_spool_file(spool_file)
+
+    def discard(self, host_name):
+        """Remove the spool file of a host once its outputs are processed."""
+        try:
+            os.remove(self.get_spool_file(host_name))
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """Remove the spool directory and the files left in it."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def get_command_output_spool(job):
+    """Return a context manager yielding a CommandOutputSpool if the job enabled it, otherwise None."""
+    if get_job_option(job, "spool_command_outputs", False):
+        return CommandOutputSpool(prefix=f"onboarding-{job.job_result.id}-")
+    return nullcontext()
@@ -1,6 +1,8 @@
 """Adds command mapper, platform parsing info."""
 
+import copy
 import os
+from functools import lru_cache
 
 import yaml
 from nautobot.extras.models import GitRepository
@@ -12,6 +14,9 @@ from nautobot_device_onboarding.constants import (
 
 DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), "command_mappers"))
 
+# The C loader is an order of magnitude faster, but only available if PyYAML was built against libyaml.
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 def get_git_repo():
     """Get the git repo object."""
@@ -55,17 +60,36 @@ def add_platform_parsing_info():
 
 
 def load_command_mappers_from_dir(command_mappers_path):
-    """Helper to load all yaml files in directory and return merged dictionary."""
+    """Helper to load all yaml files in directory and return merged dictionary.
+
+    The files are only parsed again once one of them is added, removed or modified, e.g. by a git repository sync.
+    """
+    files_signature = []
+    for filename in sorted(os.listdir(command_mappers_path)):
+        file_path = os.path.join(command_mappers_path, filename)
+        if os.path.isfile(file_path):
+            files_signature.append((filename, os.path.getmtime(file_path)))
+    # Callers are free to modify the result, don't hand out the cached one.
+    return copy.deepcopy(_load_command_mappers(command_mappers_path, tuple(files_signature)))
+
+
+@lru_cache(maxsize=8)
+def _load_command_mappers(command_mappers_path, files_signature):
+    """Load the yaml files of `files_signature`, a tuple of (filename, mtime), found in `command_mappers_path`."""
     command_mappers_result = {}
-    files = [f for f in os.listdir(command_mappers_path) if os.path.isfile(os.path.join(command_mappers_path, f))]
-    for filename in files:
+    for filename, _ in files_signature:
         with open(os.path.join(command_mappers_path, filename), encoding="utf-8") as fd:
             network_driver = filename.split(".")[0]
-            command_mappers_data = yaml.safe_load(fd)
+            command_mappers_data = yaml.load(fd, Loader=YAML_LOADER)  # noqa: S506
             command_mappers_result[network_driver] = command_mappers_data
     return command_mappers_result
 
 
+def clear_command_mappers_cache():
+    """Drop the cached command mappers, e.g. when the command mapper git repository is synced."""
+    _load_command_mappers.cache_clear()
+
+
 def load_files_with_precedence(filesystem_dir, parser_type):
     """Utility to load files from filesystem and git repo with precedence."""
     file_paths = {}
@@ -0,0 +1,86 @@
+"""Python post_processors of the command mappers, returning native objects instead of rendering Jinja2 templates.
+
+A Jinja2 `post_processor` renders the extracted data to a string, which is loaded back from JSON when it builds a
+list or a dictionary. A `python_post_processor` names a callable registered here, or the dotted path of a callable,
+that returns the transformed data as is. It's called with the extracted data, the render context of the Jinja2
+`post_processor` (e.g. `current_key`, `original_host` and the results of the pre_processors) and the keyword
+arguments of `post_processor_kwargs`.
+"""
+
+from functools import lru_cache
+
+from django.utils.module_loading import import_string
+
+from nautobot_device_onboarding.jinja_filters import flatten_list_of_dict_from_value, get_vlan_data, remove_fqdn
+
+POST_PROCESSORS = {}
+
+
+def register_post_processor(name=None, context_keys=None):
+    """Register a callable as a `python_post_processor`, under its function name unless a name is given.
+
+    Args:
+        name (str): name the callable is registered under.
+        context_keys (tuple): keys of the render context the callable uses, e.g. `("vlan_map",)`, so that only the
+            pre_processors it needs are run. If not given, it's assumed to use the results of all pre_processors.
+    """
+
+    def _register(func):
+        if context_keys is not None:
+            func.context_keys = tuple(context_keys)
+        POST_PROCESSORS[name or func.__name__] = func
+        return func
+
+    return _register
+
+
+@lru_cache(maxsize=None)
+def _import_post_processor(dotted_path):
+    try:
+        return import_string(dotted_path)
+    except ImportError as err:
+        raise ValueError(f"Unable to import the python_post_processor {dotted_path}.") from err
+
+
+def get_post_processor(name):
+    """Return the callable of a `python_post_processor`, registered under its name or imported from its dotted path.
+
+    Raises:
+        ValueError: if there is no such callable.
+    """
+    if name in POST_PROCESSORS:
+        return POST_PROCESSORS[name]
+    if "." in name:
+        return _import_post_processor(name)
+    raise ValueError(f"There is no python_post_processor registered as {name}.")
+
+
+@register_post_processor(context_keys=())
+def keys_to_dict(obj, context):  # pylint: disable=unused-argument
+    """Return a dictionary with an empty dictionary for each item, e.g. the names of the interfaces of a device."""
+    return {key: {} for key in obj}
+
+
+@register_post_processor(name="flatten_list_of_dict_from_value", context_keys=())
+def flatten_list_of_dict_from_value_post_processor(obj, context, value):  # pylint: disable=unused-argument
+    """Flatten a list of single key dictionaries to a dictionary of their `value`, e.g. the names of the VLANs."""
+    return flatten_list_of_dict_from_value(obj, value)
+
+
+@register_post_processor(context_keys=("vlan_map",))
+def vlan_data(obj, context, tag_type):
+    """Return the `tagged` or `untagged` VLANs of an interface, named after the `vlan_map` pre_processor."""
+    return get_vlan_data(obj, context["vlan_map"], tag_type)
+
+
+@register_post_processor(context_keys=())
+def cables(obj, context):  # pylint: disable=unused-argument
+    """Return the local interface, remote interface and remote device without its domain name of each neighbor."""
+    return [
+        {
+            "local_interface": cable["local_interface"],
+            "remote_interface": cable["remote_interface"],
+            "remote_device": remove_fqdn(cable["remote_device"]),
+        }
+        for cable in obj
+    ]
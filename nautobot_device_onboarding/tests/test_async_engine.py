@@ -0,0 +1,460 @@
+"""Test the asyncio command collection engine."""
+
+import asyncio
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+from django.utils.asyncio import async_unsafe
+from nautobot.apps.testing import TransactionTestCase
+from nautobot.extras.models import JobLogEntry, JobResult
+from nornir.core.inventory import Host
+
+from nautobot_device_onboarding.nornir_plays.async_engine import (
+    AsyncEngineAuthenticationError,
+    AsyncEngineError,
+    AsyncEngineTimeoutError,
+    AsyncSSHSession,
+    asyncssh,
+    run_async_command_getter,
+)
+from nautobot_device_onboarding.nornir_plays.auth_breaker import AuthCircuitBreaker
+from nautobot_device_onboarding.nornir_plays.command_plan import compile_command_plan
+from nautobot_device_onboarding.nornir_plays.concurrency import ConcurrencyLimiter
+from nautobot_device_onboarding.nornir_plays.logger import NornirLogger
+from nautobot_device_onboarding.nornir_plays.processor import CommandGetterProcessor
+
+try:
+    from fakenos import FakeNOS
+    from fakenos.core.host import Host as FakeNOSHost
+except ImportError:
+    FakeNOS = None
+
+COMMAND_MAPPER = {
+    "hostname": {"commands": [{"command": "show version", "parser": "textfsm", "jpath": "[*].hostname"}]},
+    "serial": {"commands": [{"command": "show inventory", "parser": "textfsm", "jpath": "[*].sn"}]},
+}
+NETWORK_DRIVER_MAPPINGS = {
+    "cisco_ios": {"ntc_templates": "cisco_ios"},
+    "arista_eos": {"ntc_templates": "arista_eos"},
+    "hp_procurve": {"ntc_templates": "hp_procurve"},
+}
+
+
+class FakeDeviceStreams:
+    """Stdin and stdout of a fake device CLI, answering each command with its output and the prompt."""
+
+    def __init__(self, outputs, prompt="router#"):
+        self.outputs = outputs
+        self.prompt = prompt
+        self.queue = asyncio.Queue()
+        self.queue.put_nowait(f"Welcome\r\n{prompt}")
+
+    def write(self, data):
+        command = data.strip()
+        if not command:
+            self.queue.put_nowait(f"\r\n{self.prompt}")
+        elif command in self.outputs:
+            self.queue.put_nowait(f"{command}\r\n{self.outputs[command]}\r\n{self.prompt}")
+
+    async def read(self, _):
+        return await self.queue.get()
+
+
+class FakeEnableStreams(FakeDeviceStreams):
+    """Fake device CLI asking for a username and secret to enter the privileged mode."""
+
+    def __init__(self, outputs, secret, prompt="switch>"):
+        super().__init__(outputs, prompt=prompt)
+        self.secret = secret
+        self.written = []
+        self.expected_answer = None
+
+    def write(self, data):
+        self.written.append(data)
+        command = data.strip()
+        if self.expected_answer == "username":
+            self.expected_answer = "secret"
+            self.queue.put_nowait(f"{command}\r\nPassword:")
+        elif self.expected_answer == "secret":
+            self.expected_answer = None
+            if command == self.secret:
+                self.prompt = f"{self.prompt[:-1]}#"
+            self.queue.put_nowait(f"\r\n{self.prompt}")
+        elif command == "enable":
+            self.expected_answer = "username"
+            self.queue.put_nowait("enable\r\nUser Name:")
+        else:
+            super().write(data)
+
+
+class TestAsyncSSHSession(unittest.TestCase):
+    """Test sending commands and reading their outputs up to the prompt."""
+
+    def _session(self, streams):
+        session = AsyncSSHSession("192.0.2.1", 22, "admin", "admin", "cisco_ios", connect_timeout=1)
+        session.reader = streams
+        session.writer = streams
+        return session
+
+    def test_send_command(self):
+        async def _run():
+            streams = FakeDeviceStreams(
+                {"show version": "Cisco IOS\r\nrouter uptime is 1 week", "terminal length 0": ""}
+            )
+            session = self._session(streams)
+            self.assertEqual("router#", await session.find_prompt())
+            # The prompt printed for the newline sent to find the prompt is not mistaken for the end of the output.
+            streams.queue.put_nowait(f"\r\n{streams.prompt}")
+            self.assertEqual("Cisco IOS\nrouter uptime is 1 week", await session.send_command("show version"))
+            self.assertEqual("", await session.send_command("terminal length 0"))
+
+        asyncio.run(_run())
+
+    def test_prompt_of_other_modes(self):
+        async def _run():
+            streams = FakeDeviceStreams({"enable": ""}, prompt="router>")
+            session = self._session(streams)
+            await session.find_prompt()
+            streams.prompt = "router#"
+            self.assertEqual("", await session.send_command("enable"))
+
+        asyncio.run(_run())
+
+    def test_read_timeout(self):
+        async def _run():
+            session = self._session(FakeDeviceStreams({}))
+            await session.find_prompt()
+            with self.assertRaises(AsyncEngineTimeoutError):
+                await session.send_command("show unknown", read_timeout=0.1)
+
+        asyncio.run(_run())
+
+    def _enable_session(self, streams, secret):
+        session = AsyncSSHSession(
+            "192.0.2.1", 22, "admin", "password", "brocade_fastiron", connect_timeout=1, secret=secret
+        )
+        session.reader = streams
+        session.writer = streams
+        return session
+
+    def test_enable(self):
+        async def _run():
+            streams = FakeEnableStreams({"show version": "ICX7250"}, secret="enable-secret")
+            session = self._enable_session(streams, "enable-secret")
+            await session.find_prompt()
+            await session.enable()
+            self.assertEqual(["\n", "enable\n", "admin\n", "enable-secret\n"], streams.written)
+            self.assertEqual("ICX7250", await session.send_command("show version"))
+
+        asyncio.run(_run())
+
+    def test_enable_wrong_secret(self):
+        async def _run():
+            streams = FakeEnableStreams({}, secret="enable-secret")
+            session = self._enable_session(streams, None)
+            await session.find_prompt()
+            with self.assertRaises(AsyncEngineError):
+                await session.enable()
+            # Without a secret the password is sent.
+            self.assertEqual("password\n", streams.written[-1])
+
+        asyncio.run(_run())
+
+
+class FakeSession:
+    """Session answering every command with its name, tracking how many sessions are open at once."""
+
+    open_sessions = 0
+    max_open_sessions = 0
+    all_open = None
+    expected_open = 0
+    failures = {}
+    read_timeouts = {}
+
+    def __init__(self, hostname, port, username, password, platform, secret=None):  # pylint: disable=too-many-arguments
+        self.hostname = hostname
+        self.port = port
+        self.platform = platform
+
+    async def open(self):
+        if self.hostname in self.failures:
+            raise self.failures[self.hostname]
+        # Created in the event loop of the engine, one per run.
+        if FakeSession.all_open is None:
+            FakeSession.all_open = asyncio.Event()
+        FakeSession.open_sessions += 1
+        FakeSession.max_open_sessions = max(FakeSession.max_open_sessions, FakeSession.open_sessions)
+        if FakeSession.open_sessions >= FakeSession.expected_open:
+            FakeSession.all_open.set()
+        await asyncio.wait_for(FakeSession.all_open.wait(), 5)
+
+    async def send_command(self, command, read_timeout):
+        FakeSession.read_timeouts[command] = read_timeout
+        return f"{self.hostname} {command}"
+
+    async def close(self):
+        if self.hostname not in self.failures:
+            FakeSession.open_sessions -= 1
+
+
+@patch(
+    "nautobot_device_onboarding.nornir_plays.async_engine.get_all_network_driver_mappings",
+    return_value=NETWORK_DRIVER_MAPPINGS,
+)
+class TestRunAsyncCommandGetter(unittest.TestCase):
+    """Test collecting the command outputs of many hosts at once."""
+
+    def setUp(self):
+        FakeSession.open_sessions = 0
+        FakeSession.max_open_sessions = 0
+        FakeSession.failures = {}
+        FakeSession.read_timeouts = {}
+        FakeSession.all_open = None
+        self.processor = MagicMock()
+        self.processor.job.debug = False
+        self.processor.job.fail_job_on_task_failure = False
+        self.processor.process_command_outputs.return_value = False
+        self.yaml_data = {"cisco_ios": {"sync_devices": COMMAND_MAPPER}, "arista_eos": {"sync_network_data": {}}}
+        self.command_plans = {"cisco_ios": compile_command_plan(COMMAND_MAPPER)}
+
+    def _hosts(self, count, platform="cisco_ios"):
+        return {
+            f"192.0.2.{index}": Host(name=f"192.0.2.{index}", hostname=f"192.0.2.{index}", platform=platform)
+            for index in range(1, count + 1)
+        }
+
+    def _run(self, hosts, max_sessions=100, auth_breaker=None, limiter=None):
+        return run_async_command_getter(
+            hosts,
+            self.processor,
+            self.yaml_data,
+            "sync_devices",
+            self.command_plans,
+            {},
+            max_sessions=max_sessions,
+            session_class=FakeSession,
+            auth_breaker=auth_breaker,
+            limiter=limiter,
+        )
+
+    def test_hosts_are_collected_concurrently(self, _):
+        hosts = self._hosts(50)
+        FakeSession.expected_open = 50
+        self.assertEqual([], self._run(hosts))
+        self.assertEqual(50, FakeSession.max_open_sessions)
+        self.assertEqual(50, self.processor.process_command_outputs.call_count)
+        host, command_outputs, command_getter_job, _ = next(
+            call.args
+            for call in self.processor.process_command_outputs.call_args_list
+            if call.args[0] is hosts["192.0.2.1"]
+        )
+        self.assertIs(self.command_plans["cisco_ios"], host.data["command_plan"])
+        self.assertEqual(
+            {"show version": "192.0.2.1 show version", "show inventory": "192.0.2.1 show inventory"}, command_outputs
+        )
+        self.assertEqual("sync_devices", command_getter_job)
+
+    def test_command_read_timeouts(self, _):
+        command_mapper = {
+            "hostname": COMMAND_MAPPER["hostname"],
+            "serial": {"commands": [{**COMMAND_MAPPER["serial"]["commands"][0], "read_timeout": 5}]},
+        }
+        self.command_plans = {"cisco_ios": compile_command_plan(command_mapper)}
+        FakeSession.expected_open = 1
+        self.assertEqual([], self._run(self._hosts(1)))
+        self.assertEqual({"show version": 60, "show inventory": 5}, FakeSession.read_timeouts)
+
+    def test_max_sessions(self, _):
+        FakeSession.expected_open = 3
+        self.assertEqual([], self._run(self._hosts(10), max_sessions=3))
+        self.assertEqual(3, FakeSession.max_open_sessions)
+        self.assertEqual(10, self.processor.process_command_outputs.call_count)
+
+    def test_group_limits(self, _):
+        hosts = self._hosts(10)
+        for index, host in enumerate(hosts.values()):
+            host.data["config_context"] = {"aaa_server": "tacacs-1" if index < 6 else "tacacs-2"}
+        limiter = ConcurrencyLimiter(group_by="config_context:aaa_server", limits={"tacacs-1": 2, "tacacs-2": 1})
+        # The sessions of the two groups are open at once, at most two of the first group and one of the second.
+        FakeSession.expected_open = 3
+        # The groups are resolved before the event loop starts, grouping by Location queries the database.
+        with patch.object(limiter, "_get_group", async_unsafe(limiter._get_group)):  # pylint: disable=protected-access
+            self.assertEqual([], self._run(hosts, limiter=limiter))
+        self.assertEqual(3, FakeSession.max_open_sessions)
+        self.assertEqual(10, self.processor.process_command_outputs.call_count)
+
+    def test_failed_hosts(self, _):
+        hosts = self._hosts(3)
+        hosts["unsupported"] = Host(name="unsupported", hostname="192.0.2.10", platform="unknown_os")
+        hosts["missing_definitions"] = Host(name="missing_definitions", hostname="192.0.2.11", platform="arista_eos")
+        hosts["no_platform"] = Host(name="no_platform", hostname="192.0.2.12")
+        hosts["procurve"] = Host(name="procurve", hostname="192.0.2.13", platform="hp_procurve")
+        FakeSession.failures = {
+            "192.0.2.1": AsyncEngineAuthenticationError("denied"),
+            "192.0.2.2": AsyncEngineTimeoutError("timed out"),
+        }
+        FakeSession.expected_open = 1
+        self.assertEqual(["unsupported", "missing_definitions", "procurve", "192.0.2.1", "192.0.2.2"], self._run(hosts))
+        self.processor.report_failed_host.assert_any_call("192.0.2.1", "cisco_ios", "192.0.2.1 failed authentication.")
+        self.processor.report_failed_host.assert_any_call("192.0.2.2", "cisco_ios", "192.0.2.2 SSH Timeout Occured.")
+        self.processor.report_failed_host.assert_any_call(
+            "unsupported", "unknown_os", "unsupported has a unsupported platform set."
+        )
+        self.processor.report_failed_host.assert_any_call(
+            "missing_definitions",
+            "arista_eos",
+            "missing_definitions has missing definitions in command_mapper YAML file.",
+        )
+        self.processor.report_failed_host.assert_any_call(
+            "procurve", "hp_procurve", "procurve has a platform the asyncio engine doesn't support."
+        )
+        self.assertEqual(5, self.processor.report_failed_host.call_count)
+        self.processor.process_command_outputs.assert_called_once()
+
+    def test_auth_breaker(self, _):
+        hosts = self._hosts(3)
+        FakeSession.failures = {"192.0.2.1": AsyncEngineAuthenticationError("denied")}
+        FakeSession.expected_open = 1
+        # One session at a time, the hosts after the authentication failure aren't logged in to.
+        self.assertEqual(
+            ["192.0.2.1", "192.0.2.2", "192.0.2.3"],
+            self._run(hosts, max_sessions=1, auth_breaker=AuthCircuitBreaker(threshold=1)),
+        )
+        self.processor.report_failed_host.assert_any_call(
+            "192.0.2.2",
+            "cisco_ios",
+            "192.0.2.2 skipped, the credentials of user None failed authentication on 1 devices in a row.",
+        )
+        self.processor.process_command_outputs.assert_not_called()
+
+
+class AsyncUnsafeJobResult:
+    """JobResult raising SynchronousOnlyOperation when logged to from the event loop, like the ORM does."""
+
+    def __init__(self):
+        self.logs = []
+
+    @async_unsafe
+    def log(self, message, level_choice):
+        self.logs.append((level_choice, message))
+
+
+@patch(
+    "nautobot_device_onboarding.nornir_plays.async_engine.get_all_network_driver_mappings",
+    return_value=NETWORK_DRIVER_MAPPINGS,
+)
+class TestRunAsyncCommandGetterLogging(unittest.TestCase):
+    """Test that the engine logs to the JobResult outside of the event loop."""
+
+    def setUp(self):
+        FakeSession.open_sessions = 0
+        FakeSession.max_open_sessions = 0
+        FakeSession.read_timeouts = {}
+        FakeSession.all_open = None
+        FakeSession.expected_open = 1
+        FakeSession.failures = {
+            "192.0.2.2": AsyncEngineAuthenticationError("denied"),
+            "192.0.2.3": AsyncEngineTimeoutError("timed out"),
+            "192.0.2.4": ValueError("unexpected"),
+        }
+        self.addCleanup(setattr, FakeSession, "failures", {})
+        self.job_result = AsyncUnsafeJobResult()
+        logger = NornirLogger(job_result=self.job_result, log_level=10)
+        self.processor = CommandGetterProcessor(
+            logger, {}, MagicMock(debug=True, fail_job_on_task_failure=False, spool_command_outputs=False)
+        )
+        self.hosts = {
+            f"192.0.2.{index}": Host(name=f"192.0.2.{index}", hostname=f"192.0.2.{index}", platform="cisco_ios")
+            for index in range(1, 5)
+        }
+        self.hosts["unsupported"] = Host(name="unsupported", hostname="192.0.2.10", platform="unknown_os")
+        self.auth_breaker = AuthCircuitBreaker(threshold=1, logger=logger)
+
+    def _run(self):
+        return run_async_command_getter(
+            self.hosts,
+            self.processor,
+            {"cisco_ios": {"sync_devices": COMMAND_MAPPER}},
+            "sync_devices",
+            {"cisco_ios": compile_command_plan(COMMAND_MAPPER)},
+            {},
+            session_class=FakeSession,
+            auth_breaker=self.auth_breaker,
+        )
+
+    def test_logs_outside_of_the_event_loop(self, _):
+        with patch.object(self.processor, "process_command_outputs", return_value=False):
+            failed_hosts = self._run()
+        self.assertEqual(["unsupported", "192.0.2.2", "192.0.2.3", "192.0.2.4"], failed_hosts)
+        messages = [message for _, message in self.job_result.logs]
+        self.assertIn("Collecting command outputs of 192.0.2.1.", messages)
+        self.assertIn("Result of 'show version' command:<br><br>'192.0.2.1 show version'", messages)
+        self.assertIn("192.0.2.2 failed with result: 192.0.2.2 failed authentication.", messages)
+        self.assertIn("192.0.2.3 failed with result: 192.0.2.3 SSH Timeout Occured.", messages)
+        self.assertIn("192.0.2.4 failed with result: 192.0.2.4 failed with exception unexpected.", messages)
+        self.assertIn("warning", [level for level, _ in self.job_result.logs])
+        self.assertTrue(self.processor.data["192.0.2.2"]["failed"])
+
+
+@patch(
+    "nautobot_device_onboarding.nornir_plays.async_engine.get_all_network_driver_mappings",
+    return_value=NETWORK_DRIVER_MAPPINGS,
+)
+class TestRunAsyncCommandGetterJobResult(TransactionTestCase):
+    """Test the engine logging to a JobResult in the database."""
+
+    def test_logs_to_job_result(self, _):
+        job_result = JobResult.objects.create(name="test", user=None, task_name="fake task", worker="default")
+        processor = CommandGetterProcessor(
+            NornirLogger(job_result=job_result, log_level=10),
+            {},
+            MagicMock(debug=False, fail_job_on_task_failure=False, spool_command_outputs=False),
+        )
+        hosts = {
+            "192.0.2.1": Host(name="192.0.2.1", hostname="192.0.2.1", platform="cisco_ios"),
+            "192.0.2.2": Host(name="192.0.2.2", hostname="192.0.2.2", platform="cisco_ios"),
+        }
+        FakeSession.failures = {"192.0.2.2": AsyncEngineTimeoutError("timed out")}
+        self.addCleanup(setattr, FakeSession, "failures", {})
+        FakeSession.all_open = None
+        FakeSession.open_sessions = 0
+        FakeSession.expected_open = 1
+        with patch.object(processor, "process_command_outputs", return_value=False):
+            failed_hosts = run_async_command_getter(
+                hosts,
+                processor,
+                {"cisco_ios": {"sync_devices": COMMAND_MAPPER}},
+                "sync_devices",
+                {"cisco_ios": compile_command_plan(COMMAND_MAPPER)},
+                {},
+                session_class=FakeSession,
+            )
+        self.assertEqual(["192.0.2.2"], failed_hosts)
+        messages = set(JobLogEntry.objects.filter(job_result=job_result).values_list("message", flat=True))
+        self.assertIn("Collecting command outputs of 192.0.2.1.", messages)
+        self.assertIn("192.0.2.2 failed with result: 192.0.2.2 SSH Timeout Occured.", messages)
+
+
+@unittest.skipIf(FakeNOS is None or asyncssh is None, "fakenos and asyncssh are required")
+class TestAsyncSSHSessionFakeNOS(unittest.TestCase):
+    """Test the asyncssh session against the fakenos device definitions."""
+
+    def test_send_command(self):
+        inventory = {
+            "hosts": {"dev1": {"username": "admin", "password": "admin", "platform": "tweaked_cisco_ios", "port": 6223}}
+        }
+
+        async def _run():
+            async with AsyncSSHSession("127.0.0.1", 6223, "admin", "admin", "cisco_ios") as session:
+                return await session.send_command("show version")
+
+        # https://github.com/fakenos/fakenos/issues/19
+        with patch.object(FakeNOSHost, "_check_if_platform_is_supported"):
+            with FakeNOS(
+                inventory=inventory,
+                plugins=[os.path.join(os.path.dirname(os.path.abspath(__file__)), "fakenos/custom_ios.yaml")],
+            ):
+                output = asyncio.run(_run())
+        self.assertIn("fake-ios-01 uptime is 1 week", output)
+        self.assertNotIn("show version", output)
@@ -0,0 +1,58 @@
+"""Test the circuit breaker of the credentials failing authentication."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from nautobot_device_onboarding import NautobotDeviceOnboardingConfig
+from nautobot_device_onboarding.nornir_plays.auth_breaker import AuthCircuitBreaker
+
+
+class TestAuthCircuitBreaker(unittest.TestCase):
+    """Test counting the authentication failures of each set of credentials."""
+
+    def setUp(self):
+        self.logger = MagicMock()
+        self.breaker = AuthCircuitBreaker(threshold=2, logger=self.logger)
+
+    def test_opens_after_threshold(self):
+        self.breaker.record_failure("admin", "wrong")
+        self.assertFalse(self.breaker.is_open("admin", "wrong"))
+        self.breaker.record_failure("admin", "wrong")
+        self.assertTrue(self.breaker.is_open("admin", "wrong"))
+        self.logger.warning.assert_called_once_with(
+            "The credentials of user admin failed authentication on 2 devices in a row, "
+            "the remaining devices using them will be skipped."
+        )
+        # Other credentials, even with the same username, are still tried.
+        self.assertFalse(self.breaker.is_open("admin", "right"))
+        self.assertFalse(self.breaker.is_open("operator", "wrong"))
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure("admin", "pass")
+        self.breaker.record_success("admin", "pass")
+        self.breaker.record_failure("admin", "pass")
+        self.assertFalse(self.breaker.is_open("admin", "pass"))
+
+    def test_password_is_not_kept(self):
+        self.breaker.record_failure("admin", "secret-password")
+        self.assertNotIn("secret-password", repr(self.breaker.failures))
+
+    def test_disabled(self):
+        breaker = AuthCircuitBreaker(threshold=0)
+        for _ in range(5):
+            breaker.record_failure("admin", "wrong")
+        self.assertFalse(breaker.is_open("admin", "wrong"))
+
+    @patch("nautobot_device_onboarding.nornir_plays.auth_breaker.PLUGIN_CFG", {})
+    def test_disabled_by_default(self):
+        self.assertEqual(0, NautobotDeviceOnboardingConfig.default_settings["auth_failure_threshold"])
+        breaker = AuthCircuitBreaker()
+        for _ in range(5):
+            breaker.record_failure("admin", "wrong")
+        self.assertFalse(breaker.is_open("admin", "wrong"))
+
+    def test_failed_reason(self):
+        self.assertEqual(
+            "198.51.100.1 skipped, the credentials of user admin failed authentication on 2 devices in a row.",
+            self.breaker.get_failed_reason("198.51.100.1", "admin"),
+        )
@@ -0,0 +1,109 @@
+"""Test the deferred bulk writes of interface assignments."""
+
+from unittest.mock import MagicMock, patch
+
+from django.db import IntegrityError
+from nautobot.apps.testing import TransactionTestCase
+from nautobot.dcim.choices import InterfaceModeChoices, InterfaceTypeChoices
+from nautobot.dcim.models import Device, Interface
+
+from nautobot_device_onboarding.diffsync.bulk_writer import InterfaceAssignmentBulkWriter
+from nautobot_device_onboarding.tests import utils
+
+
+class InterfaceAssignmentBulkWriterTestCase(TransactionTestCase):
+    """Test InterfaceAssignmentBulkWriter class."""
+
+    databases = ("default", "job_logs")
+
+    def setUp(self):  # pylint: disable=invalid-name
+        """Initialize test case."""
+        self.testing_objects = utils.sync_network_data_ensure_required_nautobot_objects()
+        self.device = self.testing_objects["device_2"]
+        self.interface = Interface.objects.get(device=self.device, name="GigabitEthernet1")
+        self.interface.mode = InterfaceModeChoices.MODE_TAGGED
+        self.interface.validated_save()
+        self.ids = {"device__name": self.device.name, "name": self.interface.name}
+
+        self.job = MagicMock()
+        self.job.debug = False
+        self.job.namespace = self.testing_objects["namespace"]
+        self.job.devices_to_load = Device.objects.filter(pk=self.device.pk)
+        self.bulk_writer = InterfaceAssignmentBulkWriter(job=self.job)
+
+    def test_flush_without_changes(self):
+        with self.assertNumQueries(0):
+            self.bulk_writer.flush()
+
+    def test_flush_vlans(self):
+        self.interface.tagged_vlans.add(self.testing_objects["vlan_1"])
+        self.bulk_writer.queue_tagged_vlans(self.ids, [{"name": "vlan50", "id": "50"}], replace=True)
+        self.bulk_writer.queue_untagged_vlan(self.ids, {"name": "vlan40", "id": "40"})
+        self.bulk_writer.flush()
+        self.interface.refresh_from_db()
+        self.assertEqual([self.testing_objects["vlan_2"]], list(self.interface.tagged_vlans.all()))
+        self.assertEqual(self.testing_objects["vlan_1"], self.interface.untagged_vlan)
+        self.assertFalse(self.bulk_writer.has_changes())
+
+    def test_flush_lag_and_vrf(self):
+        lag = Interface.objects.create(
+            device=self.device, name="Port-channel1", status=self.interface.status, type=InterfaceTypeChoices.TYPE_LAG
+        )
+        self.bulk_writer.queue_lag(self.ids, "Port-channel1")
+        self.bulk_writer.queue_vrf(self.ids, {"name": "vrf2"})
+        self.bulk_writer.flush()
+        self.interface.refresh_from_db()
+        self.assertEqual(lag, self.interface.lag)
+        self.assertEqual(self.testing_objects["vrf_2"], self.interface.vrf)
+        self.assertIn(self.device, self.testing_objects["vrf_2"].devices.all())
+
+    def test_flush_removes_assignments(self):
+        self.interface.untagged_vlan = self.testing_objects["vlan_1"]
+        self.interface.tagged_vlans.add(self.testing_objects["vlan_2"])
+        self.interface.validated_save()
+        self.bulk_writer.queue_untagged_vlan(self.ids, None)
+        self.bulk_writer.queue_tagged_vlans(self.ids, [], replace=True)
+        self.bulk_writer.flush()
+        self.interface.refresh_from_db()
+        self.assertIsNone(self.interface.untagged_vlan)
+        self.assertFalse(self.interface.tagged_vlans.exists())
+
+    def test_flush_logs_missing_objects(self):
+        self.bulk_writer.queue_vrf({"device__name": self.device.name, "name": "GigabitEthernet99"}, {"name": "mgmt"})
+        self.bulk_writer.queue_lag(self.ids, "Port-channel99")
+        self.bulk_writer.flush()
+        self.assertEqual(2, self.job.logger.error.call_count)
+        self.interface.refresh_from_db()
+        self.assertIsNone(self.interface.lag)
+
+    def test_flush_saves_each_interface_if_bulk_write_fails(self):
+        lag = Interface.objects.create(
+            device=self.device, name="Port-channel1", status=self.interface.status, type=InterfaceTypeChoices.TYPE_LAG
+        )
+        other_interface = Interface.objects.create(
+            device=self.device,
+            name="GigabitEthernet2",
+            status=self.interface.status,
+            type=InterfaceTypeChoices.TYPE_1GE_FIXED,
+        )
+        self.bulk_writer.queue_lag(self.ids, "Port-channel1")
+        self.bulk_writer.queue_lag({"device__name": self.device.name, "name": other_interface.name}, "Port-channel1")
+        self.bulk_writer.queue_tagged_vlans(self.ids, [{"name": "vlan50", "id": "50"}], replace=True)
+        real_validated_save = Interface.validated_save
+
+        def validated_save(interface, *args, **kwargs):
+            if interface.pk == other_interface.pk:
+                raise IntegrityError("bad row")
+            return real_validated_save(interface, *args, **kwargs)
+
+        with patch.object(Interface.objects, "bulk_update", side_effect=IntegrityError("bad row")):
+            with patch.object(Interface, "validated_save", autospec=True, side_effect=validated_save):
+                self.bulk_writer.flush()
+        self.interface.refresh_from_db()
+        other_interface.refresh_from_db()
+        self.assertEqual(lag, self.interface.lag)
+        self.assertEqual([self.testing_objects["vlan_2"]], list(self.interface.tagged_vlans.all()))
+        self.assertIsNone(other_interface.lag)
+        self.job.logger.warning.assert_called_once()
+        self.assertEqual(2, self.job.logger.error.call_count)
+        self.assertFalse(self.bulk_writer.has_changes())
@@ -1,6 +1,7 @@
 """Test for nornir plays in command_getter."""
 
 import os
+import threading
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -10,11 +11,18 @@ from nautobot.extras.choices import SecretsGroupAccessTypeChoices, SecretsGroupS
 from nautobot.extras.models import Secret, SecretsGroup, SecretsGroupAssociation
 from netmiko.exceptions import NetmikoAuthenticationException, NetmikoTimeoutException
 from nornir.core.exceptions import NornirSubTaskError
+from nornir.core.inventory import Host
 from nornir.core.task import Result
 
+from nautobot_device_onboarding.jobs import SSOTSyncDevices
+from nautobot_device_onboarding.nornir_plays.auth_breaker import AuthCircuitBreaker, AuthCircuitOpenError
 from nautobot_device_onboarding.nornir_plays.command_getter import (
     _get_commands_to_run,
+    _get_runner_num_workers,
     _parse_credentials,
+    _run_commands,
+    _set_inventories,
+    _sweep_unreachable_hosts,
     netmiko_send_commands,
 )
 from nautobot_device_onboarding.nornir_plays.logger import NornirLogger
@@ -240,6 +248,172 @@ class TestGetCommandsToRun(unittest.TestCase):
         self.assertEqual(get_commands_to_run, expected_commands_to_run)
 
 
+class TestSetInventories(unittest.TestCase):
+    """Test constructing the inventory of several hosts with concurrent platform autodetection."""
+
+    def setUp(self):
+        self.inventory_kwargs = {
+            host_ip: {"host_ip": host_ip, "platform": platform, "port": 22, "username": "admin", "password": "pass"}
+            for host_ip, platform in [("198.51.100.1", None), ("198.51.100.2", MagicMock()), ("198.51.100.3", None)]
+        }
+
+    @patch("nautobot_device_onboarding.nornir_plays.command_getter._set_inventory")
+    def test_autodetection_runs_concurrently(self, set_inventory):
+        # Both hosts without a platform must be waiting for the barrier at the same time for it to pass.
+        barrier = threading.Barrier(2, timeout=5)
+
+        def _set_inventory(host_ip, platform, **kwargs):
+            if not platform:
+                barrier.wait()
+            return {host_ip: host_ip}, None
+
+        set_inventory.side_effect = _set_inventory
+        results = _set_inventories(self.inventory_kwargs)
+        self.assertEqual(list(self.inventory_kwargs), list(results))
+        for host_ip, (inventory, exc_info) in results.items():
+            self.assertEqual({host_ip: host_ip}, inventory)
+            self.assertIsNone(exc_info)
+
+    @patch("nautobot_device_onboarding.nornir_plays.command_getter._get_runner_num_workers", return_value=1)
+    @patch("nautobot_device_onboarding.nornir_plays.command_getter._set_inventory")
+    def test_autodetection_auth_failures_open_breaker(self, set_inventory, _):
+        set_inventory.return_value = ({}, NetmikoAuthenticationException())
+        auth_breaker = AuthCircuitBreaker(threshold=1)
+        results = _set_inventories(self.inventory_kwargs, auth_breaker)
+        # The first autodetection failed authentication, the next host using the same credentials isn't tried.
+        set_inventory.assert_any_call(**self.inventory_kwargs["198.51.100.1"])
+        self.assertEqual(2, set_inventory.call_count)
+        self.assertIsInstance(results["198.51.100.1"][1], NetmikoAuthenticationException)
+        self.assertIsInstance(results["198.51.100.3"][1], AuthCircuitOpenError)
+        self.assertEqual(
+            "198.51.100.3 skipped, the credentials of user admin failed authentication on 1 devices in a row.",
+            str(results["198.51.100.3"][1]),
+        )
+
+    @patch(
+        "nautobot_device_onboarding.nornir_plays.command_getter.NORNIR_SETTINGS",
+        {"runner": {"plugin": "threaded", "options": {"num_workers": 5}}},
+    )
+    def test_runner_num_workers(self):
+        self.assertEqual(5, _get_runner_num_workers())
+
+    @patch("nautobot_device_onboarding.nornir_plays.command_getter.NORNIR_SETTINGS", {"runner": {"plugin": "serial"}})
+    def test_serial_runner_num_workers(self):
+        self.assertEqual(1, _get_runner_num_workers())
+
+
+class TestSweepUnreachableHosts(unittest.TestCase):
+    """Test the connectivity check of all hosts before the Nornir run."""
+
+    @patch(
+        "nautobot_device_onboarding.nornir_plays.command_getter.sweep_tcp_reachability",
+        return_value={"198.51.100.1": 0.01, "198.51.100.2": None},
+    )
+    def test_unreachable_hosts_are_reported_failed(self, sweep_tcp_reachability):
+        processor = MagicMock()
+        reachable = _sweep_unreachable_hosts(
+            {"198.51.100.1": ("198.51.100.1", None, "cisco_ios"), "198.51.100.2": ("198.51.100.2", 2222, "cisco_ios")},
+            processor,
+            MagicMock(),
+        )
+        self.assertEqual({"198.51.100.1": 0.01}, reachable)
+        sweep_tcp_reachability.assert_called_once_with(
+            {"198.51.100.1": ("198.51.100.1", 22), "198.51.100.2": ("198.51.100.2", 2222)}
+        )
+        processor.report_failed_host.assert_called_once_with(
+            "198.51.100.2", "cisco_ios", "198.51.100.2 failed connectivity check via tcp_ping."
+        )
+
+
+@patch(
+    "nautobot_device_onboarding.nornir_plays.command_getter.get_all_network_driver_mappings",
+    MagicMock(return_value={"cisco_ios": {"ntc_templates": "cisco_ios"}}),
+)
+@patch(
+    "nautobot_device_onboarding.nornir_plays.command_getter._get_commands_to_run",
+    MagicMock(
+        return_value=[{"command": "show version", "parser": "raw"}, {"command": "show inventory", "parser": "raw"}]
+    ),
+)
+class TestNetmikoSendCommandsLatencies(unittest.TestCase):
+    """Test recording the latencies of the commands run on a host."""
+
+    def test_first_command_latency_is_not_recorded(self):
+        task = MagicMock()
+        task.host.name = "test-host"
+        task.host.hostname = "198.51.100.1"
+        task.host.platform = "cisco_ios"
+        task.host.data = {}
+        task.host.connections = {}
+
+        def run(**kwargs):
+            # The first command opens the connection.
+            task.host.connections["netmiko"] = MagicMock()
+            return Result(host=task.host, result=f"{kwargs['command_string']} output")
+
+        task.run.side_effect = run
+        nautobot_job = MagicMock(connectivity_test=False, debug=False, parse_in_process_pool=False)
+        latency_profile = MagicMock()
+        latency_profile.get_read_timeout.return_value = 60
+        yaml_data = {"cisco_ios": {"sync_devices": {"command": "show version", "parser": "raw"}}}
+
+        netmiko_send_commands(
+            task, yaml_data, "sync_devices", MagicMock(), nautobot_job, latency_profile=latency_profile
+        )
+
+        latency_profile.record.assert_called_once()
+        self.assertEqual(("198.51.100.1", "show inventory"), latency_profile.record.call_args.args[:2])
+
+
+@patch("nautobot_device_onboarding.nornir_plays.command_getter.get_command_latency_profile", return_value=None)
+@patch("nautobot_device_onboarding.nornir_plays.command_getter.get_concurrency_limiter", return_value=None)
+@patch("nautobot_device_onboarding.nornir_plays.command_getter._compile_command_plans", return_value={})
+@patch("nautobot_device_onboarding.nornir_plays.command_getter.run_async_command_getter", return_value=[])
+class TestRunCommands(unittest.TestCase):
+    """Test choosing between the Nornir runner and the asyncio engine."""
+
+    def setUp(self):
+        self.nornir = MagicMock()
+        self.nornir.inventory.hosts = {
+            "ios": Host(name="ios", platform="cisco_ios"),
+            "procurve": Host(name="procurve", platform="hp_procurve"),
+        }
+        self.processor = MagicMock(network_data_plans=None)
+        self.logger = MagicMock()
+
+    def _run(self, job):
+        _run_commands(
+            self.nornir,
+            self.processor,
+            job,
+            self.logger,
+            "sync_devices",
+            {"textfsm_template_dir": None, "ttp_template_files": {}},
+        )
+
+    def test_asyncio_engine_unsupported_platforms_run_by_nornir(self, run_async_command_getter, *_):
+        self._run(MagicMock(use_asyncio_engine=True, fail_job_on_task_failure=False))
+        self.assertEqual(["ios"], list(run_async_command_getter.call_args.args[0]))
+        filter_func = self.nornir.filter.call_args.kwargs["filter_func"]
+        self.assertEqual(
+            ["procurve"], [name for name, host in self.nornir.inventory.hosts.items() if filter_func(host)]
+        )
+        self.nornir.filter.return_value.run.assert_called_once()
+        self.nornir.run.assert_not_called()
+        self.logger.info.assert_called_once_with(
+            "The asyncio engine doesn't support the hp_procurve platform of procurve, its commands are run by the "
+            "Nornir runner.",
+            extra={"object": "procurve"},
+        )
+
+    def test_asyncio_engine_option_of_job_not_run(self, run_async_command_getter, *_):
+        job = SSOTSyncDevices()
+        job.fail_job_on_task_failure = False
+        self._run(job)
+        run_async_command_getter.assert_not_called()
+        self.nornir.run.assert_called_once()
+
+
 @patch("nautobot_device_onboarding.nornir_plays.command_getter.NornirLogger", MagicMock())
 class TestSSHCredParsing(TransactionTestCase):
     """Tests against the _parse_credentials helper function."""
@@ -407,3 +581,41 @@ class TestNetmikoSendCommandsEarlyReturns(unittest.TestCase):
         self.assertIsInstance(result, Result)
         self.assertTrue(result.failed)
         self.assertEqual(result.result, "test-host SSH Timeout Occured.")
+
+    @patch(
+        "nautobot_device_onboarding.nornir_plays.command_getter._get_commands_to_run",
+        MagicMock(return_value=[{"command": "show version", "parser": "raw"}]),
+    )
+    def test_open_auth_breaker_skips_host(self):
+        task = MagicMock()
+        task.host.name = "test-host"
+        task.host.platform = "cisco_ios"
+        task.host.data = {}
+        task.host.get_connection_parameters.return_value.username = "admin"
+        task.host.get_connection_parameters.return_value.password = "wrong"
+        sub_result = MagicMock()
+        sub_result.exception = NetmikoAuthenticationException()
+        task.results = [sub_result]
+        task.run.side_effect = NornirSubTaskError(task=task, result=MagicMock())
+        nautobot_job = MagicMock()
+        nautobot_job.connectivity_test = False
+        nautobot_job.fail_job_on_task_failure = False
+        yaml_data = {"cisco_ios": {"sync_devices": {"command": "show version", "parser": "raw"}}}
+        auth_breaker = AuthCircuitBreaker(threshold=1)
+
+        result = netmiko_send_commands(
+            task, yaml_data, "sync_devices", MagicMock(), nautobot_job, auth_breaker=auth_breaker
+        )
+        self.assertEqual(result.result, "test-host failed authentication.")
+        self.assertTrue(auth_breaker.is_open("admin", "wrong"))
+
+        task.run.reset_mock()
+        result = netmiko_send_commands(
+            task, yaml_data, "sync_devices", MagicMock(), nautobot_job, auth_breaker=auth_breaker
+        )
+        task.run.assert_not_called()
+        self.assertTrue(result.failed)
+        self.assertEqual(
+            result.result,
+            "test-host skipped, the credentials of user admin failed authentication on 1 devices in a row.",
+        )
@@ -0,0 +1,113 @@
+"""Test the read timeouts of the commands learned from previous runs."""
+
+import unittest
+from unittest.mock import patch
+
+from django.core.cache.backends.locmem import LocMemCache
+
+from nautobot_device_onboarding.nornir_plays.command_plan import deduplicate_command_list
+from nautobot_device_onboarding.utils.command_latency import (
+    MAX_SAMPLES,
+    clear_command_latency_profile,
+    get_command_latency_profile,
+    get_command_read_timeout,
+)
+
+SHOW_VERSION = {"command": "show version", "parser": "textfsm"}
+SHOW_INTERFACES = {"command": "show interfaces", "parser": "textfsm", "read_timeout": 120}
+SHOW_INTERFACES_WITHOUT_READ_TIMEOUT = {"command": "show interfaces", "parser": "textfsm"}
+
+
+class TestGetCommandReadTimeout(unittest.TestCase):
+    """Test the read timeouts set in the command mappers."""
+
+    def test_get_command_read_timeout(self):
+        self.assertEqual(60, get_command_read_timeout(SHOW_VERSION))
+        self.assertEqual(30, get_command_read_timeout(SHOW_VERSION, default=30))
+        self.assertEqual(120, get_command_read_timeout(SHOW_INTERFACES))
+
+    def test_duplicated_commands_keep_longest_read_timeout(self):
+        commands = deduplicate_command_list(
+            [SHOW_VERSION, {**SHOW_VERSION, "read_timeout": 90}, {**SHOW_VERSION, "read_timeout": 30}]
+        )
+        self.assertEqual([{**SHOW_VERSION, "read_timeout": 90}], commands)
+        self.assertNotIn("read_timeout", SHOW_VERSION)
+
+
+@patch.dict(
+    "nautobot_device_onboarding.utils.command_latency.PLUGIN_CFG",
+    {"command_latency_profile_timeout": 60, "command_latency_timeout_factor": 3},
+)
+class TestCommandLatencyProfile(unittest.TestCase):
+    """Test learning the read timeouts from the command latencies."""
+
+    def setUp(self):
+        self.cache = LocMemCache("command_latency", {})
+        self.cache.clear()
+        patcher = patch("nautobot_device_onboarding.utils.command_latency.cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _learn(self, latencies, hostname="192.0.2.1"):
+        profile = get_command_latency_profile([hostname])
+        for latency in latencies:
+            profile.record(hostname, "show interfaces", latency)
+        profile.save()
+
+    def test_disabled(self):
+        with patch.dict(
+            "nautobot_device_onboarding.utils.command_latency.PLUGIN_CFG", {"command_latency_profile_timeout": 0}
+        ):
+            self.assertIsNone(get_command_latency_profile(["192.0.2.1"]))
+
+    def test_learned_read_timeout(self):
+        self._learn([2, 4])
+        profile = get_command_latency_profile(["192.0.2.1", "192.0.2.2"])
+        # Not enough latencies yet, the read timeout of the command mapper is used.
+        self.assertEqual(120, profile.get_read_timeout("192.0.2.1", SHOW_INTERFACES))
+        self._learn([3])
+        profile = get_command_latency_profile(["192.0.2.1", "192.0.2.2"])
+        self.assertEqual(12, profile.get_read_timeout("192.0.2.1", SHOW_INTERFACES_WITHOUT_READ_TIMEOUT))
+        self.assertEqual(60, profile.get_read_timeout("192.0.2.2", SHOW_INTERFACES_WITHOUT_READ_TIMEOUT))
+        self.assertEqual(60, profile.get_read_timeout("192.0.2.1", SHOW_VERSION))
+
+    def test_learned_read_timeout_keeps_command_mapper_read_timeout(self):
+        self._learn([2, 3, 4])
+        profile = get_command_latency_profile(["192.0.2.1"])
+        # The read timeout set in the command mapper is a minimum.
+        self.assertEqual(120, profile.get_read_timeout("192.0.2.1", SHOW_INTERFACES))
+        self._learn([50] * 3)
+        profile = get_command_latency_profile(["192.0.2.1"])
+        self.assertEqual(150, profile.get_read_timeout("192.0.2.1", SHOW_INTERFACES))
+
+    def test_learned_read_timeout_bounds(self):
+        self._learn([0.1] * 3)
+        self._learn([300] * 3, hostname="192.0.2.2")
+        profile = get_command_latency_profile(["192.0.2.1", "192.0.2.2"])
+        self.assertEqual(5, profile.get_read_timeout("192.0.2.1", SHOW_INTERFACES_WITHOUT_READ_TIMEOUT))
+        self.assertEqual(600, profile.get_read_timeout("192.0.2.2", SHOW_INTERFACES_WITHOUT_READ_TIMEOUT))
+
+    def test_samples_are_bounded(self):
+        self._learn([100] * 3 + [1] * MAX_SAMPLES)
+        profile = get_command_latency_profile(["192.0.2.1"])
+        self.assertEqual([1] * MAX_SAMPLES, profile.latencies["192.0.2.1"]["show interfaces"])
+        self.assertEqual(5, profile.get_read_timeout("192.0.2.1", SHOW_INTERFACES_WITHOUT_READ_TIMEOUT))
+
+    def test_timeout_drops_latencies(self):
+        self._learn([2, 3, 4])
+        profile = get_command_latency_profile(["192.0.2.1"])
+        profile.record_timeout("192.0.2.1", "show interfaces")
+        profile.save()
+        profile = get_command_latency_profile(["192.0.2.1"])
+        self.assertEqual(120, profile.get_read_timeout("192.0.2.1", SHOW_INTERFACES))
+
+    def test_clear_command_latency_profile(self):
+        self._learn([2, 3, 4])
+        self._learn([2, 3, 4], hostname="192.0.2.2")
+        clear_command_latency_profile("192.0.2.1")
+        profile = get_command_latency_profile(["192.0.2.1", "192.0.2.2"])
+        self.assertEqual({}, profile.latencies["192.0.2.1"])
+        self.assertEqual(12, profile.get_read_timeout("192.0.2.2", SHOW_INTERFACES_WITHOUT_READ_TIMEOUT))
+        clear_command_latency_profile()
+        profile = get_command_latency_profile(["192.0.2.2"])
+        self.assertEqual({}, profile.latencies["192.0.2.2"])
@@ -0,0 +1,127 @@
+"""Test compiling command mappers into command plans."""
+
+import os
+import unittest
+
+import yaml
+
+from nautobot_device_onboarding.nornir_plays.command_plan import (
+    CommandPlan,
+    compile_command_plan,
+    compile_command_plans,
+    get_command_context_keys,
+    merge_command_plans,
+)
+
+MOCK_DIR = os.path.join("nautobot_device_onboarding", "tests", "mock")
+
+
+class TestCompileCommandPlan(unittest.TestCase):
+    """Test the commands and fields of a compiled command plan."""
+
+    def setUp(self):
+        with open(f"{MOCK_DIR}/command_mappers/mock_cisco_ios.yml", "r", encoding="utf-8") as mock_file_data:
+            self.command_mappers = yaml.safe_load(mock_file_data)
+
+    def test_sync_devices_plan(self):
+        command_plan = compile_command_plan(self.command_mappers["sync_devices"])
+        self.assertEqual((), command_plan.pre_processors)
+        self.assertEqual(
+            ["hostname", "serial", "device_type", "mgmt_interface", "mask_length"],
+            [field.name for field in command_plan.fields],
+        )
+        self.assertEqual(["show version", "show interfaces"], [command["command"] for command in command_plan.commands])
+
+    def test_sync_network_data_plan_without_options(self):
+        command_plan = compile_command_plan(self.command_mappers["sync_network_data"])
+        field_names = [field.name for field in command_plan.fields]
+        self.assertEqual((), command_plan.pre_processors)
+        self.assertNotIn("interfaces__tagged_vlans", field_names)
+        self.assertNotIn("interfaces__untagged_vlan", field_names)
+        self.assertNotIn("interfaces__vrf", field_names)
+        self.assertNotIn("show vlan", [command["command"] for command in command_plan.commands])
+
+    def test_sync_network_data_plan_with_vlans(self):
+        command_plan = compile_command_plan(self.command_mappers["sync_network_data"], sync_vlans=True)
+        self.assertEqual(["vlan_map"], [pre_processor.name for pre_processor in command_plan.pre_processors])
+        self.assertIn("interfaces__tagged_vlans", [field.name for field in command_plan.fields])
+        self.assertIn("show vlan", [command["command"] for command in command_plan.commands])
+        self.assertTrue(command_plan.sync_options["sync_vlans"])
+
+    def test_field_pre_processors(self):
+        command_plan = compile_command_plan(self.command_mappers["sync_network_data"], sync_vlans=True)
+        fields = {field.name: field for field in command_plan.fields}
+        self.assertEqual(("vlan_map",), fields["interfaces__untagged_vlan"].pre_processors)
+        self.assertEqual((), fields["interfaces__tagged_vlans"].pre_processors)
+        self.assertEqual((), fields["interfaces__mtu"].pre_processors)
+
+    def test_unused_pre_processor_skipped(self):
+        command_mapper = {
+            "pre_processor": {
+                "vlan_map": {"commands": {"command": "show vlan", "parser": "textfsm", "jpath": "[*].vlan_id"}},
+            },
+            "serial": {"commands": {"command": "show version", "parser": "textfsm", "jpath": "[*].serial"}},
+        }
+        command_plan = compile_command_plan(command_mapper, sync_vlans=True)
+        self.assertEqual((), command_plan.pre_processors)
+        self.assertEqual(["show version"], [command["command"] for command in command_plan.commands])
+        # A python_post_processor registered without context_keys may use any pre_processor.
+        command_mapper["serial"]["commands"]["python_post_processor"] = (
+            "nautobot_device_onboarding.nornir_plays.formatter.normalize_processed_data"
+        )
+        command_plan = compile_command_plan(command_mapper, sync_vlans=True)
+        self.assertEqual(["vlan_map"], [pre_processor.name for pre_processor in command_plan.pre_processors])
+        self.assertEqual(("vlan_map",), command_plan.fields[0].pre_processors)
+
+    def test_get_command_context_keys(self):
+        self.assertEqual(
+            {"current_key", "vlan_map"},
+            get_command_context_keys(
+                {
+                    "jpath": "[?interface=='{{ current_key }}']",
+                    "post_processor": "{{ obj | get_vlan_data(vlan_map, 'tagged') | tojson }}",
+                }
+            )
+            - {"obj"},
+        )
+        self.assertEqual({"vlan_map"}, get_command_context_keys({"python_post_processor": "vlan_data"}))
+        self.assertEqual(set(), get_command_context_keys({"python_post_processor": "keys_to_dict"}))
+        self.assertIsNone(get_command_context_keys({"jpath": "{{ current_key"}))
+        self.assertIsNone(get_command_context_keys({"python_post_processor": "not_registered"}))
+
+    def test_root_key_and_nesting(self):
+        command_plan = compile_command_plan(self.command_mappers["sync_network_data"])
+        fields = {field.name: field for field in command_plan.fields}
+        self.assertTrue(fields["interfaces"].root_key)
+        self.assertFalse(fields["interfaces__mtu"].root_key)
+        self.assertEqual(("interfaces", "mtu"), fields["interfaces__mtu"].nesting)
+
+    def test_single_command_as_dict(self):
+        command = {"command": "show version", "parser": "textfsm", "jpath": "[*].serial"}
+        command_plan = compile_command_plan({"serial": {"commands": command}})
+        self.assertEqual((command,), command_plan.fields[0].commands)
+        self.assertEqual((command,), command_plan.commands)
+
+    def test_compile_command_plans_per_platform(self):
+        command_plans = compile_command_plans(
+            {"cisco_ios": self.command_mappers, "foo_bar": {"sync_devices": self.command_mappers["sync_devices"]}},
+            "sync_network_data",
+            sync_vrfs=True,
+        )
+        self.assertEqual(["cisco_ios"], list(command_plans))
+        self.assertIsInstance(command_plans["cisco_ios"], CommandPlan)
+        self.assertIn("interfaces__vrf", [field.name for field in command_plans["cisco_ios"].fields])
+
+    def test_merge_command_plans(self):
+        sync_devices_plan = compile_command_plan(self.command_mappers["sync_devices"])
+        sync_network_data_plan = compile_command_plan(self.command_mappers["sync_network_data"], sync_vlans=True)
+        merged_plan = merge_command_plans(sync_devices_plan, sync_network_data_plan)
+        self.assertEqual(sync_devices_plan.fields, merged_plan.fields)
+        self.assertEqual(sync_devices_plan.pre_processors, merged_plan.pre_processors)
+        commands = [command["command"] for command in merged_plan.commands]
+        self.assertEqual(len(set(commands)), len(commands))
+        self.assertEqual(["show version", "show interfaces"], commands[:2])
+        self.assertEqual(
+            {command["command"] for command in sync_devices_plan.commands + sync_network_data_plan.commands},
+            set(commands),
+        )
@@ -0,0 +1,144 @@
+"""Test the concurrency limits per group of hosts."""
+
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from django.contrib.contenttypes.models import ContentType
+from nautobot.apps.testing import TestCase
+from nautobot.dcim.models import Location, LocationType
+from nautobot.extras.models import Status
+from nornir.core import Nornir
+from nornir.core.inventory import Defaults, Groups, Host, Hosts, Inventory
+from nornir.core.task import Result
+
+from nautobot_device_onboarding.nornir_plays.concurrency import (
+    ConcurrencyLimitedRunner,
+    ConcurrencyLimiter,
+    get_concurrency_limiter,
+)
+
+
+def _location(name, location_type, parent=None):
+    location = MagicMock()
+    location.name = name
+    location.parent = parent
+    location.location_type.name = location_type
+    return location
+
+
+class TestConcurrencyLimiter(unittest.TestCase):
+    """Test grouping the hosts and the limit of each group."""
+
+    def setUp(self):
+        region = _location("EMEA", "Region")
+        self.site = _location("Branch-1", "Site", parent=region)
+        self.device_host = Host(name="device", data={"obj": MagicMock(location=self.site), "config_context": {}})
+        self.onboarding_host = Host(name="192.0.2.1", data={"onboarding_location": self.site})
+
+    def test_group_by_location(self):
+        limiter = ConcurrencyLimiter()
+        self.assertEqual("Branch-1", limiter.get_group(self.device_host))
+        self.assertEqual("Branch-1", limiter.get_group(self.onboarding_host))
+        self.assertIsNone(limiter.get_group(Host(name="no_location")))
+
+    def test_group_by_location_type(self):
+        limiter = ConcurrencyLimiter(group_by="location_type:Region")
+        self.assertEqual("EMEA", limiter.get_group(self.device_host))
+        self.assertIsNone(ConcurrencyLimiter(group_by="location_type:Campus").get_group(self.device_host))
+
+    def test_group_by_config_context(self):
+        limiter = ConcurrencyLimiter(group_by="config_context:aaa_server")
+        self.device_host.data["config_context"] = {"aaa_server": "tacacs-emea"}
+        self.assertEqual("tacacs-emea", limiter.get_group(self.device_host))
+        self.assertIsNone(limiter.get_group(self.onboarding_host))
+
+    def test_get_limit(self):
+        limiter = ConcurrencyLimiter(default_limit=5, limits={"Branch-1": 2})
+        self.assertEqual(2, limiter.get_limit("Branch-1"))
+        self.assertEqual(5, limiter.get_limit("Branch-2"))
+        self.assertEqual(0, limiter.get_limit(None))
+
+    def test_get_concurrency_limiter(self):
+        with patch("nautobot_device_onboarding.nornir_plays.concurrency.PLUGIN_CFG", {"concurrency_limits": {}}):
+            self.assertIsNone(get_concurrency_limiter())
+        with patch(
+            "nautobot_device_onboarding.nornir_plays.concurrency.PLUGIN_CFG",
+            {"concurrency_limits": {"group_by": "location_type:Region", "limits": {"EMEA": 2}}},
+        ):
+            limiter = get_concurrency_limiter()
+        self.assertEqual("location_type:Region", limiter.group_by)
+        self.assertEqual(0, limiter.default_limit)
+        self.assertEqual({"EMEA": 2}, limiter.limits)
+
+
+class TestConcurrencyLimiterGroups(TestCase):
+    """Test resolving the groups of many hosts at once."""
+
+    def setUp(self):
+        status, _ = Status.objects.get_or_create(name="Active")
+        status.content_types.add(ContentType.objects.get_for_model(Location))
+        region_type = LocationType.objects.create(name="Region")
+        site_type = LocationType.objects.create(name="Site", parent=region_type)
+        region = Location.objects.create(name="EMEA", location_type=region_type, status=status)
+        self.site = Location.objects.create(name="Branch-1", location_type=site_type, parent=region, status=status)
+        self.hosts = [
+            Host(name="device", data={"obj": MagicMock(location_id=self.site.pk)}),
+            Host(name="192.0.2.1", data={"onboarding_location": self.site}),
+            Host(name="no_location"),
+        ]
+
+    def test_get_groups(self):
+        limiter = ConcurrencyLimiter()
+        with self.assertNumQueries(1):
+            groups = limiter.get_groups(self.hosts)
+        self.assertEqual({"device": "Branch-1", "192.0.2.1": "Branch-1", "no_location": None}, groups)
+        with self.assertNumQueries(0):
+            self.assertEqual("Branch-1", limiter.get_group(self.hosts[0]))
+
+    def test_get_groups_by_location_type(self):
+        with self.assertNumQueries(1):
+            groups = ConcurrencyLimiter(group_by="location_type:Region").get_groups(self.hosts)
+        self.assertEqual({"device": "EMEA", "192.0.2.1": "EMEA", "no_location": None}, groups)
+        self.assertEqual(
+            {"device": None, "192.0.2.1": None, "no_location": None},
+            ConcurrencyLimiter(group_by="location_type:Campus").get_groups(self.hosts),
+        )
+
+
+class TestConcurrencyLimitedRunner(unittest.TestCase):
+    """Test running a task with a maximum number of hosts of each group at once."""
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.running = {}
+        self.max_running = {}
+
+    def _task(self, task):
+        group = task.host.data["config_context"].get("aaa_server")
+        with self.lock:
+            self.running[group] = self.running.get(group, 0) + 1
+            self.max_running[group] = max(self.max_running.get(group, 0), self.running[group])
+        time.sleep(0.02)
+        with self.lock:
+            self.running[group] -= 1
+        return Result(host=task.host, result=group)
+
+    def test_run(self):
+        hosts = Hosts()
+        for index in range(12):
+            group = "tacacs-1" if index < 8 else "tacacs-2"
+            hosts[f"host{index}"] = Host(name=f"host{index}", data={"config_context": {"aaa_server": group}})
+        hosts["host12"] = Host(name="host12", data={"config_context": {}})
+        limiter = ConcurrencyLimiter(group_by="config_context:aaa_server", default_limit=3, limits={"tacacs-2": 1})
+        nornir_obj = Nornir(
+            inventory=Inventory(hosts=hosts, groups=Groups(), defaults=Defaults()),
+            runner=ConcurrencyLimitedRunner(num_workers=10, limiter=limiter),
+        )
+        result = nornir_obj.run(task=self._task)
+        self.assertEqual(set(hosts), set(result))
+        self.assertFalse(result.failed)
+        self.assertEqual(3, self.max_running["tacacs-1"])
+        self.assertEqual(1, self.max_running["tacacs-2"])
+        self.assertEqual("tacacs-2", result["host8"].result)
@@ -0,0 +1,486 @@
+"""Tests for the ETL stage of the command getter."""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from nornir.core.inventory import Host
+from nornir.core.task import MultiResult, Result
+from ntc_templates.parse import ParsingException, parse_output
+from textfsm import TextFSM
+from ttp import ttp
+
+from nautobot_device_onboarding.jobs import SSOTSyncDevices, SSOTSyncNetworkData
+from nautobot_device_onboarding.nornir_plays.command_plan import compile_command_plan
+from nautobot_device_onboarding.nornir_plays.etl import (
+    PARSER_DIR,
+    clear_parser_caches,
+    drop_invalid_interfaces,
+    get_etl_pool,
+    get_schema_validator,
+    get_ttp_template,
+    parse_command_output,
+    parse_textfsm_output,
+    parse_ttp_output,
+    run_etl,
+    run_spooled_etl,
+    validate_ssot_data,
+)
+from nautobot_device_onboarding.nornir_plays.processor import CommandGetterProcessor
+from nautobot_device_onboarding.nornir_plays.spool import CommandOutputSpool
+from nautobot_device_onboarding.nornir_plays.transform import add_platform_parsing_info
+
+MOCK_DIR = os.path.join("nautobot_device_onboarding", "tests", "mock")
+
+PARSER_CONTEXT = {"textfsm_template_dir": None, "ttp_template_files": {}}
+
+SHOW_VERSION = """Cisco IOS Software, C3560CX Software (C3560CX-UNIVERSALK9-M), Version 15.2(7)E2, RELEASE SOFTWARE (fc3)
+ROM: Bootstrap program is C3560CX boot loader
+IOS-SW-1 uptime is 1 week, 2 days, 3 hours, 4 minutes
+System image file is "flash:c3560cx-universalk9-mz.152-7.E2.bin"
+Model number                       : WS-C3560CX-12PC-S
+System serial number               : FOC2341Y2CQ
+"""
+
+
+class TestParseTextFSMOutput(unittest.TestCase):
+    """Tests for the cached TextFSM parsing."""
+
+    def test_matches_ntc_templates(self):
+        expected = parse_output(platform="cisco_ios", command="show version", data=SHOW_VERSION)
+        self.assertEqual(expected, parse_textfsm_output("cisco_ios", "show version", SHOW_VERSION))
+        # A second parse with the cached template must not carry over any state of the first one.
+        self.assertEqual(expected, parse_textfsm_output("cisco_ios", "show version", SHOW_VERSION))
+
+    def test_custom_template_is_compiled_once(self):
+        with tempfile.TemporaryDirectory() as template_dir:
+            with open(os.path.join(template_dir, "index"), "w", encoding="utf-8") as index:
+                index.write(
+                    "Template, Hostname, Platform, Command\n\ncustom.textfsm, .*, cisco_ios, sh[[ow]] ver[[sion]]\n"
+                )
+            with open(os.path.join(template_dir, "custom.textfsm"), "w", encoding="utf-8") as template:
+                template.write("Value SERIAL (\\S+)\n\nStart\n  ^System serial number\\s+:\\s+${SERIAL}\n")
+            with patch("nautobot_device_onboarding.nornir_plays.etl.TextFSM", wraps=TextFSM) as mock_textfsm:
+                for _ in range(2):
+                    self.assertEqual(
+                        [{"serial": "FOC2341Y2CQ"}],
+                        parse_textfsm_output("cisco_ios", "show version", SHOW_VERSION, template_dir),
+                    )
+            mock_textfsm.assert_called_once()
+
+    def test_unknown_command_raises_parsing_exception(self):
+        with self.assertRaises(ParsingException):
+            parse_textfsm_output("cisco_ios", "show something unknown", "output")
+
+    def test_custom_template_dir_falls_back_to_ntc_templates(self):
+        with tempfile.TemporaryDirectory() as template_dir:
+            with open(os.path.join(template_dir, "index"), "w", encoding="utf-8") as index:
+                index.write("Template, Hostname, Platform, Command\n\ncustom.textfsm, .*, cisco_ios, sh[[ow]] foo\n")
+            self.assertEqual(
+                parse_output(platform="cisco_ios", command="show version", data=SHOW_VERSION),
+                parse_textfsm_output("cisco_ios", "show version", SHOW_VERSION, template_dir),
+            )
+
+
+class TestParseTTPOutput(unittest.TestCase):
+    """Tests for the cached TTP template loading."""
+
+    def setUp(self):
+        self.template_file = os.path.join(PARSER_DIR, "ttp", "f5_tmsh_list_net_vlan.ttp")
+        self.data = "net vlan internal {\n    interfaces {\n        1.1 { }\n    }\n    tag 4094\n}\n"
+
+    def test_matches_parsing_from_template_file(self):
+        parser = ttp(data=self.data, template=self.template_file)
+        parser.parse()
+        expected = json.loads(parser.result(format="json")[0])
+        self.assertEqual(expected, parse_ttp_output(self.template_file, self.data))
+
+    def test_template_file_is_read_once(self):
+        clear_parser_caches()
+        with patch("builtins.open", wraps=open) as mock_open:
+            get_ttp_template(self.template_file)
+            get_ttp_template(self.template_file)
+        mock_open.assert_called_once()
+
+    def test_clear_parser_caches(self):
+        template = get_ttp_template(self.template_file)
+        clear_parser_caches()
+        with patch("builtins.open", wraps=open) as mock_open:
+            self.assertEqual(template, get_ttp_template(self.template_file))
+        mock_open.assert_called_once()
+
+
+class TestParseCommandOutput(unittest.TestCase):
+    """Tests for parsing a single raw command output."""
+
+    def test_raw_parser(self):
+        command = {"command": "show version", "parser": "raw"}
+        self.assertEqual(
+            {"raw": "output"}, parse_command_output(command, "output", "cisco_ios", "cisco_ios", PARSER_CONTEXT)
+        )
+
+    def test_none_parser_loads_json(self):
+        command = {"command": "show version | json", "parser": "none"}
+        self.assertEqual(
+            {"version": "1"},
+            parse_command_output(command, '{"version": "1"}', "cisco_nxos", "cisco_nxos", PARSER_CONTEXT),
+        )
+
+    def test_invalid_input_returns_empty_list(self):
+        command = {"command": "show foo", "parser": "textfsm"}
+        output = "% Invalid input detected at '^' marker."
+        self.assertEqual([], parse_command_output(command, output, "cisco_ios", "cisco_ios", PARSER_CONTEXT))
+
+    def test_already_handled_output_is_returned_as_is(self):
+        command = {"command": "show cdp neighbors detail", "parser": "textfsm"}
+        self.assertEqual([], parse_command_output(command, [], "cisco_ios", "cisco_ios", PARSER_CONTEXT))
+
+
+class TestRunETL(unittest.TestCase):
+    """Tests for the unit of work sent to the ETL process pool."""
+
+    @patch("nautobot_device_onboarding.nornir_plays.transform.GitRepository")
+    def setUp(self, mock_repo):
+        mock_repo.return_value = 0
+        self.platform_parsing_info = add_platform_parsing_info()
+        self.etl_options = {
+            "command_getter_job": "sync_devices",
+            "debug": False,
+            "fail_job_on_task_failure": False,
+            "parser_context": PARSER_CONTEXT,
+        }
+
+    def test_run_etl_matches_inline_extraction(self):
+        with open(f"{MOCK_DIR}/cisco_ios/command_getter_result_1.json", "r", encoding="utf-8") as command_info:
+            command_outputs = json.loads(command_info.read())
+        with open(f"{MOCK_DIR}/cisco_ios/sync_devices/expected_result_1.json", "r", encoding="utf-8") as expected:
+            expected_result = json.loads(expected.read())
+        result = run_etl(
+            "198.51.100.1",
+            "cisco_ios",
+            "cisco_ios",
+            compile_command_plan(self.platform_parsing_info["cisco_ios"]["sync_devices"]),
+            command_outputs,
+            self.etl_options,
+        )
+        self.assertEqual("198.51.100.1", result["host"])
+        self.assertIsNone(result["failed_reason"])
+        self.assertEqual(expected_result, result["data"])
+
+    def test_run_spooled_etl(self):
+        with open(f"{MOCK_DIR}/cisco_ios/command_getter_result_1.json", "r", encoding="utf-8") as command_info:
+            command_outputs = json.loads(command_info.read())
+        command_plan = compile_command_plan(self.platform_parsing_info["cisco_ios"]["sync_devices"])
+        with CommandOutputSpool() as spool:
+            for command, output in command_outputs.items():
+                spool.write("198.51.100.1", command, output)
+            result = run_spooled_etl(
+                "198.51.100.1",
+                "cisco_ios",
+                "cisco_ios",
+                command_plan,
+                spool.get_spool_file("198.51.100.1"),
+                self.etl_options,
+            )
+        self.assertEqual(
+            run_etl("198.51.100.1", "cisco_ios", "cisco_ios", command_plan, command_outputs, self.etl_options), result
+        )
+
+    def test_run_etl_parsing_failure_fails_host(self):
+        self.etl_options["fail_job_on_task_failure"] = True
+        command_plan = compile_command_plan(
+            {"serial": {"commands": {"command": "show version | json", "parser": "none", "jpath": "serial"}}}
+        )
+        result = run_etl(
+            "198.51.100.1",
+            "cisco_nxos",
+            "cisco_nxos",
+            command_plan,
+            {"show version | json": "not json"},
+            self.etl_options,
+        )
+        self.assertIsNone(result["data"])
+        self.assertEqual("Parsing failed for 'show version | json' command.", result["failed_reason"])
+
+    def test_validate_ssot_data_unknown_job(self):
+        self.assertIsNone(validate_ssot_data({}, "unknown"))
+
+
+def _interface(**kwargs):
+    """Return the extracted sync_network_data of an interface."""
+    return {
+        "type": "1000base-t",
+        "ip_addresses": [{"ip_address": "198.51.100.1", "prefix_length": "24"}],
+        "mac_address": "0050.56b5.0001",
+        "mtu": "1500",
+        "description": [],
+        "link_status": "True",
+        "802.1Q_mode": "access",
+        "lag": [],
+        "untagged_vlan": {"name": "users", "id": "10"},
+        "tagged_vlans": [],
+        "vrf": {},
+        **kwargs,
+    }
+
+
+class TestSchemaValidation(unittest.TestCase):
+    """Tests for the compiled schema validators and the validation of each interface."""
+
+    def test_validators_are_built_once(self):
+        self.assertIs(get_schema_validator("sync_devices"), get_schema_validator("sync_devices"))
+        self.assertIs(get_schema_validator("interface"), get_schema_validator("interface"))
+
+    def test_validate_ssot_data(self):
+        data = {"serial": "1", "hostname": "a", "device_type": "b", "mgmt_interface": "c", "mask_length": 24}
+        self.assertIsNone(validate_ssot_data(data, "sync_devices"))
+        self.assertEqual("'serial' is a required property", validate_ssot_data({}, "sync_network_data").message)
+
+    def test_drop_invalid_interfaces(self):
+        interfaces = {f"Gi{index}": _interface() for index in range(400)}
+        interfaces["Gi7"] = _interface(mtu=None, ip_addresses=[{"ip_address": "198.51.100.7"}])
+        interfaces["Gi8"] = "not an interface"
+        data = {"serial": "1", "interfaces": interfaces}
+        invalid_interfaces = drop_invalid_interfaces(data)
+        self.assertEqual(["Gi7", "Gi8"], sorted(invalid_interfaces))
+        self.assertEqual(
+            ["mtu: None is not of type 'string', 'integer'", "ip_addresses.0: 'prefix_length' is a required property"],
+            sorted(invalid_interfaces["Gi7"], key=lambda error: not error.startswith("mtu")),
+        )
+        self.assertEqual(398, len(data["interfaces"]))
+        self.assertIsNone(validate_ssot_data(data, "sync_network_data"))
+
+    def test_drop_invalid_interfaces_keeps_empty_values(self):
+        interface = _interface(ip_addresses=[{"ip_address": ""}], untagged_vlan=[], vrf=[], tagged_vlans={})
+        data = {"serial": "1", "interfaces": {"Gi1": interface}}
+        self.assertEqual({}, drop_invalid_interfaces(data))
+        self.assertEqual({"Gi1": interface}, data["interfaces"])
+        self.assertEqual({}, drop_invalid_interfaces({"serial": "1", "interfaces": []}))
+
+    def test_run_etl_drops_invalid_interfaces(self):
+        data = {"serial": "1", "interfaces": {"Gi1": _interface(), "Gi2": _interface(type=1)}}
+        with patch("nautobot_device_onboarding.nornir_plays.etl.extract_show_data", MagicMock(return_value=data)):
+            result = run_etl(
+                "198.51.100.1",
+                "cisco_ios",
+                "cisco_ios",
+                compile_command_plan({}),
+                {},
+                {
+                    "command_getter_job": "sync_network_data",
+                    "debug": False,
+                    "fail_job_on_task_failure": False,
+                    "parser_context": PARSER_CONTEXT,
+                },
+            )
+        self.assertIsNone(result["validation_error"])
+        self.assertEqual({"Gi2": ["type: 1 is not of type 'string'"]}, result["invalid_interfaces"])
+        self.assertEqual(["Gi1"], list(result["data"]["interfaces"]))
+
+
+class TestCollectETLResults(unittest.TestCase):
+    """Tests for merging the ETL process pool results into the processor data."""
+
+    def test_collect_etl_results(self):
+        etl_pool = MagicMock()
+        etl_pool.results.return_value = [
+            {"host": "ok", "data": {"serial": "1"}, "validation_error": None, "failed_reason": None},
+            {"host": "invalid", "data": {"serial": 1}, "validation_error": "bad serial", "failed_reason": None},
+            {"host": "broken", "data": None, "validation_error": None, "failed_reason": "Parsing failed."},
+        ]
+        outputs = {"ok": {"platform": "cisco_ios"}, "invalid": {}, "broken": {}}
+        processor = CommandGetterProcessor(MagicMock(), outputs, MagicMock(debug=False), etl_pool=etl_pool)
+        self.assertEqual(["broken"], processor.collect_etl_results())
+        self.assertEqual({"platform": "cisco_ios", "serial": "1"}, outputs["ok"])
+        self.assertEqual({"failed": True, "failed_reason": "Schema validation failed."}, outputs["invalid"])
+        self.assertEqual({"failed": True, "failed_reason": "Parsing failed."}, outputs["broken"])
+
+    def test_collect_etl_results_for_network_data(self):
+        etl_pool = MagicMock()
+        etl_pool.results.return_value = [
+            {
+                "host": "ok",
+                "command_getter_job": "sync_devices",
+                "data": {"serial": "1"},
+                "validation_error": None,
+                "failed_reason": None,
+            },
+            {
+                "host": "ok",
+                "command_getter_job": "sync_network_data",
+                "data": {"serial": "1", "interfaces": {}},
+                "validation_error": None,
+                "failed_reason": None,
+            },
+            {
+                "host": "invalid",
+                "command_getter_job": "sync_network_data",
+                "data": {"serial": 1},
+                "validation_error": "bad serial",
+                "failed_reason": None,
+            },
+        ]
+        outputs = {"ok": {"platform": "cisco_ios"}, "invalid": {"platform": "cisco_ios"}}
+        processor = CommandGetterProcessor(
+            MagicMock(), outputs, MagicMock(debug=False), etl_pool=etl_pool, network_data_plans={}
+        )
+        self.assertEqual(["invalid"], processor.collect_etl_results())
+        self.assertEqual({"platform": "cisco_ios", "serial": "1"}, outputs["ok"])
+        self.assertEqual({"platform": "cisco_ios"}, outputs["invalid"])
+        self.assertEqual(
+            {
+                "platform": "cisco_ios",
+                "manufacturer": "Cisco",
+                "network_driver": "cisco_ios",
+                "serial": "1",
+                "interfaces": {},
+            },
+            processor.network_data["ok"],
+        )
+        self.assertEqual(
+            {"failed": True, "failed_reason": "Schema validation failed."}, processor.network_data["invalid"]
+        )
+
+    def test_collect_etl_results_reports_invalid_interfaces(self):
+        etl_pool = MagicMock()
+        etl_pool.results.return_value = [
+            {
+                "host": "ok",
+                "command_getter_job": "sync_network_data",
+                "data": {"serial": "1", "interfaces": {"Gi1": {}}},
+                "validation_error": None,
+                "invalid_interfaces": {"Gi2": ["type: 1 is not of type 'string'"]},
+                "failed_reason": None,
+            },
+        ]
+        outputs = {"ok": {"platform": "cisco_ios"}}
+        logger = MagicMock()
+        processor = CommandGetterProcessor(logger, outputs, MagicMock(debug=False), etl_pool=etl_pool)
+        self.assertEqual([], processor.collect_etl_results())
+        self.assertEqual({"platform": "cisco_ios", "serial": "1", "interfaces": {"Gi1": {}}}, outputs["ok"])
+        logger.warning.assert_called_once_with(
+            "Schema validation failed for 1 interfaces of ok, they're not synced: Gi2", extra={"object": "ok"}
+        )
+
+    def test_collect_etl_results_without_pool(self):
+        processor = CommandGetterProcessor(MagicMock(), {}, MagicMock(debug=False))
+        self.assertEqual([], processor.collect_etl_results())
+
+
+class TestGetETLPool(unittest.TestCase):
+    """Tests for enabling the ETL process pool from the job options."""
+
+    def test_job_not_run_has_no_pool(self):
+        for job_class in (SSOTSyncDevices, SSOTSyncNetworkData):
+            with get_etl_pool(job_class(), "sync_devices") as etl_pool:
+                self.assertIsNone(etl_pool)
+
+    @patch("nautobot_device_onboarding.nornir_plays.etl.ETLProcessPool")
+    def test_job_option(self, etl_process_pool):
+        job = SSOTSyncDevices()
+        job.parse_in_process_pool = True
+        self.assertIs(etl_process_pool.return_value, get_etl_pool(job, "sync_devices", PARSER_CONTEXT))
+        etl_process_pool.assert_called_once_with(job, "sync_devices", parser_context=PARSER_CONTEXT)
+        job.parse_in_process_pool = False
+        self.assertIsNot(etl_process_pool.return_value, get_etl_pool(job, "sync_devices", PARSER_CONTEXT))
+
+
+@patch(
+    "nautobot_device_onboarding.nornir_plays.processor.get_all_network_driver_mappings",
+    return_value={"cisco_ios": {"ntc_templates": "cisco_ios"}},
+)
+class TestProcessCommandOutputs(unittest.TestCase):
+    """Tests for processing the command outputs collected by the asyncio engine."""
+
+    @patch("nautobot_device_onboarding.nornir_plays.transform.GitRepository")
+    def setUp(self, mock_repo):
+        mock_repo.return_value = 0
+        self.platform_parsing_info = add_platform_parsing_info()
+        self.host = Host(name="198.51.100.1", platform="cisco_ios")
+        self.host.data["command_plan"] = compile_command_plan(self.platform_parsing_info["cisco_ios"]["sync_devices"])
+        with open(f"{MOCK_DIR}/cisco_ios/command_getter_result_1.json", "r", encoding="utf-8") as command_info:
+            self.command_outputs = json.loads(command_info.read())
+
+    def test_process_command_outputs(self, _):
+        with open(f"{MOCK_DIR}/cisco_ios/sync_devices/expected_result_1.json", "r", encoding="utf-8") as expected:
+            expected_result = json.loads(expected.read())
+        outputs = {}
+        job = MagicMock(debug=False, fail_job_on_task_failure=False)
+        processor = CommandGetterProcessor(MagicMock(), outputs, job)
+        self.assertFalse(
+            processor.process_command_outputs(self.host, self.command_outputs, "sync_devices", PARSER_CONTEXT)
+        )
+        self.assertEqual("cisco_ios", outputs["198.51.100.1"]["network_driver"])
+        for key, value in expected_result.items():
+            self.assertEqual(value, outputs["198.51.100.1"][key])
+
+    def test_process_command_outputs_in_etl_pool(self, _):
+        etl_pool = MagicMock()
+        processor = CommandGetterProcessor(MagicMock(), {}, MagicMock(debug=False), etl_pool=etl_pool)
+        self.assertFalse(
+            processor.process_command_outputs(self.host, self.command_outputs, "sync_devices", PARSER_CONTEXT)
+        )
+        etl_pool.submit.assert_called_once_with(self.host, "cisco_ios", self.command_outputs, spool_file=None)
+
+    def test_process_command_outputs_spooled_for_etl_pool(self, _):
+        etl_pool = MagicMock()
+        with CommandOutputSpool() as spool:
+            processor = CommandGetterProcessor(MagicMock(), {}, MagicMock(debug=False), etl_pool=etl_pool, spool=spool)
+            processor.process_command_outputs(self.host, self.command_outputs, "sync_devices", PARSER_CONTEXT)
+            spool_file = spool.get_spool_file("198.51.100.1")
+            etl_pool.submit.assert_called_once_with(self.host, "cisco_ios", None, spool_file=spool_file)
+            self.assertEqual(self.command_outputs, spool.read("198.51.100.1"))
+
+    def test_spooled_outputs_of_nornir_run(self, _):
+        with open(f"{MOCK_DIR}/cisco_ios/sync_devices/expected_result_1.json", "r", encoding="utf-8") as expected:
+            expected_result = json.loads(expected.read())
+        job = MagicMock(debug=False, fail_job_on_task_failure=False)
+        with CommandOutputSpool() as spool:
+            processor = CommandGetterProcessor(MagicMock(), {}, job, spool=spool)
+            task = MagicMock(params={"command_getter_job": "sync_devices"})
+            processor.task_instance_started(task, self.host)
+            result = MultiResult("netmiko_send_commands")
+            result.append(Result(host=self.host))
+            for command, output in self.command_outputs.items():
+                subtask_result = MultiResult(command)
+                subtask_result.append(Result(host=self.host, result=output))
+                # Nornir names the subtasks after the command, see netmiko_send_commands.
+                subtask = MagicMock()
+                subtask.name = command
+                processor.subtask_instance_completed(subtask, self.host, subtask_result)
+                result.extend(subtask_result)
+            processor.task_instance_completed(task, self.host, result)
+            self.assertEqual({}, spool.read("198.51.100.1"))
+        self.assertTrue(all(res.result is None for res in result[1:]))
+        for key, value in expected_result.items():
+            self.assertEqual(value, processor.data["198.51.100.1"][key])
+
+    def test_process_command_outputs_for_network_data(self, _):
+        with open(
+            f"{MOCK_DIR}/cisco_ios/sync_network_data_no_options/expected_result_1.json", "r", encoding="utf-8"
+        ) as expected:
+            expected_result = json.loads(expected.read())
+        network_data_plans = {
+            "cisco_ios": compile_command_plan(self.platform_parsing_info["cisco_ios"]["sync_network_data"])
+        }
+        processor = CommandGetterProcessor(
+            MagicMock(),
+            {},
+            MagicMock(debug=False, fail_job_on_task_failure=False),
+            network_data_plans=network_data_plans,
+        )
+        processor.process_command_outputs(self.host, self.command_outputs, "sync_devices", PARSER_CONTEXT)
+        self.assertEqual("IOS-SW-1", processor.data["198.51.100.1"]["hostname"])
+        self.assertEqual("cisco_ios", processor.network_data["198.51.100.1"]["network_driver"])
+        for key, value in expected_result.items():
+            self.assertEqual(value, processor.network_data["198.51.100.1"][key])
+
+    def test_process_command_outputs_for_network_data_missing_definitions(self, _):
+        processor = CommandGetterProcessor(
+            MagicMock(), {}, MagicMock(debug=False, fail_job_on_task_failure=False), network_data_plans={}
+        )
+        processor.process_command_outputs(self.host, self.command_outputs, "sync_devices", PARSER_CONTEXT)
+        self.assertTrue(processor.network_data["198.51.100.1"]["failed"])
+        self.assertNotIn("failed", processor.data["198.51.100.1"])
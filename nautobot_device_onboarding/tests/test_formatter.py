@@ -6,14 +6,26 @@ import unittest
 from unittest.mock import patch
 
 import yaml
+from jdiff import extract_data_from_json
 from nornir.core.inventory import ConnectionOptions, Defaults, Host
 
+from nautobot_device_onboarding.nornir_plays.command_plan import compile_command_plan
 from nautobot_device_onboarding.nornir_plays.formatter import (
+    FieldExtraction,
+    build_row_index,
     extract_and_post_process,
+    extract_data,
+    get_compiled_jpath,
+    get_compiled_template,
+    get_indexed_jpath,
+    get_table_columns,
+    get_table_data,
     normalize_processed_data,
     perform_data_extraction,
 )
+from nautobot_device_onboarding.nornir_plays.parsed_table import ParsedTable
 from nautobot_device_onboarding.nornir_plays.transform import add_platform_parsing_info
+from nautobot_device_onboarding.post_processors import POST_PROCESSORS, register_post_processor
 
 MOCK_DIR = os.path.join("nautobot_device_onboarding", "tests", "mock")
 SYNC_DEVICES_ONLY = ["cisco_wlc", "hp_comware", "paloalto_panos"]
@@ -85,6 +97,316 @@ class TestFormatterNormalizeProccessedData(unittest.TestCase):
         self.assertEqual(normalize_processed_data([881], "int"), 881)
 
 
+class TestFormatterCompiledTemplateCache(unittest.TestCase):
+    """Tests to ensure command mapper templates are compiled once and reused."""
+
+    def test_get_compiled_template_returns_same_template(self):
+        jpath = "[?interface=='{{ current_key }}'].mtu"
+        self.assertIs(get_compiled_template(jpath), get_compiled_template(jpath))
+
+    def test_get_compiled_template_renders_context(self):
+        template = get_compiled_template("[?interface=='{{ current_key }}'].mtu")
+        self.assertEqual(template.render(current_key="Ethernet1/1"), "[?interface=='Ethernet1/1'].mtu")
+
+    def test_extract_and_post_process_does_not_recompile(self):
+        command = {
+            "command": "show interfaces",
+            "parser": "textfsm",
+            "jpath": "[?interface=='{{ current_key }}'].mtu",
+            "post_processor": "{{ obj | first }}",
+        }
+        parsed_command_output = [
+            {"interface": "Ethernet1/1", "mtu": "1500"},
+            {"interface": "Ethernet1/2", "mtu": "9000"},
+        ]
+        extract_and_post_process(
+            parsed_command_output, command, {"obj": "1.1.1.1", "current_key": "Ethernet1/1"}, "str", False
+        )
+        with patch("nautobot_device_onboarding.nornir_plays.formatter.get_shared_django_env") as mock_env:
+            _, post_processed = extract_and_post_process(
+                parsed_command_output, command, {"obj": "1.1.1.1", "current_key": "Ethernet1/2"}, "str", False
+            )
+        mock_env.assert_not_called()
+        self.assertEqual(post_processed, "9000")
+
+
+class TestFormatterCompiledJpath(unittest.TestCase):
+    """Tests to ensure rendered jpaths are compiled once and extract the same data as jdiff."""
+
+    def test_get_compiled_jpath_returns_same_expression(self):
+        self.assertIs(
+            get_compiled_jpath("[?interface=='Ethernet1/1'].mtu"), get_compiled_jpath("[?interface=='Ethernet1/1'].mtu")
+        )
+
+    def test_extract_data_matches_jdiff(self):
+        data = [
+            {"interface": "Ethernet1/1", "mtu": "1500", "ip_address": ["10.0.0.1", "10.0.0.2"], "vlan_id": "10"},
+            {"interface": "Ethernet1/2", "mtu": "9000", "ip_address": [], "vlan_id": "20"},
+        ]
+        for jpath in [
+            "*",
+            "[*].interface",
+            "[?interface=='Ethernet1/2'].mtu",
+            "[*].ip_address",
+            "[*].[ip_address]",
+            "[*].{name: interface, mtu: mtu}",
+            "[*].[$vlan_id$,interface]",
+            "[0].mtu",
+        ]:
+            with self.subTest(jpath=jpath):
+                self.assertEqual(extract_data_from_json(data, jpath), extract_data(data, jpath))
+
+    def test_extract_data_errors_match_jdiff(self):
+        data = {"interfaces": [{"name": "Ethernet1/1"}]}
+        for jpath in ["missing", "interfaces[*].[{name: name}]"]:
+            with self.subTest(jpath=jpath):
+                with self.assertRaises(TypeError):
+                    extract_data_from_json(data, jpath)
+                with self.assertRaises(TypeError):
+                    extract_data(data, jpath)
+
+    def test_extract_and_post_process_does_not_reparse_jpath(self):
+        command = {"command": "show interfaces", "parser": "textfsm", "jpath": "[?interface=='{{ current_key }}'].mtu"}
+        parsed_command_output = [{"interface": "Ethernet1/1", "mtu": "1500"}]
+        context = {"obj": "1.1.1.1", "current_key": "Ethernet1/1"}
+        extract_and_post_process(parsed_command_output, command, dict(context), "str", False)
+        with patch("nautobot_device_onboarding.nornir_plays.formatter.jmespath.compile") as mock_compile:
+            _, post_processed = extract_and_post_process(parsed_command_output, command, dict(context), "str", False)
+        mock_compile.assert_not_called()
+        self.assertEqual(post_processed, "1500")
+
+
+class TestFormatterRowIndex(unittest.TestCase):
+    """Tests to ensure nested field jpaths are resolved against an index of the parsed rows."""
+
+    def setUp(self):
+        self.parsed_command_output = [
+            {"interface": "GigabitEthernet1", "mtu": "1500", "ip_address": "10.1.1.1", "prefix_length": "24"},
+            {"interface": "GigabitEthernet2", "mtu": "9000", "ip_address": "", "prefix_length": ""},
+            {"interface": "GigabitEthernet2", "mtu": "9000", "ip_address": "10.2.2.2", "prefix_length": "30"},
+        ]
+
+    def test_get_indexed_jpath_simple(self):
+        self.assertEqual(
+            get_indexed_jpath("[?interface=='{{ current_key }}'].mtu"), ("interface", "{{ current_key }}", "[*].mtu")
+        )
+
+    def test_get_indexed_jpath_filtered_key(self):
+        self.assertEqual(
+            get_indexed_jpath("[?interface=='{{ current_key | abbreviated_interface_name }}'].{name:vrf}"),
+            ("interface", "{{ current_key | abbreviated_interface_name }}", "[*].{name:vrf}"),
+        )
+
+    def test_get_indexed_jpath_not_indexable(self):
+        self.assertIsNone(get_indexed_jpath("[*].interface"))
+        self.assertIsNone(get_indexed_jpath("[?contains(@.member_interface, `{{ current_key }}`)].bundle_name"))
+        self.assertIsNone(get_indexed_jpath('interfaces."{{ current_key }}".description'))
+        self.assertIsNone(get_indexed_jpath("[?interface=='{{ current_key }}'].[$vlan_id$,vlan_name]"))
+
+    def test_build_row_index_not_a_table(self):
+        self.assertIsNone(build_row_index({"interfaces": {}}))
+        self.assertIsNone(build_row_index([]))
+
+    def test_row_index_lookup(self):
+        row_index = build_row_index(self.parsed_command_output)
+        self.assertEqual(row_index.lookup("interface", "GigabitEthernet2"), self.parsed_command_output[1:])
+        self.assertEqual(row_index.lookup("interface", "GigabitEthernet3"), [])
+
+    def test_extract_and_post_process_with_row_index_matches_full_scan(self):
+        row_index = build_row_index(self.parsed_command_output)
+        command = {
+            "command": "show interfaces",
+            "parser": "textfsm",
+            "jpath": "[?interface=='{{ current_key }}'].{ip_address: ip_address, prefix_length: prefix_length}",
+            "iterable_type": "list",
+        }
+        for current_key in ["GigabitEthernet1", "GigabitEthernet2", "GigabitEthernet3"]:
+            with self.subTest(current_key=current_key):
+                context = {"obj": "1.1.1.1", "original_host": "1.1.1.1", "current_key": current_key}
+                self.assertEqual(
+                    extract_and_post_process(self.parsed_command_output, command, dict(context), "list", False),
+                    extract_and_post_process(
+                        self.parsed_command_output, command, dict(context), "list", False, row_index=row_index
+                    ),
+                )
+
+
+class TestFormatterFieldExtraction(unittest.TestCase):
+    """Tests to ensure fields are extracted from their dependencies only, and only once."""
+
+    def setUp(self):
+        self.host = Host(name="198.51.100.1", hostname="198.51.100.1", platform="cisco_ios")
+        switchport_command = {
+            "command": "show interfaces switchport",
+            "parser": "textfsm",
+            "jpath": "[?interface=='{{ current_key }}'].access_vlan",
+        }
+        self.command_mapper = {
+            "pre_processor": {
+                "vlan_map": {
+                    "commands": {
+                        "command": "show vlan",
+                        "parser": "textfsm",
+                        "jpath": "[*].[$vlan_id$,vlan_name]",
+                        "post_processor": "{{ obj | flatten_list_of_dict_from_value('vlan_name') | tojson }}",
+                    }
+                },
+            },
+            "interfaces": {
+                "root_key": True,
+                "commands": {
+                    "command": "show interfaces",
+                    "parser": "textfsm",
+                    "jpath": "[*].interface",
+                    "python_post_processor": "keys_to_dict",
+                },
+            },
+            "interfaces__mtu": {
+                "commands": {
+                    "command": "show interfaces",
+                    "parser": "textfsm",
+                    "jpath": "[?interface=='{{ current_key }}'].mtu",
+                }
+            },
+            "interfaces__tagged_vlans": {"commands": {**switchport_command, "post_processor": "{{ obj | tojson }}"}},
+            "interfaces__untagged_vlan": {
+                "commands": {
+                    **switchport_command,
+                    "post_processor": "{% if obj %}{{ {'id': obj[0], 'name': vlan_map[obj[0]]} | tojson }}{% endif %}",
+                    "iterable_type": "dict",
+                }
+            },
+        }
+        self.command_outputs = {
+            "show vlan": [{"vlan_id": "10", "vlan_name": "users"}],
+            "show interfaces": [{"interface": "Gi1", "mtu": "1500"}, {"interface": "Gi2", "mtu": "9000"}],
+            "show interfaces switchport": [{"interface": "Gi1", "access_vlan": "10"}],
+        }
+
+    def test_extract(self):
+        command_plan = compile_command_plan(self.command_mapper, sync_vlans=True)
+        self.assertEqual(
+            {
+                "interfaces": {
+                    "Gi1": {"mtu": "1500", "tagged_vlans": "10", "untagged_vlan": {"id": "10", "name": "users"}},
+                    "Gi2": {"mtu": "9000", "tagged_vlans": [], "untagged_vlan": {}},
+                }
+            },
+            FieldExtraction(self.host, command_plan, self.command_outputs, False).extract(),
+        )
+
+    def test_pre_processor_extracted_for_the_fields_using_it(self):
+        command_plan = compile_command_plan(self.command_mapper, sync_vlans=True)
+        fields = {field.name: field for field in command_plan.fields}
+        del self.command_outputs["show vlan"]
+        field_extraction = FieldExtraction(self.host, command_plan, self.command_outputs, False)
+        # The root key field is extracted first, for its nested fields.
+        field_extraction.extract_field(fields["interfaces__mtu"])
+        field_extraction.extract_field(fields["interfaces__tagged_vlans"])
+        self.assertEqual({"mtu": "1500", "tagged_vlans": "10"}, field_extraction.result["interfaces"]["Gi1"])
+        with self.assertRaises(KeyError):
+            field_extraction.extract_field(fields["interfaces__untagged_vlan"])
+
+    def test_extracted_data_shared_between_fields(self):
+        command_plan = compile_command_plan(self.command_mapper, sync_vlans=True)
+        with patch(
+            "nautobot_device_onboarding.nornir_plays.formatter.extract_data",
+            side_effect=extract_data,
+        ) as mock_extract_data:
+            FieldExtraction(self.host, command_plan, self.command_outputs, False).extract()
+        # vlan_map, interfaces, then mtu and the shared access_vlan once per interface.
+        self.assertEqual(6, mock_extract_data.call_count)
+
+    def test_shared_data_copied_for_each_field(self):
+        @register_post_processor(name="test_append_vlan", context_keys=())
+        def _append_vlan(obj, context):  # pylint: disable=unused-argument
+            obj.append("99")
+            return obj
+
+        self.addCleanup(POST_PROCESSORS.pop, "test_append_vlan")
+        switchport_command = self.command_mapper["interfaces__tagged_vlans"]["commands"]
+        self.command_mapper["interfaces__tagged_vlans"]["commands"] = {
+            **switchport_command,
+            "python_post_processor": "test_append_vlan",
+        }
+        self.command_mapper["interfaces__access_vlan"] = {"commands": {**switchport_command, "post_processor": None}}
+        command_plan = compile_command_plan(self.command_mapper, sync_vlans=True)
+        result = FieldExtraction(self.host, command_plan, self.command_outputs, False).extract()
+        self.assertEqual(["10", "99"], result["interfaces"]["Gi1"]["tagged_vlans"])
+        self.assertEqual({"id": "10", "name": "users"}, result["interfaces"]["Gi1"]["untagged_vlan"])
+        self.assertEqual("10", result["interfaces"]["Gi1"]["access_vlan"])
+
+    def test_nested_field_without_root_key(self):
+        del self.command_mapper["interfaces"]
+        command_plan = compile_command_plan(self.command_mapper)
+        with self.assertRaises(ValueError):
+            FieldExtraction(self.host, command_plan, self.command_outputs, False).extract()
+
+
+class TestFormatterParsedTable(unittest.TestCase):
+    """Tests to ensure jpaths are evaluated against the columns of a parsed table they read."""
+
+    def setUp(self):
+        self.rows = [
+            {"interface": "Gi1", "link_status": "up", "mtu": "1500", "vlans": ["10", "20"]},
+            {"interface": "Gi2", "link_status": "down", "mtu": None, "vlans": ["30"]},
+        ]
+        self.table = ParsedTable.from_rows(self.rows)
+
+    def test_get_table_columns(self):
+        self.assertEqual({"interface"}, get_table_columns("[*].interface"))
+        self.assertEqual({"interface", "link_status"}, get_table_columns("[*].{name: interface, enabled: link_status}"))
+        self.assertEqual({"interface", "mtu"}, get_table_columns("[?interface=='Gi1'].mtu | [0]"))
+        self.assertEqual({"vlans"}, get_table_columns("[*].vlans[]"))
+        self.assertEqual({"interface", "mtu"}, get_table_columns("[?contains(interface, `Gi`)].mtu"))
+        self.assertIsNone(get_table_columns("[?interface=='Gi1']"))
+        self.assertIsNone(get_table_columns("[].keys(@)[]"))
+        self.assertIsNone(get_table_columns("[0].mtu"))
+        self.assertIsNone(get_table_columns("[*].[$interface$,mtu]"))
+
+    def test_get_table_data_matches_rows(self):
+        for jpath in [
+            "[*].interface",
+            "[*].mtu",
+            "[*].missing",
+            "[*].vlans[]",
+            "[*].{name: interface, enabled: link_status}",
+            "[?interface=='Gi2'].vlans",
+            "[?link_status=='up']",
+            "[0].interface",
+        ]:
+            with self.subTest(jpath=jpath):
+                self.assertEqual(extract_data(self.rows, jpath), extract_data(*get_table_data(self.table, jpath)))
+
+    @patch("nautobot_device_onboarding.nornir_plays.transform.GitRepository")
+    def test_shipped_root_keys_read_columns(self, mock_repo):
+        mock_repo.return_value = 0
+        checked = 0
+        for platform, command_mappers in add_platform_parsing_info().items():
+            # The post processors of the root keys use the pre_processors, only the extraction is compared.
+            root_key_commands = [
+                {"command": command["command"], "jpath": command["jpath"]}
+                for field in (command_mappers.get("sync_network_data") or {}).values()
+                if field.get("root_key")
+                for command in field["commands"]
+            ]
+            for command in root_key_commands:
+                for filename in find_files_by_prefix(f"{MOCK_DIR}/{platform}", "command_getter_result"):
+                    with open(f"{MOCK_DIR}/{platform}/{filename}", "r", encoding="utf-8") as command_info:
+                        parsed_command_output = json.loads(command_info.read()).get(command["command"])
+                    table = ParsedTable.from_rows(parsed_command_output)
+                    if table is None:
+                        continue
+                    context = {"obj": "198.51.100.1", "original_host": "198.51.100.1"}
+                    with patch.object(ParsedTable, "rows", side_effect=AssertionError("rows built")):
+                        self.assertEqual(
+                            extract_and_post_process(parsed_command_output, command, dict(context), None, False),
+                            extract_and_post_process(table, command, dict(context), None, False),
+                        )
+                    checked += 1
+        self.assertGreater(checked, 0)
+
+
 class TestFormatterExtractAndProcess(unittest.TestCase):
     """Tests Basic Operations of formatter."""
 
@@ -706,6 +1028,40 @@ class TestFormatterSyncNetworkDataWithVlans(unittest.TestCase):
                             )
                             self.assertEqual(expected_parsed_result, actual_result)
 
+    def test_perform_data_extraction_parsed_tables(self):
+        # The same data is extracted from the parsed tables stored by column, with the VLANs and VRFs.
+        self.host.defaults = Defaults(data={"sync_vlans": True, "sync_vrfs": True})
+        supported_platforms = list(self.platform_parsing_info.keys())
+        for sync_only in SYNC_DEVICES_ONLY:
+            supported_platforms.remove(sync_only)
+        for platform in supported_platforms:
+            self.host.platform = platform
+            for command_getter_file in find_files_by_prefix(f"{MOCK_DIR}/{platform}/", "command_getter"):
+                expected_file = f"{MOCK_DIR}/{platform}/sync_network_data_with_vlans/expected_result_{command_getter_file.split('_')[-1]}"
+                # Only the outputs with an expected result have the outputs of every command.
+                if not os.path.exists(expected_file):
+                    continue
+                with self.subTest(platform=platform, command_getter_file=command_getter_file):
+                    with open(f"{MOCK_DIR}/{platform}/{command_getter_file}", "r", encoding="utf-8") as command_info:
+                        command_outputs = json.loads(command_info.read())
+                    columnar_command_outputs = {
+                        command: ParsedTable.from_rows(output) or output for command, output in command_outputs.items()
+                    }
+                    self.assertEqual(
+                        perform_data_extraction(
+                            self.host,
+                            self.platform_parsing_info[platform]["sync_network_data"],
+                            command_outputs,
+                            job_debug=False,
+                        ),
+                        perform_data_extraction(
+                            self.host,
+                            self.platform_parsing_info[platform]["sync_network_data"],
+                            columnar_command_outputs,
+                            job_debug=False,
+                        ),
+                    )
+
 
 @unittest.skip(reason="Todo test sync network data with all options.")
 class TestFormatterSyncNetworkDataAll(unittest.TestCase):
@@ -18,7 +18,9 @@ from nautobot_device_onboarding.jinja_filters import (
     nxos_switchport_mode_to_nautobot_interface_mode,
     parse_junos_ip_address,
     remove_fqdn,
+    table_lookup,
 )
+from nautobot_device_onboarding.nornir_plays.parsed_table import ParsedTable
 
 
 class TestJinjaFilters(unittest.TestCase):
@@ -290,3 +292,12 @@ class TestJinjaFilters(unittest.TestCase):
     def test_remove_fqdn(self):
         """Remove the FQDN from the hostname."""
         self.assertEqual(remove_fqdn("foo.example.com"), "foo")
+
+    def test_table_lookup(self):
+        """Look the rows of a parsed table up by column."""
+        rows = [{"interface": "Gi1", "mtu": "1500"}, {"interface": "Gi2", "mtu": "9000"}]
+        for table in [rows, ParsedTable.from_rows(rows)]:
+            with self.subTest(table=type(table).__name__):
+                self.assertEqual(table_lookup(table, "interface", "Gi2"), [rows[1]])
+                self.assertEqual(table_lookup(table, "interface", "Gi1", "mtu"), ["1500"])
+                self.assertEqual(table_lookup(table, "interface", "Gi3", "mtu"), [])
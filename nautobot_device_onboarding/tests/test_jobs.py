@@ -2,7 +2,7 @@
 
 import os
 from pathlib import Path
-from unittest.mock import ANY, patch
+from unittest.mock import ANY, MagicMock, patch
 
 from django.core.files.base import ContentFile
 from django.test import override_settings
@@ -12,7 +12,7 @@ from nautobot.apps.choices import InterfaceModeChoices
 from nautobot.apps.jobs import Job as JobClass
 from nautobot.apps.testing import create_job_result_and_run_job
 from nautobot.core.testing import TransactionTestCase
-from nautobot.dcim.models import Device, Interface, Manufacturer, Platform
+from nautobot.dcim.models import Device, Interface, Location, Manufacturer, Platform
 from nautobot.extras.choices import JobResultStatusChoices
 from nautobot.extras.models import FileProxy
 from nautobot.ipam.models import VLAN, VRF
@@ -702,3 +702,52 @@ class SSOTSyncNetworkDataTestCase(TransactionTestCase):
         self.assertEqual(po1_91.vrf.name, "91")
 
         self.assertEqual(initial_vrfs.union({"Mgmt-vrf", "10", "91"}), set(VRF.objects.values_list("name", flat=True)))
+
+
+class SSOTSyncDevicesAndNetworkDataTestCase(TransactionTestCase):
+    """Test SSOTSyncDevicesAndNetworkData class."""
+
+    databases = ("default", "job_logs")
+
+    def setUp(self):  # pylint: disable=invalid-name
+        """Initialize test case."""
+        self.testing_objects = utils.sync_network_data_ensure_required_nautobot_objects()
+        location = self.testing_objects["location"]
+        other_location = Location.objects.create(
+            name="Other Location", location_type=location.location_type, status=self.testing_objects["status"]
+        )
+        device = self.testing_objects["device_1"]
+        # A device with the same name and serial in another location, not synced by the job.
+        self.other_device = Device.objects.create(
+            name=device.name,
+            serial=device.serial,
+            device_type=device.device_type,
+            status=device.status,
+            location=other_location,
+            role=device.role,
+        )
+        self.job = jobs.SSOTSyncDevicesAndNetworkData()
+        self.job.ip_address_inventory = {"10.1.1.10": {"location": location}}
+        self.job.network_data_command_getter_result = {"10.1.1.10": {"serial": device.serial}}
+        self.job.source_adapter = MagicMock(
+            device_data={"10.1.1.10": {"hostname": device.name, "serial": device.serial}}
+        )
+
+    def test_network_data_is_scoped_to_the_synced_devices(self):
+        network_data, synced_devices = self.job._get_network_data_by_hostname()  # pylint: disable=protected-access
+        self.assertEqual({"demo-cisco-1": {"serial": "9ABUXU581111"}}, network_data)
+        self.assertEqual([self.testing_objects["device_1"]], list(synced_devices))
+
+    @patch("nautobot_device_onboarding.jobs.SyncNetworkDataNetworkAdapter")
+    def test_devices_to_load_are_scoped_to_the_synced_devices(self, network_adapter):
+        _, self.job.filtered_devices = self.job._get_network_data_by_hostname()  # pylint: disable=protected-access
+        self.job.sync_stage = "sync_network_data"
+        self.job.sync = None
+
+        def load():
+            # Looked up by name and serial, see generate_device_queryset_from_command_getter_result.
+            self.job.devices_to_load = Device.objects.filter(name="demo-cisco-1", serial="9ABUXU581111")
+
+        network_adapter.return_value.load.side_effect = load
+        self.job.load_source_adapter()
+        self.assertEqual([self.testing_objects["device_1"]], list(self.job.devices_to_load))
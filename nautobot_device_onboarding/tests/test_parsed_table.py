@@ -0,0 +1,53 @@
+"""Test the columnar representation of the parsed command outputs."""
+
+import unittest
+from unittest.mock import patch
+
+from nautobot_device_onboarding.nornir_plays.formatter import build_row_index
+from nautobot_device_onboarding.nornir_plays.parsed_table import ParsedTable, to_parsed_table
+
+
+class TestParsedTable(unittest.TestCase):
+    """Test storing parsed tables by column and looking their rows up."""
+
+    def setUp(self):
+        self.rows = [
+            {"interface": "GigabitEthernet1", "mtu": "1500", "ip_address": "10.1.1.1"},
+            {"interface": "GigabitEthernet2", "mtu": "9000", "ip_address": ""},
+            {"interface": "GigabitEthernet2", "mtu": "9000", "ip_address": "10.2.2.2"},
+        ]
+        self.table = ParsedTable.from_rows(self.rows)
+
+    def test_from_rows(self):
+        self.assertEqual(3, len(self.table))
+        self.assertEqual(["1500", "9000", "9000"], self.table.column("mtu"))
+        self.assertEqual([], self.table.column("missing"))
+        self.assertEqual(self.rows, list(self.table))
+        self.assertEqual(self.rows, self.table.rows())
+        # The rows aren't kept by the table.
+        self.assertIsNot(self.table.rows(), self.table.rows())
+        self.assertEqual([{"mtu": "1500"}, {"mtu": "9000"}, {"mtu": "9000"}], self.table.rows(["mtu", "missing"]))
+
+    def test_from_rows_not_a_table(self):
+        self.assertIsNone(ParsedTable.from_rows([]))
+        self.assertIsNone(ParsedTable.from_rows([{"1.1": {"mtu": "9198"}, "1.2": {"mtu": "1500"}}]))
+        self.assertIsNone(ParsedTable.from_rows({"interface": "GigabitEthernet1"}))
+        self.assertIsNone(ParsedTable.from_rows([[{"interface": "GigabitEthernet1"}]]))
+        self.assertIsNone(ParsedTable.from_rows([{"interface": "GigabitEthernet1"}, {"name": "GigabitEthernet2"}]))
+        self.assertIsNone(ParsedTable.from_rows([{"interface": "GigabitEthernet1"}, {"interface": "a", "mtu": "1"}]))
+
+    def test_lookup(self):
+        self.assertEqual(self.rows[1:], self.table.lookup("interface", "GigabitEthernet2"))
+        self.assertEqual([], self.table.lookup("interface", "GigabitEthernet3"))
+        self.assertEqual("1500", self.table.get_value("interface", "GigabitEthernet1", "mtu"))
+        self.assertEqual("", self.table.get_value("interface", "GigabitEthernet2", "ip_address"))
+        self.assertIsNone(self.table.get_value("interface", "GigabitEthernet3", "mtu"))
+        self.assertEqual("n/a", self.table.get_value("interface", "GigabitEthernet1", "speed", default="n/a"))
+        # The parsed table indexes its own rows.
+        self.assertIs(self.table, build_row_index(self.table))
+
+    def test_to_parsed_table(self):
+        self.assertIs(self.rows, to_parsed_table(self.rows))
+        with patch.dict("nautobot_device_onboarding.nornir_plays.parsed_table.PLUGIN_CFG", columnar_parsed_tables=True):
+            self.assertEqual(self.rows, to_parsed_table(self.rows).rows())
+            self.assertEqual({"raw": "output"}, to_parsed_table({"raw": "output"}))
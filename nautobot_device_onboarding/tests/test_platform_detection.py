@@ -0,0 +1,104 @@
+"""Test the platform detection cache."""
+
+import socket
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from django.core.cache.backends.locmem import LocMemCache
+
+from nautobot_device_onboarding.utils.platform_detection import (
+    clear_platform_detection_cache,
+    detect_platform,
+    get_ssh_banner_fingerprint,
+)
+
+
+@patch("nautobot_device_onboarding.utils.platform_detection.get_ssh_banner_fingerprint", return_value="banner")
+@patch.dict(
+    "nautobot_device_onboarding.utils.platform_detection.PLUGIN_CFG",
+    {"platform_detection_cache_timeout": 60, "platform_detection_cache_ssh_banner": True},
+)
+class TestDetectPlatform(unittest.TestCase):
+    """Test detecting platforms through the cache."""
+
+    def setUp(self):
+        self.cache = LocMemCache("platform_detection", {})
+        self.cache.clear()
+        patcher = patch("nautobot_device_onboarding.utils.platform_detection.cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.autodetect = MagicMock(return_value="cisco_ios")
+
+    def test_detected_platform_is_cached(self, _):
+        self.assertEqual("cisco_ios", detect_platform("192.0.2.1", 22, self.autodetect))
+        self.assertEqual("cisco_ios", detect_platform("192.0.2.1", 22, self.autodetect))
+        self.autodetect.assert_called_once()
+        detect_platform("192.0.2.1", 2222, self.autodetect)
+        self.assertEqual(2, self.autodetect.call_count)
+
+    def test_failed_detection_is_not_cached(self, _):
+        self.autodetect.return_value = None
+        self.assertIsNone(detect_platform("192.0.2.1", 22, self.autodetect))
+        self.assertIsNone(detect_platform("192.0.2.1", 22, self.autodetect))
+        self.assertEqual(2, self.autodetect.call_count)
+
+    def test_changed_ssh_banner_detects_again(self, banner_fingerprint):
+        detect_platform("192.0.2.1", 22, self.autodetect)
+        banner_fingerprint.return_value = "other banner"
+        self.autodetect.return_value = "arista_eos"
+        self.assertEqual("arista_eos", detect_platform("192.0.2.1", 22, self.autodetect))
+        self.assertEqual(2, self.autodetect.call_count)
+
+    def test_unreadable_ssh_banner_skips_cache(self, banner_fingerprint):
+        banner_fingerprint.return_value = None
+        detect_platform("192.0.2.1", 22, self.autodetect)
+        detect_platform("192.0.2.1", 22, self.autodetect)
+        self.assertEqual(2, self.autodetect.call_count)
+
+    def test_disabled_cache(self, banner_fingerprint):
+        with patch.dict(
+            "nautobot_device_onboarding.utils.platform_detection.PLUGIN_CFG", {"platform_detection_cache_timeout": 0}
+        ):
+            detect_platform("192.0.2.1", 22, self.autodetect)
+            detect_platform("192.0.2.1", 22, self.autodetect)
+        self.assertEqual(2, self.autodetect.call_count)
+        banner_fingerprint.assert_not_called()
+
+    def test_clear_platform_detection_cache(self, _):
+        detect_platform("192.0.2.1", 22, self.autodetect)
+        detect_platform("192.0.2.2", 22, self.autodetect)
+        clear_platform_detection_cache(host="192.0.2.1")
+        detect_platform("192.0.2.1", 22, self.autodetect)
+        detect_platform("192.0.2.2", 22, self.autodetect)
+        self.assertEqual(3, self.autodetect.call_count)
+        clear_platform_detection_cache()
+        detect_platform("192.0.2.1", 22, self.autodetect)
+        detect_platform("192.0.2.2", 22, self.autodetect)
+        self.assertEqual(5, self.autodetect.call_count)
+
+
+class TestSSHBannerFingerprint(unittest.TestCase):
+    """Test reading the SSH server identification string of a device."""
+
+    def _serve(self, banner):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+        self.addCleanup(server.close)
+
+        def _send_banner():
+            connection, _ = server.accept()
+            with connection:
+                connection.sendall(banner)
+
+        threading.Thread(target=_send_banner, daemon=True).start()
+        return server.getsockname()[1]
+
+    def test_fingerprint(self):
+        fingerprint = get_ssh_banner_fingerprint("127.0.0.1", self._serve(b"SSH-2.0-Cisco-1.25\r\n"))
+        self.assertEqual(fingerprint, get_ssh_banner_fingerprint("127.0.0.1", self._serve(b"SSH-2.0-Cisco-1.25\r\n")))
+        self.assertNotEqual(fingerprint, get_ssh_banner_fingerprint("127.0.0.1", self._serve(b"SSH-2.0-OpenSSH\r\n")))
+
+    def test_not_an_ssh_server(self):
+        self.assertIsNone(get_ssh_banner_fingerprint("127.0.0.1", self._serve(b"220 ftp ready\r\n")))
@@ -0,0 +1,103 @@
+"""Test the Python post_processors of the command mappers."""
+
+import unittest
+
+from nautobot_device_onboarding.nornir_plays.formatter import extract_and_post_process, normalize_processed_data
+from nautobot_device_onboarding.post_processors import (
+    POST_PROCESSORS,
+    cables,
+    get_post_processor,
+    keys_to_dict,
+    register_post_processor,
+    vlan_data,
+)
+
+
+class TestPostProcessors(unittest.TestCase):
+    """Test the registered post_processors and looking them up."""
+
+    def test_keys_to_dict(self):
+        self.assertEqual({"Gi1": {}, "Gi2": {}}, keys_to_dict(["Gi1", "Gi2", "Gi1"], {}))
+
+    def test_vlan_data(self):
+        item = [
+            {"admin_mode": "static access", "mode": "", "access_vlan": "10", "trunking_vlans": [], "native_vlan": ""}
+        ]
+        context = {"vlan_map": {"10": "users"}}
+        self.assertEqual([{"id": "10", "name": "users"}], vlan_data(item, context, "untagged"))
+        self.assertEqual([], vlan_data(item, context, "tagged"))
+
+    def test_cables(self):
+        self.assertEqual(
+            [{"local_interface": "Gi1", "remote_interface": "Gi2", "remote_device": "core"}],
+            cables([{"local_interface": "Gi1", "remote_interface": "Gi2", "remote_device": "core.example.com"}], {}),
+        )
+
+    def test_get_post_processor(self):
+        self.assertIs(keys_to_dict, get_post_processor("keys_to_dict"))
+        self.assertIs(
+            normalize_processed_data,
+            get_post_processor("nautobot_device_onboarding.nornir_plays.formatter.normalize_processed_data"),
+        )
+        with self.assertRaises(ValueError):
+            get_post_processor("not_registered")
+        with self.assertRaises(ValueError):
+            get_post_processor("nautobot_device_onboarding.not_a_module.func")
+
+    def test_register_post_processor(self):
+        @register_post_processor(name="test_upper")
+        def _upper(obj, context):  # pylint: disable=unused-argument
+            return obj.upper()
+
+        self.addCleanup(POST_PROCESSORS.pop, "test_upper")
+        self.assertIs(_upper, get_post_processor("test_upper"))
+
+
+class TestExtractAndPythonPostProcess(unittest.TestCase):
+    """Test extracting data with a python_post_processor instead of a Jinja2 post_processor."""
+
+    def test_matches_jinja_post_processor(self):
+        parsed_command_output = [{"interface": "Gi1"}, {"interface": "Gi2"}]
+        jinja_command = {
+            "command": "show interfaces",
+            "jpath": "[*].interface",
+            "post_processor": "{% set result={} %}{% for interface in obj %}{{ result.update({interface: {}}) or '' }}"
+            "{% endfor %}{{ result | tojson }}",
+        }
+        python_command = {
+            "command": "show interfaces",
+            "jpath": "[*].interface",
+            "python_post_processor": "keys_to_dict",
+        }
+        context = {"obj": "198.51.100.1", "original_host": "198.51.100.1"}
+        self.assertEqual(
+            extract_and_post_process(parsed_command_output, jinja_command, dict(context), None, False),
+            extract_and_post_process(parsed_command_output, python_command, dict(context), None, False),
+        )
+
+    def test_post_processor_kwargs_and_context(self):
+        parsed_command_output = [{"interface": "Gi1", "vlan": "10"}]
+        register_post_processor(name="test_vlan_names")(
+            lambda obj, context, suffix: [f"{context['vlan_map'][vid]}{suffix}" for vid in obj]
+        )
+        self.addCleanup(POST_PROCESSORS.pop, "test_vlan_names")
+        command = {
+            "command": "show interfaces switchport",
+            "jpath": "[?interface=='{{ current_key }}'].vlan",
+            "python_post_processor": "test_vlan_names",
+            "post_processor_kwargs": {"suffix": "-vlan"},
+        }
+        context = {"obj": "198.51.100.1", "current_key": "Gi1", "vlan_map": {"10": "users"}}
+        self.assertEqual(
+            (["10"], "users-vlan"), extract_and_post_process(parsed_command_output, command, context, None, False)
+        )
+
+    def test_native_result_normalized_like_json(self):
+        self.assertEqual({}, normalize_processed_data({}, None, native=True))
+        self.assertEqual(normalize_processed_data("{}", None), normalize_processed_data({}, None, native=True))
+        self.assertEqual(normalize_processed_data("[]", "dict"), normalize_processed_data([], "dict", native=True))
+        self.assertEqual(
+            normalize_processed_data('[{"id": "10"}]', "dict"),
+            normalize_processed_data([{"id": "10"}], "dict", native=True),
+        )
+        self.assertEqual([], normalize_processed_data("", None, native=True))
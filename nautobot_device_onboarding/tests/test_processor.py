@@ -34,3 +34,12 @@ class TestManufacturerDerivation(unittest.TestCase):
 
     def test_platform_string_is_netmiko_token_unchanged(self):
         self.assertEqual(self._run("paloalto_panos")["platform"], "paloalto_panos")
+
+    def test_failed_host_without_platform_is_unknown(self):
+        outputs = {}
+        processor = CommandGetterProcessor(logger=MagicMock(), command_outputs=outputs, job=MagicMock(debug=False))
+        processor.report_failed_host("10.0.0.1", None, "10.0.0.1 failed connectivity check via tcp_ping.")
+        processor.report_failed_host("10.0.0.2", "cisco_ios", "10.0.0.2 failed connectivity check via tcp_ping.")
+        self.assertEqual("Unknown", outputs["10.0.0.1"]["manufacturer"])
+        self.assertTrue(outputs["10.0.0.1"]["failed"])
+        self.assertEqual("Cisco", outputs["10.0.0.2"]["manufacturer"])
@@ -0,0 +1,80 @@
+"""Test the concurrent TCP reachability sweep."""
+
+import errno
+import socket
+import threading
+import unittest
+from unittest.mock import patch
+
+from nautobot_device_onboarding.nornir_plays import reachability
+from nautobot_device_onboarding.nornir_plays.reachability import sweep_tcp_reachability
+
+
+class TestSweepTCPReachability(unittest.TestCase):
+    """Test checking the reachability of several hosts at once."""
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(16)
+        self.addCleanup(self.server.close)
+        self.open_port = self.server.getsockname()[1]
+        # A port nothing listens on, the connections to it are refused.
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as closed:
+            closed.bind(("127.0.0.1", 0))
+            self.closed_port = closed.getsockname()[1]
+
+    def test_sweep(self):
+        results = sweep_tcp_reachability(
+            {
+                "open": ("127.0.0.1", self.open_port),
+                "closed": ("127.0.0.1", self.closed_port),
+                "no_hostname": (None, 22),
+                "invalid_port": ("127.0.0.1", "ssh"),
+            }
+        )
+        self.assertEqual(["open", "closed", "no_hostname", "invalid_port"], list(results))
+        self.assertIsInstance(results["open"], float)
+        self.assertIsNone(results["closed"])
+        self.assertIsNone(results["no_hostname"])
+        self.assertIsNone(results["invalid_port"])
+
+    def test_sweep_more_hosts_than_in_flight(self):
+        targets = {f"host{index}": ("127.0.0.1", self.open_port) for index in range(10)}
+        results = sweep_tcp_reachability(targets, max_in_flight=3)
+        self.assertEqual(list(targets), list(results))
+        self.assertTrue(all(latency is not None for latency in results.values()))
+
+    def test_sweep_socket_error_only_fails_its_host(self):
+        real_socket = socket.socket
+        calls = []
+
+        def socket_out_of_descriptors(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 2:
+                raise OSError(errno.EMFILE, "Too many open files")
+            return real_socket(*args, **kwargs)
+
+        targets = {f"host{index}": ("127.0.0.1", self.open_port) for index in range(3)}
+        with patch.object(reachability.socket, "socket", side_effect=socket_out_of_descriptors):
+            results = sweep_tcp_reachability(targets)
+        self.assertIsInstance(results["host0"], float)
+        self.assertIsNone(results["host1"])
+        self.assertIsInstance(results["host2"], float)
+
+    def test_sweep_resolves_hostnames_in_threads(self):
+        real_getaddrinfo = socket.getaddrinfo
+        resolver_threads = {}
+
+        def getaddrinfo(host, *args, **kwargs):
+            resolver_threads[host] = threading.current_thread()
+            return real_getaddrinfo("127.0.0.1" if host == "device.example.com" else host, *args, **kwargs)
+
+        with patch.object(reachability.socket, "getaddrinfo", side_effect=getaddrinfo):
+            results = sweep_tcp_reachability(
+                {"hostname": ("device.example.com", self.open_port), "ip": ("127.0.0.1", self.open_port)}
+            )
+        self.assertIsInstance(results["hostname"], float)
+        self.assertIsInstance(results["ip"], float)
+        self.assertIsNot(threading.main_thread(), resolver_threads["device.example.com"])
+        self.assertIs(threading.main_thread(), resolver_threads["127.0.0.1"])
@@ -0,0 +1,161 @@
+"""Test recording the raw command outputs and replaying them."""
+
+import io
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from nornir.core import Nornir
+from nornir.core.inventory import Defaults, Groups, Host, Hosts, Inventory
+from nornir.plugins.runners import SerialRunner
+
+from nautobot_device_onboarding.jobs import SSOTSyncDevices, SSOTSyncNetworkData
+from nautobot_device_onboarding.nornir_plays.command_getter import _set_inventories, netmiko_send_commands
+from nautobot_device_onboarding.nornir_plays.processor import CommandGetterProcessor
+from nautobot_device_onboarding.nornir_plays.recording import (
+    RECORDING_FILE_NAME,
+    CommandOutputNotRecordedError,
+    CommandOutputRecorder,
+    CommandOutputReplay,
+    get_command_output_recorder,
+    get_command_output_replay,
+)
+
+
+def _record(*records):
+    """Return the content of a recording of (host, command, output) records."""
+    directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+    with directory, CommandOutputRecorder(directory=directory.name) as recorder:
+        for host, command, output in records:
+            recorder.record(host, command, output)
+        return recorder.read()
+
+
+class TestCommandOutputRecording(unittest.TestCase):
+    """Test writing a recording and reading its outputs back."""
+
+    def setUp(self):
+        self.ios_host = Host(name="198.51.100.1", hostname="198.51.100.1", platform="cisco_ios")
+        self.junos_host = Host(name="router-1", hostname="198.51.100.2", platform="juniper_junos")
+        self.recording = _record(
+            (self.ios_host, "show version", "Cisco IOS Software"),
+            (self.ios_host, "show interfaces", "GigabitEthernet1 is up\n" * 1000),
+            (self.junos_host, "show version", "Junos"),
+        )
+
+    def test_replay(self):
+        replay = CommandOutputReplay(io.BytesIO(self.recording))
+        self.assertEqual("Cisco IOS Software", replay.get_output(self.ios_host, "show version"))
+        self.assertEqual("GigabitEthernet1 is up\n" * 1000, replay.get_output(self.ios_host, "show interfaces"))
+        self.assertEqual("Junos", replay.get_output(self.junos_host, "show version"))
+        self.assertEqual("cisco_ios", replay.get_platform("198.51.100.1"))
+        self.assertIsNone(replay.get_platform("198.51.100.3"))
+        # Outputs are compressed.
+        self.assertLess(len(self.recording), 1000)
+
+    def test_replay_by_hostname(self):
+        replay = CommandOutputReplay(io.BytesIO(self.recording))
+        # Recorded by a sync devices job, replayed by a sync network data job.
+        self.assertEqual("juniper_junos", replay.get_platform("198.51.100.2"))
+        device_host = Host(name="branch-router", hostname="198.51.100.1", platform="cisco_ios")
+        self.assertEqual("Cisco IOS Software", replay.get_output(device_host, "show version"))
+
+    def test_replay_not_recorded(self):
+        replay = CommandOutputReplay(io.BytesIO(self.recording))
+        with self.assertRaises(CommandOutputNotRecordedError):
+            replay.get_output(self.ios_host, "show inventory")
+        with self.assertRaises(CommandOutputNotRecordedError):
+            replay.get_output(Host(name="198.51.100.1", hostname="198.51.100.1", platform="arista_eos"), "show version")
+        with self.assertRaises(CommandOutputNotRecordedError):
+            replay.get_output(Host(name="198.51.100.3", platform="cisco_ios"), "show version")
+
+    def test_save(self):
+        job = MagicMock()
+        with CommandOutputRecorder() as recorder:
+            recorder.record(self.ios_host, "show version", "Cisco IOS Software")
+            recorder.save(job)
+        file_name, content = job.create_file.call_args.args
+        self.assertEqual(RECORDING_FILE_NAME, file_name)
+        replay = CommandOutputReplay(io.BytesIO(content))
+        self.assertEqual("Cisco IOS Software", replay.get_output(self.ios_host, "show version"))
+
+    def test_get_command_output_recorder_and_replay(self):
+        with get_command_output_recorder(MagicMock(record_command_outputs=False)) as recorder:
+            self.assertIsNone(recorder)
+        with get_command_output_recorder(MagicMock(record_command_outputs=True)) as recorder:
+            self.assertIsInstance(recorder, CommandOutputRecorder)
+        self.assertIsNone(get_command_output_replay(MagicMock(replay_command_outputs=None)))
+        replay = get_command_output_replay(MagicMock(replay_command_outputs=io.BytesIO(self.recording)))
+        self.assertEqual("Junos", replay.get_output(self.junos_host, "show version"))
+
+    def test_get_command_output_recorder_and_replay_job_not_run(self):
+        for job_class in (SSOTSyncDevices, SSOTSyncNetworkData):
+            with get_command_output_recorder(job_class()) as recorder:
+                self.assertIsNone(recorder)
+            self.assertIsNone(get_command_output_replay(job_class()))
+
+
+class TestReplayCommandOutputs(unittest.TestCase):
+    """Test the replay of the recorded outputs in place of the device sessions."""
+
+    def setUp(self):
+        self.recording = _record(
+            (Host(name="198.51.100.1", hostname="198.51.100.1", platform="cisco_ios"), "show version", "IOS"),
+        )
+
+    @patch(
+        "nautobot_device_onboarding.nornir_plays.command_getter.get_all_network_driver_mappings",
+        MagicMock(return_value={"cisco_ios": {"ntc_templates": "cisco_ios"}}),
+    )
+    def test_netmiko_send_commands(self):
+        hosts = Hosts()
+        hosts["198.51.100.1"] = Host(name="198.51.100.1", hostname="198.51.100.1", platform="cisco_ios")
+        nautobot_job = MagicMock()
+        nautobot_job.connectivity_test = True
+        nautobot_job.debug = False
+        nautobot_job.fail_job_on_task_failure = False
+        nautobot_job.parse_in_process_pool = False
+        nautobot_job.spool_command_outputs = False
+        recorder = CommandOutputRecorder()
+        self.addCleanup(recorder.close)
+        processor = CommandGetterProcessor(MagicMock(), {}, nautobot_job, recorder=recorder)
+        # The processor parses the results, only the raw outputs are checked here.
+        processor.task_instance_completed = MagicMock()
+        nornir_obj = Nornir(
+            inventory=Inventory(hosts=hosts, groups=Groups(), defaults=Defaults()),
+            runner=SerialRunner(),
+        ).with_processors([processor])
+        yaml_data = {"cisco_ios": {"sync_devices": {"hostname": {"commands": []}}}}
+        commands = [{"command": "show version", "parser": "raw"}, {"command": "show inventory", "parser": "raw"}]
+        with patch(
+            "nautobot_device_onboarding.nornir_plays.command_getter._get_commands_to_run",
+            MagicMock(return_value=commands),
+        ):
+            result = nornir_obj.run(
+                task=netmiko_send_commands,
+                command_getter_yaml_data=yaml_data,
+                command_getter_job="sync_devices",
+                logger=MagicMock(),
+                nautobot_job=nautobot_job,
+                auth_breaker=MagicMock(),
+                replay=CommandOutputReplay(io.BytesIO(self.recording)),
+            )
+        self.assertFalse(result.failed)
+        self.assertEqual({"raw": "IOS"}, result["198.51.100.1"][1].result)
+        # Not recorded, handled like a failed command.
+        self.assertEqual([], result["198.51.100.1"][2].result)
+        # The replayed outputs are recorded again.
+        replay = CommandOutputReplay(io.BytesIO(recorder.read()))
+        self.assertEqual("IOS", replay.get_output(hosts["198.51.100.1"], "show version"))
+
+    @patch("nautobot_device_onboarding.nornir_plays.command_getter._set_inventory")
+    def test_set_inventories(self, set_inventory):
+        set_inventory.side_effect = lambda host_ip, **kwargs: ({host_ip: kwargs.get("network_driver")}, None)
+        inventory_kwargs = {
+            host_ip: {"host_ip": host_ip, "platform": None, "port": 22, "username": "admin", "password": "pass"}
+            for host_ip in ["198.51.100.1", "198.51.100.2"]
+        }
+        results = _set_inventories(inventory_kwargs, replay=CommandOutputReplay(io.BytesIO(self.recording)))
+        self.assertEqual(({"198.51.100.1": "cisco_ios"}, None), results["198.51.100.1"])
+        self.assertEqual({}, results["198.51.100.2"][0])
+        self.assertIsInstance(results["198.51.100.2"][1], CommandOutputNotRecordedError)
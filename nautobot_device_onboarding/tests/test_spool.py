@@ -0,0 +1,56 @@
+"""Test the spool of the raw command outputs."""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from nautobot_device_onboarding.jobs import SSOTSyncDevices, SSOTSyncNetworkData
+from nautobot_device_onboarding.nornir_plays.spool import CommandOutputSpool, get_command_output_spool
+
+
+class TestCommandOutputSpool(unittest.TestCase):
+    """Test writing the raw command outputs of the hosts to compressed files and reading them back."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.directory.cleanup)
+        self.spool = CommandOutputSpool(directory=self.directory.name)
+        self.addCleanup(self.spool.close)
+
+    def test_write_and_read(self):
+        self.spool.write("198.51.100.1", "show version", "Cisco IOS Software")
+        self.spool.write("198.51.100.1", "show interfaces", "GigabitEthernet1 is up\n" * 1000)
+        self.spool.write("router/1", "show version", "Junos")
+        self.assertEqual(
+            {"show version": "Cisco IOS Software", "show interfaces": "GigabitEthernet1 is up\n" * 1000},
+            self.spool.read("198.51.100.1"),
+        )
+        self.assertEqual({"show version": "Junos"}, self.spool.read("router/1"))
+        self.assertEqual({}, self.spool.read("198.51.100.2"))
+        # Outputs are compressed.
+        self.assertLess(os.path.getsize(self.spool.get_spool_file("198.51.100.1")), 1000)
+
+    def test_discard_and_close(self):
+        self.spool.write("198.51.100.1", "show version", "Cisco IOS Software")
+        self.spool.discard("198.51.100.1")
+        self.spool.discard("198.51.100.2")
+        self.assertEqual({}, self.spool.read("198.51.100.1"))
+        self.spool.write("198.51.100.1", "show version", "Cisco IOS Software")
+        self.spool.close()
+        self.assertFalse(os.path.exists(self.spool.path))
+
+    def test_get_command_output_spool(self):
+        with get_command_output_spool(MagicMock(spool_command_outputs=False)) as spool:
+            self.assertIsNone(spool)
+        job = MagicMock(spool_command_outputs=True)
+        job.job_result.id = "1234"
+        with get_command_output_spool(job) as spool:
+            self.assertTrue(os.path.basename(spool.path).startswith("onboarding-1234-"))
+            self.assertTrue(os.path.isdir(spool.path))
+        self.assertFalse(os.path.exists(spool.path))
+
+    def test_get_command_output_spool_job_not_run(self):
+        for job_class in (SSOTSyncDevices, SSOTSyncNetworkData):
+            with get_command_output_spool(job_class()) as spool:
+                self.assertIsNone(spool)
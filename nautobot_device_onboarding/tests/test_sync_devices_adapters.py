@@ -33,6 +33,7 @@ class SyncDevicesNetworkAdapterTestCase(TransactionTestCase):
         self.job.job_result = JobResult.objects.create(
             name=self.job.class_path, user=None, task_name="fake task", worker="default"
         )
+        self.job.connectivity_test = False
         self.sync_devices_adapter = SyncDevicesNetworkAdapter(job=self.job, sync=None)
 
         # Setup Nautobot Objects
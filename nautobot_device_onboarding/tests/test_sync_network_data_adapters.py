@@ -481,6 +481,21 @@ class SyncNetworkDataNautobotAdapterTestCase(TransactionTestCase):
                 self.assertEqual(interface.name, diffsync_obj.name)
                 self.assertEqual(vrf, diffsync_obj.vrf)
 
+    def test_interface_loaders_share_prefetched_interfaces(self):
+        """Test the interface assignment loaders query the interfaces of the devices to load only once."""
+        interfaces_by_device = self.sync_network_data_adapter._get_interfaces_by_device()  # pylint: disable=protected-access
+        for device, interfaces in interfaces_by_device:
+            self.assertEqual(set(device.all_interfaces), set(interfaces))
+        with self.assertNumQueries(0):
+            self.assertIs(
+                interfaces_by_device,
+                self.sync_network_data_adapter._get_interfaces_by_device(),  # pylint: disable=protected-access
+            )
+            for _, interfaces in interfaces_by_device:
+                for interface in interfaces:
+                    list(interface.tagged_vlans.all())
+                    _ = interface.untagged_vlan, interface.lag, interface.vrf
+
     def test_load_software_versions(self):
         """Test loading Nautobot software version data into the diffsync store."""
         self.sync_network_data_adapter.load_software_versions()
@@ -166,6 +166,22 @@ class PrefixToVrfNetworkAdapterTestCase(TransactionTestCase):
         # Only GE1's valid entry produces a record.
         self.assertEqual(len(records), 1)
 
+    def test_load_resolves_parent_prefixes_in_one_query(self):
+        # Existing IPs of every interface are resolved with a single query, the rest by arithmetic fallback.
+        self.job.command_getter_result["demo-cisco-2"]["interfaces"]["GigabitEthernet3"] = {
+            "vrf": {"name": "vrf2"},
+            "ip_addresses": [
+                {"ip_address": "10.1.1.11", "prefix_length": 24},
+                {"ip_address": "172.16.99.99", "prefix_length": 24},
+            ],
+        }
+        with self.assertNumQueries(1):
+            self.adapter.load_prefix_to_vrf()
+        self.assertEqual(
+            {"Global__10.1.1.0/24__mgmt", "Global__10.1.1.0/24__vrf2", "Global__172.16.99.0/24__vrf2"},
+            {record.get_unique_id() for record in self.adapter.get_all(SyncNetworkDataPrefixToVrf)},
+        )
+
 
 class PrefixToVrfNautobotAdapterTestCase(TransactionTestCase):
     """Verify the Nautobot adapter loads existing (prefix, vrf) associations in scope."""
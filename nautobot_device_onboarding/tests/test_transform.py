@@ -12,7 +12,11 @@ from nautobot.extras.choices import JobResultStatusChoices
 from nautobot.extras.models import GitRepository, JobResult
 
 from nautobot_device_onboarding.constants import ONBOARDING_COMMAND_MAPPERS_CONTENT_IDENTIFIER
-from nautobot_device_onboarding.nornir_plays.transform import add_platform_parsing_info, load_command_mappers_from_dir
+from nautobot_device_onboarding.nornir_plays.transform import (
+    add_platform_parsing_info,
+    clear_command_mappers_cache,
+    load_command_mappers_from_dir,
+)
 
 MOCK_DIR = os.path.join("nautobot_device_onboarding", "tests", "mock")
 
@@ -47,6 +51,36 @@ class TestTransformNoGitRepo(unittest.TestCase):
         command_mappers = load_command_mappers_from_dir(self.yaml_file_dir)
         self.assertEqual(["mock_cisco_ios"], list(command_mappers.keys()))
 
+    def test_load_command_mappers_from_dir_matches_safe_load(self):
+        with open(f"{self.yaml_file_dir}/mock_cisco_ios.yml", encoding="utf-8") as fd:
+            expected = yaml.safe_load(fd)
+        self.assertEqual({"mock_cisco_ios": expected}, load_command_mappers_from_dir(self.yaml_file_dir))
+
+    def test_load_command_mappers_from_dir_is_cached(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            with open(os.path.join(tempdir, "foo_bar.yml"), "w", encoding="utf-8") as fd:
+                yaml.dump({"sync_devices": {"serial": {}}}, fd)
+            with mock.patch(
+                "nautobot_device_onboarding.nornir_plays.transform.yaml.load", wraps=yaml.load
+            ) as mock_load:
+                command_mappers = load_command_mappers_from_dir(tempdir)
+                # The result is a copy, modifying it doesn't affect the cache.
+                command_mappers["foo_bar"]["sync_devices"] = {}
+                self.assertEqual({"foo_bar": {"sync_devices": {"serial": {}}}}, load_command_mappers_from_dir(tempdir))
+                mock_load.assert_called_once()
+
+                with open(os.path.join(tempdir, "foo_bar.yml"), "w", encoding="utf-8") as fd:
+                    yaml.dump({"sync_devices": {"hostname": {}}}, fd)
+                os.utime(os.path.join(tempdir, "foo_bar.yml"), (0, 0))
+                self.assertEqual(
+                    {"foo_bar": {"sync_devices": {"hostname": {}}}}, load_command_mappers_from_dir(tempdir)
+                )
+                self.assertEqual(2, mock_load.call_count)
+
+                clear_command_mappers_cache()
+                load_command_mappers_from_dir(tempdir)
+                self.assertEqual(3, mock_load.call_count)
+
 
 @mock.patch("nautobot.extras.datasources.git.GitRepo")
 class TestTransformWithGitRepo(TransactionTestCase):
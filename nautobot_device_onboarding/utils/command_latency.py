@@ -0,0 +1,126 @@
+"""Read timeouts of the commands run on the devices, set in the command mappers or learned from previous runs."""
+
+import math
+import threading
+
+from django.core.cache import cache
+
+from nautobot_device_onboarding.constants import PLUGIN_CFG
+
+CACHE_KEY_PREFIX = "nautobot_device_onboarding.command_latency"
+CACHE_GENERATION_KEY = f"{CACHE_KEY_PREFIX}.generation"
+
+# Seconds to wait for the output of a command that has no `read_timeout` in the command mapper.
+DEFAULT_READ_TIMEOUT = 60
+
+# Number of latencies of the last runs kept for each command of a device.
+MAX_SAMPLES = 20
+
+# Number of latencies needed before the read timeout of a command is derived from them.
+MIN_SAMPLES = 3
+
+# Bounds of the read timeouts derived from the latencies, in seconds.
+MIN_LEARNED_READ_TIMEOUT = 5
+MAX_LEARNED_READ_TIMEOUT = 600
+
+
+def get_command_read_timeout(command, default=DEFAULT_READ_TIMEOUT):
+    """Return the read timeout of a command definition, its `read_timeout` in the command mapper or the default."""
+    return command.get("read_timeout") or default
+
+
+def _get_cache_key(hostname):
+    generation = cache.get(CACHE_GENERATION_KEY, 0)
+    return f"{CACHE_KEY_PREFIX}.{generation}.{hostname}"
+
+
+class CommandLatencyProfile:
+    """Latencies of the commands run on each device, kept in the Nautobot cache between the job runs.
+
+    Once a command ran `MIN_SAMPLES` times on a device, its read timeout is the 99th percentile of its latencies
+    multiplied by the `command_latency_timeout_factor` app setting, so that slow devices are given the time they need
+    and hung sessions on fast devices are detected early. A `read_timeout` set in the command mapper is kept as the
+    minimum read timeout of the command. The latencies of a command are dropped when it times out,
+    the next run falls back to the read timeout of the command mapper.
+    """
+
+    def __init__(self, hostnames, timeout, factor):
+        """Load the latencies of the devices from the cache.
+
+        Args:
+            hostnames (list): hostnames or IP addresses of the devices, e.g. `host.hostname` of the Nornir hosts.
+            timeout (int): seconds the latencies are kept in the cache.
+            factor (float): factor applied to the 99th percentile of the latencies of a command.
+        """
+        self.timeout = timeout
+        self.factor = factor
+        cache_keys = {hostname: _get_cache_key(hostname) for hostname in hostnames if hostname}
+        cached = cache.get_many(list(cache_keys.values()))
+        self.latencies = {hostname: cached.get(cache_key, {}) for hostname, cache_key in cache_keys.items()}
+        self.changed = set()
+        self._lock = threading.Lock()
+
+    def get_read_timeout(self, hostname, command, default=DEFAULT_READ_TIMEOUT):
+        """Return the read timeout of a command definition on a device.
+
+        Args:
+            hostname (str): hostname or IP address of the device.
+            command (dict): command definition of the command mapper.
+            default (int): read timeout of the commands without `read_timeout` in the command mapper.
+        """
+        with self._lock:
+            samples = sorted(self.latencies.get(hostname, {}).get(command["command"], []))
+        if len(samples) < MIN_SAMPLES:
+            return get_command_read_timeout(command, default)
+        percentile_99 = samples[math.ceil(0.99 * len(samples)) - 1]
+        learned = min(max(percentile_99 * self.factor, MIN_LEARNED_READ_TIMEOUT), MAX_LEARNED_READ_TIMEOUT)
+        if command.get("read_timeout"):
+            # The command mapper gave the command this long on purpose, e.g. for a slow output on some devices.
+            return max(get_command_read_timeout(command, default), learned)
+        return learned
+
+    def record(self, hostname, command_string, seconds):
+        """Record the latency of a command that returned its output."""
+        with self._lock:
+            samples = self.latencies.setdefault(hostname, {}).setdefault(command_string, [])
+            samples.append(round(seconds, 3))
+            del samples[:-MAX_SAMPLES]
+            self.changed.add(hostname)
+
+    def record_timeout(self, hostname, command_string):
+        """Drop the latencies of a command that timed out, it's slower than they tell."""
+        with self._lock:
+            if self.latencies.get(hostname, {}).pop(command_string, None) is not None:
+                self.changed.add(hostname)
+
+    def save(self):
+        """Store the latencies of the devices that ran commands in the cache."""
+        with self._lock:
+            changed = {_get_cache_key(hostname): self.latencies[hostname] for hostname in self.changed}
+            self.changed = set()
+        if changed:
+            cache.set_many(changed, self.timeout)
+
+
+def get_command_latency_profile(hostnames):
+    """Return the CommandLatencyProfile of the devices, None unless the `command_latency_profile_timeout` is set."""
+    timeout = PLUGIN_CFG.get("command_latency_profile_timeout", 0)
+    if not timeout:
+        return None
+    return CommandLatencyProfile(hostnames, timeout, PLUGIN_CFG.get("command_latency_timeout_factor", 3))
+
+
+def clear_command_latency_profile(hostname=None):
+    """Remove the learned command latencies of a device, or of all devices if no hostname is given.
+
+    Args:
+        hostname (str): hostname or IP address of the device.
+    """
+    if hostname:
+        cache.delete(_get_cache_key(hostname))
+        return
+    # Entries of the previous generations expire on their own, like in the platform detection cache.
+    try:
+        cache.incr(CACHE_GENERATION_KEY)
+    except ValueError:
+        cache.set(CACHE_GENERATION_KEY, 1, None)
@@ -7,6 +7,7 @@ import socket
 import netaddr
 from django.contrib.contenttypes.models import ContentType
 from django.db import connections
+from nautobot.apps.jobs import ScriptVariable
 from nautobot.dcim.filters import DeviceFilterSet
 from nautobot.dcim.models import Device
 from netaddr.core import AddrFormatError
@@ -123,6 +124,18 @@ def check_for_required_file(directory, filename):
         return False
 
 
+def get_job_option(job, name, default=None):
+    """Return the value of a job option, or the default if the job has no such option or didn't run.
+
+    Until `run()` assigns the value of a job variable to the job, the attribute is the class-level variable itself, e.g.
+    a truthy `BooleanVar`, when the job is built directly by another job or a test.
+    """
+    value = getattr(job, name, default)
+    if isinstance(value, ScriptVariable):
+        return default
+    return value
+
+
 def close_threaded_db_connections(func):
     """Decorator to close database connections in threaded tasks."""
 
@@ -0,0 +1,97 @@
+"""Cache of the device platforms detected with Netmiko SSHDetect."""
+
+import hashlib
+import socket
+
+from django.core.cache import cache
+
+from nautobot_device_onboarding.constants import PLUGIN_CFG
+
+CACHE_KEY_PREFIX = "nautobot_device_onboarding.platform_detection"
+CACHE_GENERATION_KEY = f"{CACHE_KEY_PREFIX}.generation"
+
+# Seconds to wait for the SSH server identification string of a device.
+SSH_BANNER_TIMEOUT = 5
+
+
+def get_ssh_banner_fingerprint(host, port, timeout=SSH_BANNER_TIMEOUT):
+    """Return a fingerprint of the SSH server identification string (e.g. `SSH-2.0-Cisco-1.25`) of a device.
+
+    Args:
+        host (str): hostname or IP address of the device.
+        port (int): SSH port of the device.
+        timeout (int): seconds to wait for the connection and the identification string.
+
+    Returns:
+        str: sha256 hex digest of the identification string, None if it could not be read.
+    """
+    try:
+        with socket.create_connection((host, int(port)), timeout=timeout) as sock:
+            banner = b""
+            while b"\n" not in banner and len(banner) < 255:
+                data = sock.recv(255)
+                if not data:
+                    break
+                banner += data
+    except (OSError, ValueError):
+        return None
+    banner = banner.split(b"\n", 1)[0].strip()
+    if not banner.startswith(b"SSH-"):
+        return None
+    return hashlib.sha256(banner).hexdigest()
+
+
+def _get_cache_key(host, port):
+    generation = cache.get(CACHE_GENERATION_KEY, 0)
+    return f"{CACHE_KEY_PREFIX}.{generation}.{host}:{port}"
+
+
+def detect_platform(host, port, autodetect):
+    """Return the platform of a device from the platform detection cache, or autodetect and cache it.
+
+    The cache is disabled unless the `platform_detection_cache_timeout` app setting is set. When the
+    `platform_detection_cache_ssh_banner` app setting is enabled, a cached platform is only used if the SSH server
+    identification string of the device didn't change since it was detected.
+
+    Args:
+        host (str): hostname or IP address of the device.
+        port (int): SSH port of the device.
+        autodetect (callable): detects and returns the netmiko device type of the device, e.g. with SSHDetect.
+
+    Returns:
+        str: netmiko device type of the device.
+    """
+    timeout = PLUGIN_CFG.get("platform_detection_cache_timeout", 0)
+    if not timeout:
+        return autodetect()
+    ssh_banner = ""
+    if PLUGIN_CFG.get("platform_detection_cache_ssh_banner", True):
+        ssh_banner = get_ssh_banner_fingerprint(host, port)
+        if ssh_banner is None:
+            return autodetect()
+    cache_key = _get_cache_key(host, port)
+    cached = cache.get(cache_key)
+    if cached and cached["ssh_banner"] == ssh_banner:
+        return cached["device_type"]
+    device_type = autodetect()
+    if device_type:
+        cache.set(cache_key, {"device_type": device_type, "ssh_banner": ssh_banner}, timeout)
+    return device_type
+
+
+def clear_platform_detection_cache(host=None, port=22):
+    """Remove the cached platform of a device, or of all devices if no host is given.
+
+    Args:
+        host (str): hostname or IP address of the device.
+        port (int): SSH port of the device.
+    """
+    if host:
+        cache.delete(_get_cache_key(host, port))
+        return
+    # Cached entries of all devices are dropped by moving to a new generation of cache keys, entries of the previous
+    # generations expire on their own.
+    try:
+        cache.incr(CACHE_GENERATION_KEY)
+    except ValueError:
+        cache.set(CACHE_GENERATION_KEY, 1, None)